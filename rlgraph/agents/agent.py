@@ -15,22 +15,23 @@
 
 from __future__ import absolute_import, division, print_function
 
-from collections import defaultdict
-from functools import partial
 import logging
+import os
 
 import numpy as np
 
 from rlgraph import get_backend
 from rlgraph.components import Component, Exploration, PreprocessorStack, Synchronizable, Policy, Optimizer, \
     ContainerMerger, ContainerSplitter
+from rlgraph.components.helpers.mem_snapshotter import MemSnapshotter
+from rlgraph.components.helpers.observe_buffer import ObserveBuffer
 from rlgraph.graphs.graph_builder import GraphBuilder
 from rlgraph.graphs.graph_executor import GraphExecutor
 from rlgraph.spaces import Space, ContainerSpace
 from rlgraph.utils.decorators import rlgraph_api, graph_fn
 from rlgraph.utils.input_parsing import parse_execution_spec, parse_observe_spec, parse_update_spec, \
     parse_value_function_spec
-from rlgraph.utils.ops import flatten_op
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.specifiable import Specifiable
 
 if get_backend() == "tf":
@@ -91,6 +92,8 @@ class Agent(Specifiable):
         self.auto_build = auto_build
         self.graph_built = False
         self.logger = logging.getLogger(__name__)
+        # Created on the first `store_model` or `load_model` call including the memory.
+        self.memory_snapshotter = None
 
         self.state_space = Space.from_spec(state_space).with_batch_rank(False)
         self.flat_state_space = self.state_space.flatten(scope_separator_at_start=False)\
@@ -160,20 +163,9 @@ class Agent(Specifiable):
 
         # Python-side experience buffer for better performance (may be disabled).
         self.default_env = "env_0"
-
-        def factory_(i):
-            if i == 0:
-                return []
-            return tuple([[] for _ in range(i)])
-
-        self.states_buffer = defaultdict(partial(factory_, len(self.flat_state_space or [])))
-        self.actions_buffer = defaultdict(partial(factory_, len(self.flat_action_space or [])))
-        self.internals_buffer = defaultdict(list)
-        self.rewards_buffer = defaultdict(list)
-        self.next_states_buffer = defaultdict(partial(factory_, len(self.flat_state_space or [])))
-        self.terminals_buffer = defaultdict(list)
-
         self.observe_spec = parse_observe_spec(observe_spec)
+        # One `ObserveBuffer` per environment id.
+        self.observe_buffers = {}
 
         # Global time step counter.
         self.timesteps = 0
@@ -215,12 +207,57 @@ class Agent(Specifiable):
         """
         if env_id is None:
             env_id = self.default_env
-        del self.states_buffer[env_id]  # = ([] for _ in range(len(self.flat_state_space)))
-        del self.actions_buffer[env_id]  # = ([] for _ in range(len(self.flat_action_space)))
-        del self.internals_buffer[env_id]  # = []
-        del self.rewards_buffer[env_id]  # = []
-        del self.next_states_buffer[env_id]  # = ([] for _ in range(len(self.flat_state_space)))
-        del self.terminals_buffer[env_id]  # = []
+        if env_id in self.observe_buffers:
+            self.observe_buffers[env_id].clear()
+
+    def get_observe_buffer(self, env_id):
+        """
+        Returns the observe buffer of an environment (created on first access).
+
+        Args:
+            env_id (str): Environment id.
+
+        Returns:
+            ObserveBuffer: The buffer.
+        """
+        if env_id not in self.observe_buffers:
+            self.observe_buffers[env_id] = ObserveBuffer(
+                self.observe_spec["buffer_size"], self.preprocessed_state_space.with_batch_rank(False),
+                self.action_space,
+                state_keys=list(self.flat_state_space.keys()) if self.flat_state_space is not None else None,
+                action_keys=list(self.flat_action_space.keys()) if self.flat_action_space is not None else None
+            )
+        return self.observe_buffers[env_id]
+
+    def _get_buffer_columns(self, name):
+        """
+        Returns the buffered values of one column per environment id (for inspection).
+        """
+        return {env_id: buffer.get_column(name) for env_id, buffer in self.observe_buffers.items()}
+
+    @property
+    def states_buffer(self):
+        return self._get_buffer_columns("states")
+
+    @property
+    def actions_buffer(self):
+        return self._get_buffer_columns("actions")
+
+    @property
+    def internals_buffer(self):
+        return self._get_buffer_columns("internals")
+
+    @property
+    def rewards_buffer(self):
+        return self._get_buffer_columns("rewards")
+
+    @property
+    def next_states_buffer(self):
+        return self._get_buffer_columns("next_states")
+
+    @property
+    def terminals_buffer(self):
+        return self._get_buffer_columns("terminals")
 
     def define_graph_api(self, *args, **kwargs):
         """
@@ -439,100 +476,37 @@ class Agent(Specifiable):
             if env_id is None:
                 env_id = self.default_env
 
-            # If data is already batched, just have to extend our buffer lists.
-            if batched:
-                if self.flat_state_space is not None:
-                    for i, flat_key in enumerate(self.flat_state_space.keys()):
-                        self.states_buffer[env_id][i].extend(preprocessed_states[flat_key])
-                        self.next_states_buffer[env_id][i].extend(next_states[flat_key])
-                else:
-                    self.states_buffer[env_id].extend(preprocessed_states)
-                    self.next_states_buffer[env_id].extend(next_states)
-                if self.flat_action_space is not None:
-                    flat_action = flatten_op(actions)
-                    for i, flat_key in enumerate(self.flat_action_space.keys()):
-                        self.actions_buffer[env_id][i].append(flat_action[flat_key])
-                else:
-                    self.actions_buffer[env_id].extend(actions)
-                self.internals_buffer[env_id].extend(internals)
-                self.rewards_buffer[env_id].extend(rewards)
-                self.terminals_buffer[env_id].extend(terminals)
-            # Data is not batched, append single items (without creating new lists first!) to buffer lists.
-            else:
-                if self.flat_state_space is not None:
-                    for i, flat_key in enumerate(self.flat_state_space.keys()):
-                        self.states_buffer[env_id][i].append(preprocessed_states[flat_key])
-                        self.next_states_buffer[env_id][i].append(next_states[flat_key])
-                else:
-                    self.states_buffer[env_id].append(preprocessed_states)
-                    self.next_states_buffer[env_id].append(next_states)
-                if self.flat_action_space is not None:
-                    flat_action = flatten_op(actions)
-                    for i, flat_key in enumerate(self.flat_action_space.keys()):
-                        self.actions_buffer[env_id][i].append(flat_action[flat_key])
-                else:
-                    self.actions_buffer[env_id].append(actions)
-                self.internals_buffer[env_id].append(internals)
-                self.rewards_buffer[env_id].append(rewards)
-                self.terminals_buffer[env_id].append(terminals)
-
-            buffer_is_full = len(self.rewards_buffer[env_id]) >= self.observe_spec["buffer_size"]
+            buffer = self.get_observe_buffer(env_id)
+            buffer.add(preprocessed_states, actions, internals, rewards, next_states, terminals, batched=batched)
+            buffer_is_full = len(buffer) >= self.observe_spec["buffer_size"]
 
             # If the buffer (per environment) is full OR the episode was aborted:
             # Change terminal of last record artificially to True (also give warning "buffer too small"),
             # insert and flush the buffer.
-            if buffer_is_full or self.terminals_buffer[env_id][-1]:
+            if buffer_is_full or buffer.terminals[len(buffer) - 1]:
                 # Warn if full and last terminal is False.
-                if buffer_is_full and not self.terminals_buffer[env_id][-1]:
+                if buffer_is_full and not buffer.terminals[len(buffer) - 1]:
                     self.logger.warning(
                         "Buffer of size {} of Agent '{}' may be too small! Had to add artificial terminal=True "
                         "to end.".format(self.observe_spec["buffer_size"], self)
                     )
-                    self.terminals_buffer[env_id][-1] = True
+                    buffer.terminals[len(buffer) - 1] = True
 
                 # TODO: Apply n-step post-processing if necessary.
-                if self.flat_state_space is not None:
-                    states_ = {}
-                    next_states_ = {}
-                    for i, key in enumerate(self.flat_state_space.keys()):
-                        states_[key] = np.asarray(self.states_buffer[env_id][i])
-                        next_states_[key] = np.asarray(self.next_states_buffer[env_id][i])
-                        # Squeeze, but do not squeeze (1,) to ().
-                        if len(states_[key]) > 1:
-                            states_[key] = np.squeeze(states_[key])
-                            next_states_[key] = np.squeeze(next_states_[key])
-                        else:
-                            states_[key] = np.reshape(states_[key], (1,))
-                            next_states_[key] = np.reshape(next_states_[key], (1,))
-                else:
-                    states_ = np.asarray(self.states_buffer[env_id])
-                    next_states_ = np.asarray(self.next_states_buffer[env_id])
-
-                if self.flat_action_space is not None:
-                    actions_ = {}
-                    for i, key in enumerate(self.flat_action_space.keys()):
-                        actions_[key] = np.asarray(self.actions_buffer[env_id][i])
-                        # Squeeze, but do not squeeze (1,) to ().
-                        if len(actions_[key]) > 1:
-                            actions_[key] = np.squeeze(actions_[key])
-                        else:
-                            actions_[key] = np.reshape(actions_[key], (1,))
-                else:
-                    actions_ = np.asarray(self.actions_buffer[env_id])
-
+                states_, actions_, internals_, rewards_, next_states_, terminals_ = buffer.get_records()
                 self._write_rewards_summary(
-                    rewards=self.rewards_buffer[env_id],  # No need to be converted to np
-                    terminals=self.terminals_buffer[env_id],
+                    rewards=rewards_,
+                    terminals=terminals_,
                     env_id=env_id
                 )
 
                 self._observe_graph(
                     preprocessed_states=states_,
                     actions=actions_,
-                    internals=np.asarray(self.internals_buffer[env_id]),
-                    rewards=np.asarray(self.rewards_buffer[env_id]),
+                    internals=internals_,
+                    rewards=rewards_,
                     next_states=next_states_,
-                    terminals=np.asarray(self.terminals_buffer[env_id])
+                    terminals=terminals_
                 )
                 self.reset_env_buffers(env_id)
         else:
@@ -671,7 +645,7 @@ class Agent(Specifiable):
         """
         self.graph_executor.export_graph_definition(filename)
 
-    def store_model(self, path=None, add_timestep=True):
+    def store_model(self, path=None, add_timestep=True, include_memory=False):
         """
         Store model using the backend's check-pointing mechanism.
 
@@ -680,10 +654,22 @@ class Agent(Specifiable):
 
             add_timestep (bool): Indicates if current training step should be appended to exported model.
                 If false, may override previous checkpoints.
+
+            include_memory (bool): Whether to also snapshot the agent's replay memory (into a "memory" directory next
+                to the checkpoint). Snapshots are incremental and written in the background. Memories living in
+                graph variables (TensorFlow) are always part of the checkpoint.
         """
         self.graph_executor.store_model(path=path, add_timestep=add_timestep)
+        if include_memory is True:
+            directory = path
+            if directory is None and self.graph_executor.saver_spec is not None:
+                directory = self.graph_executor.saver_spec.get("directory", None)
+            if directory is not None and not os.path.isdir(directory):
+                directory = os.path.dirname(directory)
+            if self._get_memory_snapshotter(directory).snapshot(self.memory) is False:
+                self.logger.info("Memory contents are stored with the model checkpoint.")
 
-    def load_model(self, checkpoint_directory=None, checkpoint_path=None):
+    def load_model(self, checkpoint_directory=None, checkpoint_path=None, include_memory=False):
         """
         Loads model from specified path location using the following semantics:
 
@@ -698,8 +684,38 @@ class Agent(Specifiable):
         Args:
             checkpoint_directory (str): Optional path to directory containing checkpoint(s).
             checkpoint_path (str): Path to specific model checkpoint.
+            include_memory (bool): Whether to also restore the replay memory snapshot stored by
+                `store_model(include_memory=True)`.
         """
         self.graph_executor.load_model(checkpoint_directory=checkpoint_directory, checkpoint_path=checkpoint_path)
+        if include_memory is True:
+            directory = checkpoint_directory
+            if directory is None:
+                directory = os.path.dirname(checkpoint_path)
+            snapshotter = self._get_memory_snapshotter(directory)
+            if self.memory.get_snapshot() is not None:
+                snapshotter.restore(self.memory)
+
+    def _get_memory_snapshotter(self, directory):
+        """
+        Returns the snapshotter for the agent's memory in the given checkpoint directory.
+
+        Args:
+            directory (str): Checkpoint directory.
+
+        Returns:
+            MemSnapshotter: The snapshotter writing to `directory`/memory.
+        """
+        if getattr(self, "memory", None) is None:
+            raise RLGraphError("Agent {} does not have a memory to snapshot.".format(self.name))
+        if directory is None:
+            raise RLGraphError("No checkpoint directory given to snapshot the memory to.")
+        directory = os.path.join(directory, "memory")
+        if self.memory_snapshotter is None or self.memory_snapshotter.directory != directory:
+            if self.memory_snapshotter is not None:
+                self.memory_snapshotter.wait()
+            self.memory_snapshotter = MemSnapshotter(directory)
+        return self.memory_snapshotter
 
     def get_weights(self):
         """
@@ -70,7 +70,8 @@ class PPOAgent(Agent):
         standardize_advantages=False,
         sample_episodes=True,
         weight_entropy=None,
-        memory_spec=None
+        memory_spec=None,
+        contiguous_minibatches=False
     ):
         """
         Args:
@@ -129,6 +130,10 @@ class PPOAgent(Agent):
 
             memory_spec (Optional[dict,Memory]): The spec for the Memory to use. Should typically be
                 a ring-buffer.
+
+            contiguous_minibatches (bool): If True, the update batch is reordered by each epoch's permutation into
+                one contiguous copy, so that minibatches are slices (views) of it instead of being gathered
+                separately. Only affects the PyTorch backend.
         """
         if policy_spec is not None:
             policy_spec["deterministic"] = False
@@ -197,6 +202,7 @@ class PPOAgent(Agent):
         self.iterations = self.update_spec["num_iterations"]
         self.sample_size = self.update_spec["sample_size"]
         self.batch_size = self.update_spec["batch_size"]
+        self.contiguous_minibatches = contiguous_minibatches
 
         # Add all our sub-components to the core.
         self.root_component.add_components(
@@ -286,6 +292,11 @@ class PPOAgent(Agent):
         ):
             """
             Calls iterative optimization by repeatedly sub-sampling.
+
+            Each of the `num_iterations` iterations uses one minibatch of `sample_size` records. Minibatches are
+            consecutive slices of a random permutation of the batch, which is drawn anew for each pass (epoch) over
+            the batch. Advantages, log-likelihoods and state values before the update are computed once for the
+            entire batch.
             """
             multi_gpu_sync_optimizer = root.sub_components.get("multi-gpu-synchronizer")
 
@@ -323,9 +334,21 @@ class PPOAgent(Agent):
                     mean, std = tf.nn.moments(x=advantages, axes=[0])
                     advantages = (advantages - mean) / std
 
+                # Number of minibatches per epoch (if the batch is smaller than a minibatch, one wrapping-around
+                # minibatch).
+                num_minibatches = tf.maximum(batch_size // agent.sample_size, 1)
+                num_epochs = (agent.iterations + num_minibatches - 1) // num_minibatches
+                # One random permutation of the batch per epoch.
+                _, permutations = tf.nn.top_k(
+                    tf.random_uniform(shape=tf.stack([num_epochs, batch_size])), k=batch_size
+                )
+
                 def opt_body(index_, loss_, loss_per_item_, vf_loss_, vf_loss_per_item_):
-                    start = tf.random_uniform(shape=(), minval=0, maxval=batch_size, dtype=tf.int32)
-                    indices = tf.range(start=start, limit=start + agent.sample_size) % batch_size
+                    start = (index_ % num_minibatches) * agent.sample_size
+                    indices = tf.gather(
+                        params=permutations[index_ // num_minibatches],
+                        indices=tf.range(start=start, limit=start + agent.sample_size) % batch_size
+                    )
 
                     # Use `map` here in case we have container states/actions.
                     sample_states = preprocessed_states.map(lambda k, v: tf.gather(v, indices))
@@ -435,12 +458,14 @@ class PPOAgent(Agent):
                 batch_size = list(flatten_op(preprocessed_states).values())[0].shape[0]
                 sample_size = min(batch_size, agent.sample_size)
 
-                if isinstance(prev_log_probs, dict):
-                    for name in actions.keys():
-                        prev_log_probs[name] = prev_log_probs[name].detach()
+                num_minibatches = batch_size // sample_size
+
+                if isinstance(actions, dict):
+                    actions = define_by_run_flatten(actions, scope_separator_at_start=False)
+                    prev_log_probs = DataOpDict([(name, prev_log_probs[name].detach()) for name in actions.keys()])
                 else:
                     prev_log_probs = prev_log_probs.detach()
-                prev_state_values = value_function.value_output(preprocessed_states).detach()
+                prev_state_values = prev_state_values.detach()
                 if apply_postprocessing:
                     advantages = gae_function.calc_gae_values(prev_state_values, rewards, terminals, sequence_indices)
                 else:
@@ -450,23 +475,26 @@ class PPOAgent(Agent):
                     if not np.isnan(std):
                         advantages = (advantages - torch.mean(advantages)) / std
 
-                for _ in range(agent.iterations):
-                    start = int(torch.rand(1) * (batch_size - 1))
-                    indices = torch.arange(start=start, end=start + sample_size, dtype=torch.long) % batch_size
-                    sample_states = torch.index_select(preprocessed_states, 0, indices)
-
-                    if isinstance(actions, dict):
-                        sample_actions = DataOpDict()
-                        sample_prev_log_probs = DataOpDict()
-                        for name, action in define_by_run_flatten(actions, scope_separator_at_start=False).items():
-                            sample_actions[name] = torch.index_select(action, 0, indices)
-                            sample_prev_log_probs[name] = torch.index_select(prev_log_probs[name], 0, indices)
+                def select(value, indices):
+                    if isinstance(value, dict):
+                        return DataOpDict([(key, select(v, indices)) for key, v in value.items()])
+                    # Slices are views, index tensors gather copies.
+                    return value[indices] if isinstance(indices, slice) else torch.index_select(value, 0, indices)
+
+                batch = [preprocessed_states, actions, prev_log_probs, advantages, prev_state_values]
+                for i in range(agent.iterations):
+                    # New epoch: Draw a new permutation of the batch.
+                    if i % num_minibatches == 0:
+                        permutation = torch.randperm(batch_size)
+                        if agent.contiguous_minibatches:
+                            permuted_batch = [select(value, permutation) for value in batch]
+                    start = (i % num_minibatches) * sample_size
+                    if agent.contiguous_minibatches:
+                        minibatch = [select(value, slice(start, start + sample_size)) for value in permuted_batch]
                     else:
-                        sample_actions = torch.index_select(actions, 0, indices)
-                        sample_prev_log_probs = torch.index_select(prev_log_probs, 0, indices)
-
-                    sample_advantages = torch.index_select(advantages, 0, indices)
-                    sample_prev_state_values = torch.index_select(prev_state_values, 0, indices)
+                        minibatch = [select(value, permutation[start:start + sample_size]) for value in batch]
+                    sample_states, sample_actions, sample_prev_log_probs, sample_advantages, \
+                        sample_prev_state_values = minibatch
 
                     sample_log_probs = policy.get_log_likelihood(sample_states, sample_actions)["log_likelihood"]
                     sample_state_values = value_function.value_output(sample_states)
@@ -30,7 +30,9 @@ class RandomAgent(Agent):
 
     def get_action(self, states, internals=None, use_exploration=False, apply_preprocessing=True, extra_returns=None,
                    time_percentage=None):
-        a = self.action_space_batched.sample(size=len(states[0]))
+        # One action per state of the batch (container states: per item of their first component).
+        batch_size = len(next(iter(states.values()))) if isinstance(states, dict) else len(states)
+        a = self.action_space_batched.sample(size=batch_size)
         if extra_returns is not None and "preprocessed_states" in extra_returns:
             return a, states
         else:
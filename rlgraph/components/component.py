@@ -1255,6 +1255,12 @@ class Component(Specifiable):
                     return torch.stack(ret) if ret else ret
                 else:
                     return variable
+            # Preallocated tensors (e.g. memory columns) are read with a single gather.
+            elif isinstance(variable, torch.Tensor) and indices is not None:
+                if TraceContext.DEFINE_BY_RUN_CONTEXT == "building" and shape is not None and len(indices) == 0:
+                    return torch.zeros(shape, dtype=dtype)
+                values = variable[torch.as_tensor(indices, dtype=torch.int64)]
+                return values if dtype is None else values.to(dtype)
             else:
                 # Catch all for raw types.
                 return variable
@@ -17,7 +17,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from rlgraph.components.helpers.mem_frame_store import MemFrameStore
 from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree
+from rlgraph.components.helpers.mem_snapshotter import MemSnapshotter
+from rlgraph.components.helpers.observe_buffer import ObserveBuffer
 from rlgraph.components.helpers.segment_tree import SegmentTree
 from rlgraph.components.helpers.softmax import SoftMax
 from rlgraph.components.helpers.v_trace_function import VTraceFunction
@@ -26,5 +29,5 @@ from rlgraph.components.helpers.clipping import Clipping
 from rlgraph.components.helpers.generalized_advantage_estimation import GeneralizedAdvantageEstimation
 
 
-__all__ = ["MemSegmentTree", "SegmentTree", "SoftMax", "VTraceFunction", "SequenceHelper",
-           "GeneralizedAdvantageEstimation", "Clipping"]
+__all__ = ["MemFrameStore", "MemSegmentTree", "MemSnapshotter", "ObserveBuffer", "SegmentTree", "SoftMax",
+           "VTraceFunction", "SequenceHelper", "GeneralizedAdvantageEstimation", "Clipping"]
@@ -0,0 +1,242 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import numpy as np
+
+from rlgraph.utils.numpy import create_array
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class MemFrameStore(object):
+    """
+    In-memory store for stacked-frame observations (e.g. the outputs of a `Sequence` preprocessor) which keeps
+    every frame only once.
+
+    Frames are kept in one ring of single frames. Each transition slot only stores the (absolute) position of the
+    last frame of its state and of its next-state. Stacked states are rebuilt at read time by gathering the
+    `sequence_length` consecutive frames ending at these positions.
+
+    On insert, a stack is chained to the previously written stack if its first `sequence_length - 1` frames are
+    the previous stack's last frames, so only one new frame is written (and nothing is written for a stack equal to
+    the previous one). Otherwise (start of a new episode or trajectory fragment) all of its frames are written.
+    Chaining is decided by frame contents rather than terminals, as inserted batches also contain trajectory
+    fragments ending without a terminal. A stack never references frames of another episode unless they are
+    identical.
+
+    Frames are written in insertion order, so once the frame ring wraps, the frames of the oldest transitions are
+    overwritten first. See `num_overwritten`.
+    """
+
+    def __init__(self, capacity, sequence_length=4, add_rank=True, frame_capacity=None, storage_directory=None):
+        """
+        Args:
+            capacity (int): Number of transition slots.
+            sequence_length (int): Number of frames per stacked state.
+            add_rank (bool): Whether the frames were stacked in an extra (last) rank (True) or concatenated
+                within the last rank (False). See `Sequence` preprocessor.
+            frame_capacity (Optional[int]): Size of the frame ring. Must be large enough to hold all frames
+                referenced by the `capacity` most recent transitions, otherwise the oldest transitions become
+                unreadable (see `num_overwritten`). Default: 2 x capacity.
+            storage_directory (Optional[str]): If given, frames and positions live in memory-mapped files in this
+                directory. Existing files are reopened.
+        """
+        self.capacity = capacity
+        self.sequence_length = sequence_length
+        self.add_rank = add_rank
+        self.frame_capacity = frame_capacity or 2 * capacity
+        self.storage_directory = storage_directory
+
+        # Created on the first insert (unless reopened from storage).
+        self.frames = None
+        if self.storage_directory is not None and os.path.exists(self._file_path("frames")):
+            self.frames = np.load(self._file_path("frames"), mmap_mode="r+")
+        # Absolute positions of the last frame of each slot's state/next-state.
+        self.state_positions = create_array(
+            shape=(self.capacity,), dtype=np.int64, file_path=self._file_path("frame_state_positions")
+        )
+        self.next_state_positions = create_array(
+            shape=(self.capacity,), dtype=np.int64, file_path=self._file_path("frame_next_state_positions")
+        )
+        # Total number of frames written so far.
+        self.frame_count = 0
+        # Frames of the most recently written stack (to chain across insert calls).
+        self.last_stack = None
+
+    def _file_path(self, name):
+        if self.storage_directory is None:
+            return None
+        return os.path.join(self.storage_directory, name + ".npy")
+
+    def split_frames(self, stacked):
+        """
+        Splits a batch of stacked states into its single frames.
+
+        Args:
+            stacked (ndarray): Stacked states of shape [B, ...].
+
+        Returns:
+            ndarray: The frames of shape [B, sequence_length, frame-shape].
+        """
+        if self.add_rank:
+            return np.moveaxis(stacked, -1, 1)
+        shape = stacked.shape[:-1] + (self.sequence_length, stacked.shape[-1] // self.sequence_length)
+        return np.moveaxis(np.reshape(stacked, shape), -2, 1)
+
+    def merge_frames(self, frames):
+        """
+        Inverse of `split_frames`.
+
+        Args:
+            frames (ndarray): Frames of shape [B, sequence_length, frame-shape].
+
+        Returns:
+            ndarray: The stacked states.
+        """
+        if self.add_rank:
+            return np.moveaxis(frames, 1, -1)
+        frames = np.moveaxis(frames, 1, -2)
+        return np.reshape(frames, frames.shape[:-2] + (frames.shape[-2] * frames.shape[-1],))
+
+    def insert_batch(self, indices, states, next_states, n_step=1):
+        """
+        Writes the frames of a batch of transitions and points the given slots to them.
+
+        Args:
+            indices (ndarray): Transition slots to write.
+            states (ndarray): Stacked states of the transitions (in trajectory order).
+            next_states (ndarray): Stacked next-states of the transitions.
+            n_step (int): Offset between a state and its next-state within a trajectory. Next-states equal to the
+                state `n_step` transitions ahead in the batch share its frames.
+        """
+        state_frames = self.split_frames(np.asarray(states))
+        next_frames = self.split_frames(np.asarray(next_states))
+        num_records = len(state_frames)
+        length = self.sequence_length
+        if self.frames is None:
+            self.frames = create_array(
+                shape=(self.frame_capacity,) + state_frames.shape[2:], dtype=state_frames.dtype,
+                file_path=self._file_path("frames")
+            )
+
+        def frames_equal(a, b):
+            return np.all(a == b, axis=tuple(range(1, a.ndim)))
+
+        def write_stacks(stacks, last_stack):
+            """
+            Writes a sequence of stacks, skipping stacks equal to their predecessor and writing only the newest
+            frame of stacks chaining onto their predecessor. Returns the positions of the stacks' last frames.
+            """
+            previous_stacks = np.concatenate([last_stack[None], stacks[:-1]]) if last_stack is not None else \
+                np.concatenate([stacks[:1], stacks[:-1]])
+            is_same = frames_equal(stacks, previous_stacks)
+            chains = frames_equal(stacks[:, :-1], previous_stacks[:, 1:])
+            counts = np.where(is_same, 0, np.where(chains, 1, length))
+            if last_stack is None:
+                counts[0] = length
+
+            write_mask = np.arange(length) >= (length - counts)[:, None]
+            new_frames = stacks[write_mask]
+            self.frames[np.arange(self.frame_count, self.frame_count + len(new_frames)) % self.frame_capacity] = \
+                new_frames
+            self.frame_count += len(new_frames)
+            return self.frame_count - len(new_frames) + np.cumsum(counts) - 1
+
+        # 1) All states (consecutive states of a trajectory only add one frame each).
+        state_positions = write_stacks(state_frames, self.last_stack)
+        self.last_stack = state_frames[-1]
+
+        # 2) Next-states found n steps ahead in the batch share that state's frames, all others are written.
+        next_state_positions = np.empty_like(state_positions)
+        next_is_state = np.zeros(shape=(num_records,), dtype=np.bool_)
+        if num_records > n_step:
+            next_is_state[:-n_step] = frames_equal(next_frames[:-n_step], state_frames[n_step:])
+            next_state_positions[:-n_step] = state_positions[n_step:]
+        if not np.all(next_is_state):
+            written_next_states = next_frames[~next_is_state]
+            next_state_positions[~next_is_state] = write_stacks(written_next_states, self.last_stack)
+            self.last_stack = written_next_states[-1]
+
+        self.state_positions[indices] = state_positions
+        self.next_state_positions[indices] = next_state_positions
+
+    def is_overwritten(self, indices):
+        """
+        Checks whether frames of the given slots have been overwritten.
+
+        Args:
+            indices (ndarray): Transition slots to check.
+
+        Returns:
+            ndarray: Bool array, True for slots whose states can no longer be rebuilt.
+        """
+        # Next-states always end at or after their state's last frame, so the state holds the oldest frame.
+        return self.state_positions[indices] - self.sequence_length + 1 < self.frame_count - self.frame_capacity
+
+    def num_overwritten(self, oldest_index, num_records):
+        """
+        Counts the transitions whose frames have been overwritten. As frames are written in insertion order, these
+        are always the oldest transitions.
+
+        Args:
+            oldest_index (int): Slot of the oldest transition.
+            num_records (int): Number of stored transitions.
+
+        Returns:
+            int: Number of overwritten transitions, starting from the oldest.
+        """
+        # Binary search over the transitions in insertion order.
+        low, high = 0, num_records
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_overwritten((oldest_index + middle) % self.capacity):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_states(self, indices):
+        """
+        Rebuilds the stacked states and next-states of the given slots.
+
+        Args:
+            indices (ndarray): Transition slots to read.
+
+        Returns:
+            Tuple[ndarray,ndarray]: Stacked states and next-states.
+        """
+        state_positions = self.state_positions[indices]
+        next_state_positions = self.next_state_positions[indices]
+        oldest = min(np.min(state_positions), np.min(next_state_positions)) - self.sequence_length + 1
+        if self.frame_count - oldest > self.frame_capacity:
+            raise RLGraphError("Frames of requested transitions have been overwritten. Increase `frame_capacity` "
+                               "(currently {}).".format(self.frame_capacity))
+
+        offsets = np.arange(1 - self.sequence_length, 1)
+        frame_indices = np.concatenate([state_positions, next_state_positions])[:, None] + offsets
+        frame_indices %= self.frame_capacity
+        if self.storage_directory is None:
+            frames = self.frames[frame_indices]
+        else:
+            # Read each frame once and in file order.
+            unique_indices, inverse = np.unique(frame_indices, return_inverse=True)
+            frames = self.frames[unique_indices][np.reshape(inverse, frame_indices.shape)]
+        num_records = len(state_positions)
+        return self.merge_frames(frames[:num_records]), self.merge_frames(frames[num_records:])
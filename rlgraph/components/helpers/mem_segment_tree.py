@@ -19,13 +19,27 @@ from __future__ import print_function
 
 import operator
 
+import numpy as np
+
 from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.utils.util import SMALL_NUMBER
+
+
+# Vectorized counterparts of the supported (commutative) reduce operators.
+_NUMPY_OPERATORS = {
+    operator.add: np.add,
+    min: np.minimum,
+    max: np.maximum
+}
 
 
 class MemSegmentTree(object):
     """
     In-memory Segment tree for prioritized replay.
 
+    The tree is stored in a flat numpy array of size 2 * capacity (leaves start at `capacity`), which allows
+    batched inserts and batched prefix-sum lookups to walk the tree level by level for all elements at once.
+
     Note: The pure TensorFlow segment tree is much slower because variable updating is expensive,
     and in scenarios like Ape-X, memory and update are separated processes, so there is little to be gained
     from inserting into the graph.
@@ -41,13 +55,16 @@ class MemSegmentTree(object):
         Helper to represent a segment tree.
 
         Args:
-            values (list): Storage for the segment tree.
-            capacity (int): Capacity of segment tree.
-            operator (callable): Reduce operation of the segment tree.
+            values (Union[list,np.ndarray]): Storage for the segment tree (of length 2 * capacity).
+            capacity (int): Capacity of segment tree. Must be a power of 2.
+            operator (callable): Reduce operation of the segment tree. One of [operator.add, min, max].
         """
-        self.values = values
+        if operator not in _NUMPY_OPERATORS:
+            raise RLGraphError("Unsupported segment tree operator. Supported ops are [add, min, max].")
+        self.values = np.asarray(values, dtype=np.float64)
         self.capacity = capacity
         self.operator = operator
+        self.np_operator = _NUMPY_OPERATORS[operator]
 
     def insert(self, index, element):
         """
@@ -72,6 +89,30 @@ class MemSegmentTree(object):
             )
             index = index >> 1
 
+    def insert_batch(self, indices, elements):
+        """
+        Inserts a batch of elements into the segment tree and updates all affected inner nodes
+        level by level.
+
+        Args:
+            indices (ndarray): Insertion indices. If an index occurs more than once, the last element wins.
+            elements (ndarray): Elements to insert (one per index).
+        """
+        indices = np.asarray(indices, dtype=np.int64) + self.capacity
+        if len(indices) == 0:
+            return
+        self.values[indices] = elements
+
+        # All leaves are on the same level, so all parents reach the root (and then 0) at the same time.
+        indices = np.unique(indices >> 1)
+        while indices[0] >= 1:
+            update_indices = 2 * indices
+            self.values[indices] = self.np_operator(
+                self.values[update_indices],
+                self.values[update_indices + 1]
+            )
+            indices = np.unique(indices >> 1)
+
     def get(self, index):
         """
         Reads an item from the segment tree.
@@ -84,6 +125,18 @@ class MemSegmentTree(object):
         """
         return self.values[self.capacity + index]
 
+    def get_batch(self, indices):
+        """
+        Reads a batch of items from the segment tree.
+
+        Args:
+            indices (ndarray): Indices to read.
+
+        Returns:
+            ndarray: The elements.
+        """
+        return self.values[np.asarray(indices, dtype=np.int64) + self.capacity]
+
     def index_of_prefixsum(self, prefix_sum):
         """
         Identifies the highest index which satisfies the condition that the sum
@@ -107,6 +160,30 @@ class MemSegmentTree(object):
                 index = update_index + 1
         return index - self.capacity
 
+    def sample_batch(self, prefix_sums):
+        """
+        Batched version of `index_of_prefixsum`: Descends the tree for all prefix sums at once.
+
+        Args:
+            prefix_sums (ndarray): Upper bounds on the prefixes we are allowed to select.
+
+        Returns:
+            ndarray: Indices (int64) satisfying the prefix sum conditions.
+        """
+        prefix_sums = np.array(prefix_sums, dtype=np.float64)
+        indices = np.ones_like(prefix_sums, dtype=np.int64)
+
+        # Capacity is a power of 2 -> every query takes exactly log2(capacity) steps.
+        level_capacity = 1
+        while level_capacity < self.capacity:
+            update_indices = 2 * indices
+            left_values = self.values[update_indices]
+            go_right = left_values <= prefix_sums
+            prefix_sums -= np.where(go_right, left_values, 0.0)
+            indices = update_indices + go_right
+            level_capacity *= 2
+        return indices - self.capacity
+
     def reduce(self, start, limit, reduce_op=operator.add):
         """
         Applies an operation to specified segment.
@@ -124,6 +201,10 @@ class MemSegmentTree(object):
         if limit < 0:
             limit += self.capacity
 
+        # Reducing over the whole tree with the tree's own op: Root holds the result.
+        if start == 0 and limit == self.capacity and reduce_op == self.operator:
+            return float(self.values[1])
+
         # Init result with neutral element of reduce op.
         # Note that all of these are commutative reduce ops.
         if reduce_op == operator.add:
@@ -146,7 +227,7 @@ class MemSegmentTree(object):
                 result = reduce_op(result, self.values[limit])
             start = start >> 1
             limit = limit >> 1
-        return result
+        return float(result)
 
     def get_min_value(self, start=0, stop=None):
         """
@@ -198,3 +279,60 @@ class MinSumSegmentTree(object):
             self.min_segment_tree.values[index] = min(self.min_segment_tree.values[update_index],
                                                       self.min_segment_tree.values[update_index + 1])
             index = index >> 1
+
+    def insert_batch(self, indices, elements, min_elements=None):
+        """
+        Inserts a batch of elements into both segment trees, updating the inner nodes of both
+        trees level by level.
+
+        Args:
+            indices (ndarray): Insertion indices. If an index occurs more than once, the last element wins.
+            elements (ndarray): Elements to insert (one per index).
+            min_elements (Optional[ndarray]): Elements to insert into the min tree instead of `elements`. Inserting
+                inf here and 0.0 into the sum tree excludes indices from sampling.
+        """
+        sum_values = self.sum_segment_tree.values
+        min_values = self.min_segment_tree.values
+
+        indices = np.asarray(indices, dtype=np.int64) + self.capacity
+        if len(indices) == 0:
+            return
+        sum_values[indices] = elements
+        min_values[indices] = elements if min_elements is None else min_elements
+
+        indices = np.unique(indices >> 1)
+        while indices[0] >= 1:
+            update_indices = 2 * indices
+            sum_values[indices] = sum_values[update_indices] + sum_values[update_indices + 1]
+            min_values[indices] = np.minimum(min_values[update_indices], min_values[update_indices + 1])
+            indices = np.unique(indices >> 1)
+
+    def sample_batch(self, num_records, limit=None):
+        """
+        Samples indices proportionally to their priorities.
+
+        Args:
+            num_records (int): Number of indices to sample.
+            limit (Optional[int]): Upper bound (exclusive) of the segment to compute the total priority mass over.
+
+        Returns:
+            ndarray: The sampled indices.
+        """
+        prob_sum = self.sum_segment_tree.get_sum(0, limit)
+        return self.sum_segment_tree.sample_batch(np.random.random(size=(num_records,)) * prob_sum)
+
+    def get_importance_weights(self, indices, beta):
+        """
+        Computes the normalized importance-sampling weights `(P(i) / min_j P(j)) ** -beta`
+        for a batch of sampled indices.
+
+        Args:
+            indices (ndarray): The sampled indices.
+            beta (float): Importance-sampling exponent.
+
+        Returns:
+            ndarray: The importance weights (max weight is 1.0).
+        """
+        min_priority = max(self.min_segment_tree.get_min_value(), SMALL_NUMBER)
+        priorities = self.sum_segment_tree.get_batch(indices)
+        return np.power(priorities / min_priority, -beta)
@@ -0,0 +1,226 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class MemSnapshotter(object):
+    """
+    Writes incremental, chunked snapshots of an in-memory replay memory to a directory and restores them.
+
+    Memories describe their contents via `get_snapshot()`, which returns a dict with:
+        - "metadata": JSON-serializable scalars (indices, sizes, ...).
+        - "rings": Dict of ring name -> dict(columns=dict(name -> column), capacity=int, num_written=Optional[int]).
+            Columns are arrays (or lists) with one entry per ring slot. A ring is written sequentially starting at
+            slot `num_written % capacity`, so only the chunks written since the last snapshot need to be stored
+            again. Rings without a `num_written` counter are stored in full every time.
+        - "arrays": Dict of name -> (small) array which is stored in full every time (e.g. priorities).
+    `restore_snapshot(snapshot)` receives the same structure with all columns as numpy arrays.
+
+    Dirty chunks are copied on the calling thread (a plain memory copy). Compressing and writing them happens in a
+    background thread, so inserting into the memory can continue while a snapshot is written. Every snapshot
+    generation writes new chunk files and switches over by atomically replacing the manifest, so a crash during
+    a snapshot leaves the previous snapshot intact.
+    """
+
+    MANIFEST = "snapshot.json"
+
+    def __init__(self, directory, chunk_size=65536, background=True):
+        """
+        Args:
+            directory (str): Snapshot directory. Created if it does not exist.
+            chunk_size (int): Number of ring slots per chunk file.
+            background (bool): Whether to compress and write chunks in a background thread.
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.background = background
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        self.manifest = None
+        if os.path.exists(self._path(self.MANIFEST)):
+            with open(self._path(self.MANIFEST)) as f:
+                self.manifest = json.load(f)
+        # Ring counters of the last snapshot written by (or restored into) this snapshotter.
+        self.last_num_written = None
+        self.thread = None
+        self.error = None
+
+    def _path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def snapshot(self, memory, block=False):
+        """
+        Writes a snapshot of the memory. Waits for a previous snapshot still being written.
+
+        Args:
+            memory (any): Memory implementing `get_snapshot()`.
+            block (bool): Whether to wait until the snapshot is written.
+
+        Returns:
+            bool: False if the memory has no state to snapshot (e.g. because it lives in graph variables),
+                True otherwise.
+        """
+        self.wait()
+        snapshot = memory.get_snapshot()
+        if snapshot is None:
+            return False
+
+        generation = self.manifest["generation"] + 1 if self.manifest is not None else 0
+        previous_rings = self.manifest["rings"] if self.manifest is not None else {}
+        manifest = dict(generation=generation, metadata=snapshot["metadata"], rings={}, arrays=None)
+        chunks = []
+        for ring_name, ring in snapshot["rings"].items():
+            capacity = ring["capacity"]
+            num_written = ring.get("num_written", None)
+            num_chunks = (capacity + self.chunk_size - 1) // self.chunk_size
+
+            previous_ring = previous_rings.get(ring_name, None)
+            dirty_chunks = None
+            if num_written is not None and self.last_num_written is not None and previous_ring is not None and \
+                    previous_ring["capacity"] == capacity and previous_ring["chunk_size"] == self.chunk_size and \
+                    ring_name in self.last_num_written:
+                num_new = num_written - self.last_num_written[ring_name]
+                if 0 <= num_new < capacity:
+                    slots = (self.last_num_written[ring_name] + np.arange(num_new)) % capacity
+                    dirty_chunks = set(np.unique(slots // self.chunk_size).tolist())
+
+            manifest_ring = dict(capacity=capacity, num_written=num_written, chunk_size=self.chunk_size, columns={})
+            for column_name, column in ring["columns"].items():
+                previous_files = previous_ring["columns"].get(column_name, {}) if dirty_chunks is not None else {}
+                files = {}
+                for chunk in range(num_chunks):
+                    start = chunk * self.chunk_size
+                    if start >= len(column):
+                        break
+                    key = str(chunk)
+                    if key in previous_files and chunk not in dirty_chunks and \
+                            min(start + self.chunk_size, capacity) <= len(column):
+                        files[key] = previous_files[key]
+                        continue
+                    files[key] = "{}.{}.{}.npz".format(column_name.replace("/", "-"), chunk, generation)
+                    chunks.append((files[key], self._copy_chunk(column, start, start + self.chunk_size)))
+                manifest_ring["columns"][column_name] = files
+            manifest["rings"][ring_name] = manifest_ring
+
+        arrays = {name: np.array(array) for name, array in snapshot["arrays"].items()}
+        if len(arrays) > 0:
+            manifest["arrays"] = "arrays.{}.npz".format(generation)
+            chunks.append((manifest["arrays"], arrays))
+
+        self.manifest = manifest
+        self.last_num_written = {name: ring.get("num_written", None) for name, ring in snapshot["rings"].items()}
+        if self.background and not block:
+            self.thread = threading.Thread(target=self._write, args=(manifest, chunks))
+            self.thread.daemon = True
+            self.thread.start()
+        else:
+            self._write(manifest, chunks)
+            self._raise_error()
+        return True
+
+    @staticmethod
+    def _copy_chunk(column, start, stop):
+        values = column[start:stop]
+        if isinstance(values, np.ndarray):
+            return dict(values=np.array(values))
+        # Lists of arbitrary (python or backend) objects.
+        copied = np.empty(shape=(len(values),), dtype=object)
+        for i, value in enumerate(values):
+            copied[i] = value
+        return dict(values=copied)
+
+    def _write(self, manifest, chunks):
+        try:
+            for file_name, arrays in chunks:
+                temp_path = self._path(file_name + ".tmp")
+                with open(temp_path, "wb") as f:
+                    np.savez_compressed(f, **arrays)
+                os.rename(temp_path, self._path(file_name))
+
+            temp_path = self._path(self.MANIFEST + ".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(manifest, f)
+            os.rename(temp_path, self._path(self.MANIFEST))
+
+            # Remove files no longer referenced.
+            referenced = {manifest["arrays"]}
+            for ring in manifest["rings"].values():
+                for files in ring["columns"].values():
+                    referenced.update(files.values())
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith(".npz") and file_name not in referenced:
+                    os.remove(self._path(file_name))
+        except Exception as e:
+            # Chunks of this generation may be missing, so the next snapshot must be a full one.
+            self.last_num_written = None
+            self.error = e
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RLGraphError("Writing memory snapshot to {} failed: {}".format(self.directory, error))
+
+    def wait(self):
+        """
+        Waits until the snapshot currently being written (if any) is on disk.
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self._raise_error()
+
+    def restore(self, memory):
+        """
+        Restores the latest snapshot in the directory into the memory.
+
+        Args:
+            memory (any): Memory implementing `restore_snapshot(snapshot)`.
+
+        Raises:
+            RLGraphError: If the directory contains no snapshot.
+        """
+        self.wait()
+        if self.manifest is None:
+            raise RLGraphError("No memory snapshot found in {}.".format(self.directory))
+
+        def load(file_name):
+            with np.load(self._path(file_name), allow_pickle=True) as data:
+                return {name: data[name] for name in data.files}
+
+        rings = {}
+        for ring_name, ring in self.manifest["rings"].items():
+            columns = {}
+            for column_name, files in ring["columns"].items():
+                chunks = [load(files[str(chunk)])["values"] for chunk in range(len(files))]
+                columns[column_name] = np.concatenate(chunks) if len(chunks) > 0 else np.empty(shape=(0,))
+            rings[ring_name] = dict(columns=columns, capacity=ring["capacity"], num_written=ring["num_written"])
+        memory.restore_snapshot(dict(
+            metadata=self.manifest["metadata"],
+            rings=rings,
+            arrays=load(self.manifest["arrays"]) if self.manifest["arrays"] else {}
+        ))
+        self.last_num_written = {name: ring["num_written"] for name, ring in self.manifest["rings"].items()}
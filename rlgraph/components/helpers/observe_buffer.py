@@ -0,0 +1,196 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from rlgraph.spaces.containers import ContainerSpace
+from rlgraph.utils.ops import get_leaf_paths, path_lookup
+from rlgraph.utils.util import convert_dtype
+
+
+class ObserveBuffer(object):
+    """
+    Buffer for the observed transitions of one environment in `Agent.observe`.
+
+    Records are written into preallocated numpy arrays (one per primitive component of the state- and action
+    spaces). Container states and actions are written component by component by following precomputed paths, so
+    no flattening of the observed values is necessary. `get_records` returns zero-copy slices of the filled
+    arrays. Since graph-side memories may keep references to the inserted data, `clear` hands the arrays over and
+    fresh ones are allocated for the next records instead of overwriting them.
+    """
+
+    def __init__(self, capacity, state_space, action_space, state_keys=None, action_keys=None):
+        """
+        Args:
+            capacity (int): Number of records to preallocate. Grows if more records are written before clearing.
+            state_space (Space): The (preprocessed) state space without batch rank.
+            action_space (Space): The action space without batch rank.
+            state_keys (Optional[list]): Flat keys of a container state space used by `get_records`.
+            action_keys (Optional[list]): Flat keys of a container action space used by `get_records`.
+        """
+        self.capacity = capacity
+        self.container_states = isinstance(state_space, ContainerSpace)
+        self.container_actions = isinstance(action_space, ContainerSpace)
+        # Paths to the primitive components in the same order as `Space.flatten()`.
+        self.state_paths = get_leaf_paths(state_space)
+        self.action_paths = get_leaf_paths(action_space)
+        self.state_dtypes = [convert_dtype(path_lookup(state_space, path).dtype, to="np") for path in self.state_paths]
+        self.action_dtypes = [
+            convert_dtype(path_lookup(action_space, path).dtype, to="np") for path in self.action_paths
+        ]
+        self.state_keys = state_keys
+        self.action_keys = action_keys
+
+        self.size = 0
+        self.states = None
+        self.next_states = None
+        self.actions = None
+        self.rewards = None
+        self.terminals = None
+        self.internals = []
+
+    def _allocate(self, capacity, states, actions, batched):
+        """
+        Allocates one array per primitive component. Shapes are taken from the first records (callers may add
+        ranks to the spaces' shapes), dtypes from the spaces.
+        """
+        def create(paths, dtypes, value):
+            arrays = []
+            for path, dtype in zip(paths, dtypes):
+                shape = np.shape(path_lookup(value, path))
+                if batched:
+                    shape = shape[1:]
+                arrays.append(np.empty(shape=(capacity,) + shape, dtype=dtype))
+            return arrays
+
+        self.states = create(self.state_paths, self.state_dtypes, states)
+        self.next_states = create(self.state_paths, self.state_dtypes, states)
+        self.actions = create(self.action_paths, self.action_dtypes, actions)
+        self.rewards = np.empty(shape=(capacity,), dtype=np.float32)
+        self.terminals = np.empty(shape=(capacity,), dtype=np.bool_)
+        self.capacity = capacity
+
+    def _grow(self, capacity):
+        def grow(array):
+            new_array = np.empty(shape=(capacity,) + array.shape[1:], dtype=array.dtype)
+            new_array[:self.size] = array[:self.size]
+            return new_array
+
+        self.states = [grow(array) for array in self.states]
+        self.next_states = [grow(array) for array in self.next_states]
+        self.actions = [grow(array) for array in self.actions]
+        self.rewards = grow(self.rewards)
+        self.terminals = grow(self.terminals)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.size
+
+    def add(self, states, actions, internals, rewards, next_states, terminals, batched=False):
+        """
+        Writes one record or a batch of records.
+
+        Args:
+            states (any): Preprocessed state(s).
+            actions (any): Action(s).
+            internals (list): Internal state(s).
+            rewards (Union[float,list,ndarray]): Reward(s).
+            next_states (any): Preprocessed next state(s).
+            terminals (Union[bool,list,ndarray]): Terminal(s).
+            batched (bool): Whether the values are batches of records.
+        """
+        num_records = len(rewards) if batched else 1
+        if self.states is None:
+            self._allocate(max(self.capacity, num_records), states, actions, batched)
+        elif self.size + num_records > self.capacity:
+            self._grow(max(2 * self.capacity, self.size + num_records))
+
+        if batched:
+            index = slice(self.size, self.size + num_records)
+            self.internals.extend(internals)
+        else:
+            index = self.size
+            self.internals.append(internals)
+        for path, array, next_array in zip(self.state_paths, self.states, self.next_states):
+            array[index] = path_lookup(states, path)
+            next_array[index] = path_lookup(next_states, path)
+        for path, array in zip(self.action_paths, self.actions):
+            array[index] = path_lookup(actions, path)
+        self.rewards[index] = rewards
+        self.terminals[index] = terminals
+        self.size += num_records
+
+    def get_records(self):
+        """
+        Returns the buffered records as zero-copy slices.
+
+        Returns:
+            tuple: States, actions, internals, rewards, next states and terminals. Container states and actions
+                are dicts of flat key -> array.
+        """
+        def squeezed(array):
+            # Squeeze, but do not squeeze (1,) to ().
+            return np.squeeze(array) if len(array) > 1 else np.reshape(array, (1,))
+
+        if self.container_states:
+            states = {key: squeezed(array[:self.size]) for key, array in zip(self.state_keys, self.states)}
+            next_states = {key: squeezed(array[:self.size]) for key, array in zip(self.state_keys, self.next_states)}
+        else:
+            states = self.states[0][:self.size]
+            next_states = self.next_states[0][:self.size]
+        if self.container_actions:
+            actions = {key: squeezed(array[:self.size]) for key, array in zip(self.action_keys, self.actions)}
+        else:
+            actions = self.actions[0][:self.size]
+        return states, actions, np.asarray(self.internals), self.rewards[:self.size], next_states, \
+            self.terminals[:self.size]
+
+    def get_column(self, name):
+        """
+        Returns the buffered values of one column as a list of records (or, for container spaces, a tuple of such
+        lists per flat key). For inspection only.
+
+        Args:
+            name (str): One of "states", "actions", "internals", "rewards", "next_states", "terminals".
+
+        Returns:
+            Union[list,tuple]: The buffered values.
+        """
+        if name == "internals":
+            return list(self.internals)
+        values = getattr(self, name)
+        if name in ["rewards", "terminals"]:
+            return [] if values is None else list(values[:self.size])
+
+        container = self.container_states if name in ["states", "next_states"] else self.container_actions
+        paths = self.state_paths if name in ["states", "next_states"] else self.action_paths
+        columns = [list(array[:self.size]) for array in values] if values is not None else [[] for _ in paths]
+        return tuple(columns) if container else columns[0]
+
+    def clear(self):
+        """
+        Empties the buffer. Arrays returned by `get_records` stay valid.
+        """
+        self.size = 0
+        self.states = None
+        self.next_states = None
+        self.actions = None
+        self.rewards = None
+        self.terminals = None
+        self.internals = []
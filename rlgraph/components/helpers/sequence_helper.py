@@ -20,6 +20,7 @@ from __future__ import print_function
 from rlgraph import get_backend
 from rlgraph.components.component import Component
 from rlgraph.utils.decorators import rlgraph_api
+from rlgraph.utils.pytorch_util import pytorch_reverse_discounted_cumsum
 
 if get_backend() == "tf":
     import tensorflow as tf
@@ -89,17 +90,10 @@ class SequenceHelper(Component):
             )
             return sequence_lengths.stack()
         elif get_backend() == "pytorch":
-            sequence_lengths = []
-            length = 0
-            for index in sequence_indices:
-                length += 1
-                if index == 1:
-                    sequence_lengths.append(length)
-                    length = 0
-            # Append final sequence.
-            if length > 0:
-                sequence_lengths.append(length)
-            return torch.tensor(sequence_lengths, dtype=torch.int32)
+            sequence_ends = self._pytorch_sequence_ends(sequence_indices)
+            # Lengths are the distances between consecutive sequence ends.
+            sequence_lengths = sequence_ends - torch.cat((torch.tensor([-1]), sequence_ends[:-1]), 0)
+            return sequence_lengths.int()
 
     @rlgraph_api(returns=2)
     def _graph_fn_calc_sequence_decays(self, sequence_indices, decay=0.9):
@@ -182,22 +176,14 @@ class SequenceHelper(Component):
             )
             return tf.stop_gradient(sequence_lengths.stack()), tf.stop_gradient(decays.stack())
         elif get_backend() == "pytorch":
-            sequence_lengths = []
-            decays = []
-
-            length = 0
-            for index in sequence_indices:
-                # Compute decay based on sequence length.
-                decays.append(pow(decay, length))
-                length += 1
-                if index == 1:
-                    sequence_lengths.append(length)
-                    length = 0
-
-            # Append final sequence.
-            if length > 0:
-                sequence_lengths.append(length)
-            return torch.tensor(sequence_lengths, dtype=torch.int32), torch.tensor(decays, dtype=torch.int32)
+            sequence_ends = self._pytorch_sequence_ends(sequence_indices)
+            sequence_starts = torch.cat((torch.tensor([0]), sequence_ends[:-1] + 1), 0)
+            sequence_lengths = sequence_ends + 1 - sequence_starts
+            # Position of each element within its sequence: index - start index of the sequence.
+            positions = torch.arange(len(sequence_indices)) - \
+                torch.repeat_interleave(sequence_starts, sequence_lengths)
+            decays = torch.pow(float(decay), positions.float())
+            return sequence_lengths.int(), decays
 
     @rlgraph_api
     def _graph_fn_reverse_apply_decays_to_sequence(self, values, sequence_indices, decay=0.9):
@@ -260,24 +246,12 @@ class SequenceHelper(Component):
             return tf.stop_gradient(decayed_values)
 
         elif get_backend() == "pytorch":
-            # Scan sequences in reverse:
-            decayed_values = []
-            i = len(values.data) - 1
-            prev_v = 0
-            for v in reversed(values.data):
-                # Arrived at new sequence, start over.
-                if sequence_indices[i] == 1:
-                    prev_v = 0
-
-                # Accumulate prior value.
-                accum_v = v + decay * prev_v
-                decayed_values.append(accum_v)
-                prev_v = accum_v
-
-                i -= 1
-
-            # Reverse, convert, and return final.
-            return torch.tensor(list(reversed(decayed_values)), dtype=torch.float32)
+            # Accumulate in reverse, starting over (decay 0) at each sequence end.
+            coefficients = torch.where(
+                sequence_indices.reshape(-1) != 0, torch.zeros(len(sequence_indices)),
+                torch.full((len(sequence_indices),), float(decay))
+            )
+            return pytorch_reverse_discounted_cumsum(values.detach().float(), coefficients)
 
     @rlgraph_api
     def _graph_fn_bootstrap_values(self, rewards, values, terminals, sequence_indices, discount=0.99):
@@ -369,30 +343,30 @@ class SequenceHelper(Component):
             # Squeeze because we inserted
             return tf.squeeze(deltas)
         elif get_backend() == "pytorch":
-            deltas = []
-            discount_tensor = torch.tensor(discount)
-            start_index = 0
-            i = 0
-            if len(values) > 1:
-                last_sequence = torch.unsqueeze(sequence_indices[-1], -1)
-                sequence_indices = torch.cat((sequence_indices[:-1], torch.ones_like(last_sequence)), 0)
-
-            for _ in range(len(values)):
-                if sequence_indices[i]:
-                    # Compute deltas for this sub-sequence.
-                    # Cannot do this all at once because we would need the correct offsets for each sub-sequence.
-                    baseline_slice = list(values[start_index:i + 1])
-                    if terminals[i]:
-                        baseline_slice.append(0)
-                    else:
-                        baseline_slice.append(values[-1])
-                    adjusted_v = torch.tensor(baseline_slice)
-
-                    # +1 because we want to include i-th value.
-                    delta = rewards[start_index:i + 1] + discount_tensor * adjusted_v[1:] - adjusted_v[:-1]
-                    deltas.extend(delta)
-                    start_index = i + 1
-                i += 1
-
-            return torch.tensor(deltas)
+            values = values.detach().reshape(-1).float()
+            if len(values) == 0:
+                return values
+            # Again ensure last index is 1 for any sub-sample arriving here.
+            sequence_ends = sequence_indices.reshape(-1) != 0
+            sequence_ends[-1] = True
+
+            # Within a sequence, bootstrap with the next value. At sequence ends, bootstrap with 0 if terminal,
+            # else with the sequence's last value.
+            next_values = torch.cat((values[1:], values[-1:]), 0)
+            bootstrap_values = torch.where(terminals.reshape(-1) != 0, torch.zeros_like(values), values)
+            next_values = torch.where(sequence_ends, bootstrap_values, next_values)
+            # Discount arrives as numpy or python value.
+            return rewards.reshape(-1).float() + float(discount) * next_values - values
+
+    @staticmethod
+    def _pytorch_sequence_ends(sequence_indices):
+        """
+        Returns the indices of the last elements of all sequences, including the final (possibly not terminated)
+        sequence.
+        """
+        sequence_ends = torch.nonzero(sequence_indices.reshape(-1) != 0).reshape(-1)
+        num_values = len(sequence_indices)
+        if num_values > 0 and (len(sequence_ends) == 0 or sequence_ends[-1] != num_values - 1):
+            sequence_ends = torch.cat((sequence_ends, torch.tensor([num_values - 1])), 0)
+        return sequence_ends
 
@@ -18,11 +18,10 @@ from __future__ import absolute_import, division, print_function
 import operator
 
 import numpy as np
-from six.moves import xrange as range_
 from rlgraph import get_backend
 from rlgraph.utils import util, DataOpDict
 from rlgraph.utils.define_by_run_ops import define_by_run_unflatten
-from rlgraph.utils.util import SMALL_NUMBER, get_rank
+from rlgraph.utils.util import get_rank
 from rlgraph.components.memories.memory import Memory
 from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree, MinSumSegmentTree
 from rlgraph.utils.decorators import rlgraph_api
@@ -46,6 +45,8 @@ class MemPrioritizedReplay(Memory):
         self.capacity = capacity
 
         self.size = 0
+        # Total number of records ever inserted (for incremental snapshots).
+        self.num_inserted = 0
         self.max_priority = 1.0
         self.alpha = alpha
         self.beta = beta
@@ -60,9 +61,9 @@ class MemPrioritizedReplay(Memory):
             self.priority_capacity *= 2
 
         # Create segment trees, initialize with neutral elements.
-        sum_values = [0.0 for _ in range_(2 * self.priority_capacity)]
+        sum_values = np.zeros(shape=(2 * self.priority_capacity,))
         sum_segment_tree = MemSegmentTree(sum_values, self.priority_capacity, operator.add)
-        min_values = [float('inf') for _ in range_(2 * self.priority_capacity)]
+        min_values = np.full(shape=(2 * self.priority_capacity,), fill_value=float('inf'))
         min_segment_tree = MemSegmentTree(min_values, self.priority_capacity, min)
 
         self.merged_segment_tree = MinSumSegmentTree(
@@ -85,9 +86,11 @@ class MemPrioritizedReplay(Memory):
             self.merged_segment_tree.insert(self.index, self.default_new_weight)
         else:
             insert_indices = np.arange(start=self.index, stop=self.index + num_records) % self.capacity
+            self.merged_segment_tree.insert_batch(
+                insert_indices, np.full(shape=(num_records,), fill_value=self.default_new_weight)
+            )
             i = 0
             for insert_index in insert_indices:
-                self.merged_segment_tree.insert(insert_index, self.default_new_weight)
                 record = {}
                 for name, record_values in records.items():
                     record[name] = record_values[i]
@@ -100,26 +103,15 @@ class MemPrioritizedReplay(Memory):
         # Update indices
         self.index = (self.index + num_records) % self.capacity
         self.size = min(self.size + num_records, self.capacity)
+        self.num_inserted += num_records
 
         return None
 
     @rlgraph_api
     def _graph_fn_get_records(self, num_records=1):
         available_records = min(num_records, self.size)
-        indices = []
-        prob_sum = self.merged_segment_tree.sum_segment_tree.get_sum(0, self.size - 1)
-        samples = np.random.random(size=(available_records,)) * prob_sum
-        for sample in samples:
-            indices.append(self.merged_segment_tree.sum_segment_tree.index_of_prefixsum(prefix_sum=sample))
-
-        sum_prob = self.merged_segment_tree.sum_segment_tree.get_sum() + SMALL_NUMBER
-        min_prob = self.merged_segment_tree.min_segment_tree.get_min_value() / sum_prob
-        max_weight = (min_prob * self.size) ** (-self.beta)
-        weights = []
-        for index in indices:
-            sample_prob = self.merged_segment_tree.sum_segment_tree.get(index) / sum_prob
-            weight = (sample_prob * self.size) ** (-self.beta)
-            weights.append(weight / max_weight)
+        indices = self.merged_segment_tree.sample_batch(available_records, limit=self.size - 1)
+        weights = self.merged_segment_tree.get_importance_weights(indices, beta=self.beta)
 
         if get_backend() == "pytorch":
             indices = torch.tensor(indices)
@@ -137,14 +129,40 @@ class MemPrioritizedReplay(Memory):
 
     @rlgraph_api(must_be_complete=False)
     def _graph_fn_update_records(self, indices, update):
-        for index, loss in zip(indices, update):
-            priority = np.power(loss, self.alpha)
-            self.merged_segment_tree.insert(index, priority)
-            self.max_priority = max(self.max_priority, priority)
+        priorities = np.power(np.asarray(update), self.alpha)
+        if len(priorities) == 0:
+            return
+        self.merged_segment_tree.insert_batch(np.asarray(indices), priorities)
+        self.max_priority = max(self.max_priority, np.max(priorities))
 
     def get_state(self):
         return {
             "size": self.size,
             "index": self.index,
             "max_priority": self.max_priority
-        }
\ No newline at end of file
+        }
+
+    def get_snapshot(self):
+        priority_leaves = self.merged_segment_tree.sum_segment_tree.values[self.priority_capacity:]
+        return dict(
+            metadata=dict(
+                index=self.index, size=self.size, num_inserted=self.num_inserted,
+                max_priority=float(self.max_priority)
+            ),
+            rings=dict(records=dict(
+                columns=dict(records=self.memory_values), capacity=self.capacity, num_written=self.num_inserted
+            )),
+            arrays=dict(priorities=priority_leaves[:self.capacity])
+        )
+
+    def restore_snapshot(self, snapshot):
+        metadata = snapshot["metadata"]
+        self.index = metadata["index"]
+        self.size = metadata["size"]
+        self.num_inserted = metadata["num_inserted"]
+        self.max_priority = metadata["max_priority"]
+        self.memory_values = list(snapshot["rings"]["records"]["columns"]["records"])
+
+        self.merged_segment_tree.sum_segment_tree.values[:] = 0.0
+        self.merged_segment_tree.min_segment_tree.values[:] = float("inf")
+        self.merged_segment_tree.insert_batch(np.arange(self.size), snapshot["arrays"]["priorities"][:self.size])
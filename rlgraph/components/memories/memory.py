@@ -15,6 +15,7 @@
 
 from __future__ import absolute_import, division, print_function
 
+from rlgraph import get_backend
 from rlgraph.utils.ops import FLATTEN_SCOPE_PREFIX
 from rlgraph.components.component import Component, rlgraph_api
 from rlgraph.utils import FlattenedDataOp
@@ -123,3 +124,33 @@ class Memory(Component):
             SingleDataOp: The size (int) of the memory.
         """
         return self.read_variable(self.size)
+
+    def get_snapshot(self):
+        """
+        Returns the memory contents for a `MemSnapshotter`.
+
+        With the TensorFlow backend, all memory contents are graph variables, which are stored with the model
+        checkpoint, so there is nothing to snapshot.
+
+        Returns:
+            Optional[dict]: Snapshot with keys "metadata", "rings" and "arrays" or None if the contents are
+                stored with the model.
+        """
+        if get_backend() != "pytorch":
+            return None
+        return dict(
+            metadata=dict(size=self.size),
+            rings=dict(records=dict(columns=self.memory, capacity=self.capacity)),
+            arrays={}
+        )
+
+    def restore_snapshot(self, snapshot):
+        """
+        Restores the memory contents from a snapshot created by `get_snapshot`.
+
+        Args:
+            snapshot (dict): Snapshot with keys "metadata", "rings" and "arrays".
+        """
+        self.size = snapshot["metadata"]["size"]
+        for name, values in snapshot["rings"]["records"]["columns"].items():
+            self.memory[name] = list(values)
@@ -127,3 +127,13 @@ class ReplayMemory(Memory):
             "size": self.size,
             "memory": self.memory
         }
+
+    def get_snapshot(self):
+        snapshot = super(ReplayMemory, self).get_snapshot()
+        if snapshot is not None:
+            snapshot["metadata"]["index"] = self.index
+        return snapshot
+
+    def restore_snapshot(self, snapshot):
+        super(ReplayMemory, self).restore_snapshot(snapshot)
+        self.index = snapshot["metadata"]["index"]
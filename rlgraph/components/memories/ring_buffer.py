@@ -22,6 +22,7 @@ from rlgraph.components.memories.memory import Memory
 from rlgraph.utils import util, DataOpDict
 from rlgraph.utils.decorators import rlgraph_api
 from rlgraph.utils.define_by_run_ops import define_by_run_unflatten
+from rlgraph.utils.ops import FlattenedDataOp
 from rlgraph.utils.util import get_batch_size
 
 if get_backend() == "tf":
@@ -36,21 +37,37 @@ class RingBuffer(Memory):
     Simple ring-buffer to be used for on-policy sampling based on sample count or episodes.
     Fetches most recently added memories.
     """
-    def __init__(self, capacity=1000, scope="ring-buffer", **kwargs):  #auto_sequence_indices=True
+    def __init__(self, capacity=1000, sequence_sampling="recent", sequence_length=None, burn_in=0,
+                 scope="ring-buffer", **kwargs):  #auto_sequence_indices=True
         """
         Args:
+            sequence_sampling (str): How `get_sequences` picks episodes. One of "recent" (the most recent episodes)
+                or "uniform" (uniformly sampled stored episodes, with replacement).
+            sequence_length (Optional[int]): If given, `get_sequences` returns sub-sequences of this length (plus
+                `burn_in`) starting at a uniformly sampled offset into each picked episode instead of whole episodes.
+            burn_in (int): Number of additional leading time steps of each sub-sequence, e.g. to warm up recurrent
+                states before the `sequence_length` training steps.
             #auto_sequence_indices (bool): Whether to add sequence_indices=True automatically whenever data is inserted
             #    and the last item does not have `terminal`=True. This requires `sequence_indices` to be a key in
             #    `self.record_space`.
         """
         super(RingBuffer, self).__init__(capacity, scope=scope, **kwargs)
 
+        assert sequence_sampling in ["recent", "uniform"], \
+            "ERROR: sequence_sampling must be 'recent' or 'uniform', but is '{}'!".format(sequence_sampling)
+        self.sequence_sampling = sequence_sampling
+        self.sequence_length = sequence_length
+        self.burn_in = burn_in
+
         #self.auto_sequence_indices = auto_sequence_indices
 
         self.index = None
         self.states = None
         self.num_episodes = None
         self.episode_indices = None
+        # Position of the oldest episode in `episode_indices` (PyTorch only, where the episode indices are kept as a
+        # ring instead of being shifted on each insert).
+        self.episode_start = 0
         self.flat_record_space = None
 
     def create_variables(self, input_spaces, action_space=None):
@@ -69,6 +86,15 @@ class RingBuffer(Memory):
         self.episode_indices = self.get_variable(name="episode-indices", shape=(self.capacity,),
                                                  dtype=int, trainable=False)
 
+        if get_backend() == "pytorch":
+            # Preallocate the record columns and episode indices, so inserts can write whole slices.
+            for key, space in self.flat_record_space.items():
+                self.memory[key] = torch.zeros(
+                    size=(self.capacity,) + space.shape, dtype=util.convert_dtype(space.dtype, to="pytorch")
+                )
+            self.episode_indices = np.zeros(shape=(self.capacity,), dtype=np.int64)
+            self.episode_start = 0
+
     @rlgraph_api(flatten_ops=True)
     def _graph_fn_insert_records(self, records):
         if get_backend() == "tf":
@@ -141,41 +167,40 @@ class RingBuffer(Memory):
             with tf.control_dependencies(control_inputs=record_updates):
                 return tf.no_op()
         elif get_backend() == "pytorch":
-            # TODO: Unclear if we should do this in numpy and then convert to torch once we sample.
             num_records = get_batch_size(records[self.terminal_key])
-            update_indices = torch.arange(self.index, self.index + num_records) % self.capacity
-
-            # Newly inserted episodes.
-            inserted_episodes = torch.sum(records[self.terminal_key].int(), 0)
+            # Only the last `capacity` records of an oversized batch end up in the buffer.
+            skipped = max(num_records - self.capacity, 0)
+            num_records -= skipped
+            start = (self.index + skipped) % self.capacity
+            # The updated range as at most two contiguous slices of the buffer (split at the wrap-around), and the
+            # respective slices of the inserted records.
+            first = min(num_records, self.capacity - start)
+            buffer_slices = [slice(start, start + first), slice(0, num_records - first)]
+            record_slices = [slice(skipped, skipped + first), slice(skipped + first, skipped + num_records)]
+
+            # Episodes previously existing in the range we insert to (always the oldest ones).
+            episodes_in_insert_range = sum(
+                int(torch.sum(self.memory[self.terminal_key][buffer_slice])) for buffer_slice in buffer_slices
+            )
+            self.episode_start = (self.episode_start + episodes_in_insert_range) % self.capacity
+            self.num_episodes -= episodes_in_insert_range
 
-            # Episodes previously existing in the range we inserted to as indicated
-            # by count of terminals in the that slice.
-            episodes_in_insert_range = 0
-            # Count terminals in inserted range.
-            for index in update_indices:
-                episodes_in_insert_range += int(self.memory[self.terminal_key][index])
-            num_episode_update = self.num_episodes - episodes_in_insert_range + inserted_episodes
-            self.episode_indices[:self.num_episodes - episodes_in_insert_range] = \
-                self.episode_indices[episodes_in_insert_range:self.num_episodes]
-
-            # Insert new episodes starting at previous count minus the ones we removed,
-            # ending at previous count minus removed + inserted.
-            slice_start = self.num_episodes - episodes_in_insert_range
-            slice_end = num_episode_update
-
-            byte_terminals = records[self.terminal_key].byte()
-            mask = torch.masked_select(update_indices, byte_terminals)
-            self.episode_indices[slice_start:slice_end] = mask
+            # Append the buffer indices of the newly inserted episodes to the episode ring.
+            terminal_positions = torch.nonzero(records[self.terminal_key][skipped:]).view(-1).numpy()
+            inserted_episodes = len(terminal_positions)
+            ring_positions = (self.episode_start + self.num_episodes + np.arange(inserted_episodes)) % self.capacity
+            self.episode_indices[ring_positions] = (start + terminal_positions) % self.capacity
+            self.num_episodes += inserted_episodes
 
             # Update indices.
-            self.num_episodes = int(num_episode_update)
-            self.index = (self.index + num_records) % self.capacity
+            self.index = (start + num_records) % self.capacity
             self.size = min(self.size + num_records, self.capacity)
 
             # Updates all the necessary sub-variables in the record.
             for key in self.memory:
-                for i, val in zip(update_indices, records[key]):
-                    self.memory[key][i] = val
+                for buffer_slice, record_slice in zip(buffer_slices, record_slices):
+                    if buffer_slice.stop > buffer_slice.start:
+                        self.memory[key][buffer_slice] = torch.as_tensor(records[key][record_slice])
 
             # The TF version returns no-op, return None so return-val inference system does not throw error.
             return None
@@ -223,7 +248,8 @@ class RingBuffer(Memory):
             # End index is just the pointer to the most recent episode.
             limit = self.episode_indices[stored_episodes - 1]
 
-            limit += tf.where(condition=(start < limit), x=0, y=self.capacity - 1)
+            # Episodes wrapping around the end of the buffer.
+            limit += tf.where(condition=(start <= limit), x=0, y=self.capacity)
             # limit = tf.Print(limit, [stored_episodes, start, limit], summarize=100, message="start | limit")
             indices = tf.range(start=start, limit=limit + 1) % self.capacity
             return self._read_records(indices=indices)
@@ -234,12 +260,13 @@ class RingBuffer(Memory):
             if stored_episodes == available_episodes:
                 start = 0
             else:
-                start = self.episode_indices[stored_episodes - available_episodes - 1] + 1
+                start = self._get_episode_index(stored_episodes - available_episodes - 1) + 1
 
             # End index is just the pointer to the most recent episode.
-            limit = self.episode_indices[stored_episodes - 1]
-            if start >= limit:
-                limit += self.capacity - 1
+            limit = self._get_episode_index(stored_episodes - 1)
+            # Episodes wrapping around the end of the buffer.
+            if start > limit:
+                limit += self.capacity
             indices = torch.arange(start, limit + 1) % self.capacity
 
             records = DataOpDict()
@@ -250,11 +277,145 @@ class RingBuffer(Memory):
             records = define_by_run_unflatten(records)
             return records
 
+    @rlgraph_api
+    def _graph_fn_get_sequences(self, num_sequences=1):
+        """
+        Returns stored episodes (or sub-sequences of them, see `sequence_length`) as a zero-padded batch for recurrent
+        training. Records after the most recent terminal (an unfinished episode) are never returned.
+
+        Args:
+            num_sequences (int): Number of sequences to return. With "recent" sampling, at most the number of stored
+                episodes is returned.
+
+        Returns:
+            Tuple:
+                - The records with shape [B, T, ...], where T is the maximum sequence length in the batch or the fixed
+                    `burn_in` + `sequence_length`. Time steps beyond the length of a sequence are zero.
+                - The sequence lengths (int32) with shape [B].
+        """
+        if get_backend() == "tf":
+            stored_episodes = self.read_variable(self.num_episodes)
+            episode_ends = self.episode_indices[:stored_episodes]
+            # The oldest stored episode starts at the oldest record, all others right after their predecessor.
+            oldest_index = (self.read_variable(self.index) - self.read_variable(self.size)) % self.capacity
+            episode_starts = tf.concat([[oldest_index], episode_ends[:-1] + 1], axis=0)[:stored_episodes] % \
+                self.capacity
+            episode_lengths = (episode_ends - episode_starts) % self.capacity + 1
+
+            if self.sequence_sampling == "uniform":
+                episodes = tf.random_uniform(
+                    shape=(num_sequences * tf.minimum(stored_episodes, 1),), maxval=tf.maximum(stored_episodes, 1),
+                    dtype=tf.int32
+                )
+            else:
+                available_episodes = tf.minimum(num_sequences, stored_episodes)
+                episodes = tf.range(start=stored_episodes - available_episodes, limit=stored_episodes)
+            starts = tf.gather(params=episode_starts, indices=episodes)
+            lengths = tf.gather(params=episode_lengths, indices=episodes)
+
+            if self.sequence_length is not None:
+                max_length = self.burn_in + self.sequence_length
+                offsets = tf.cast(tf.random_uniform(shape=tf.shape(lengths)) * tf.cast(
+                    tf.maximum(lengths - max_length, 0) + 1, dtype=tf.float32), dtype=tf.int32)
+                starts = (starts + offsets) % self.capacity
+                lengths = tf.minimum(lengths - offsets, max_length)
+            else:
+                max_length = tf.maximum(tf.reduce_max(lengths), 0)
+
+            # [B, T] buffer indices, padded time steps are masked out after the gather.
+            indices = (tf.expand_dims(starts, axis=1) + tf.expand_dims(tf.range(max_length), axis=0)) % self.capacity
+            mask = tf.sequence_mask(lengths, maxlen=max_length)
+            records = FlattenedDataOp()
+            for name, variable in self.memory.items():
+                values = self.read_variable(variable, indices)
+                value_mask = tf.reshape(mask, shape=tf.concat([tf.shape(mask), tf.ones_like(tf.shape(values)[2:])], 0))
+                records[name] = tf.where(
+                    tf.broadcast_to(value_mask, tf.shape(values)), values, tf.zeros_like(values)
+                )
+            return records, tf.cast(lengths, dtype=tf.int32)
+        elif get_backend() == "pytorch":
+            num_sequences = int(num_sequences)
+            episode_ends = self._get_contiguous_episode_indices()[:self.num_episodes]
+            oldest_index = (self.index - self.size) % self.capacity
+            episode_starts = np.concatenate([[oldest_index], episode_ends[:-1] + 1])[:self.num_episodes] % \
+                self.capacity
+            episode_lengths = (episode_ends - episode_starts) % self.capacity + 1
+
+            if self.sequence_sampling == "uniform":
+                episodes = np.random.randint(0, max(self.num_episodes, 1),
+                                             size=num_sequences * min(self.num_episodes, 1))
+            else:
+                available_episodes = min(num_sequences, self.num_episodes)
+                episodes = np.arange(self.num_episodes - available_episodes, self.num_episodes)
+            starts = episode_starts[episodes]
+            lengths = episode_lengths[episodes]
+
+            if self.sequence_length is not None:
+                max_length = self.burn_in + self.sequence_length
+                offsets = np.random.randint(0, np.maximum(lengths - max_length, 0) + 1)
+                starts = (starts + offsets) % self.capacity
+                lengths = np.minimum(lengths - offsets, max_length)
+            else:
+                max_length = int(np.max(lengths)) if len(lengths) > 0 else 0
+
+            indices = torch.from_numpy((starts[:, None] + np.arange(max_length)[None, :]) % self.capacity)
+            mask = np.arange(max_length)[None, :] < lengths[:, None]
+            records = DataOpDict()
+            for name, variable in self.memory.items():
+                values = variable[indices]
+                value_mask = torch.from_numpy(mask.reshape(mask.shape + (1,) * (values.dim() - 2)).astype(np.uint8))
+                records[name] = values * value_mask.to(values.dtype)
+            records = define_by_run_unflatten(records)
+            return records, torch.from_numpy(lengths.astype(np.int32))
+
+    def _get_episode_index(self, episode):
+        """
+        Returns the buffer index of the terminal of an episode (PyTorch only).
+
+        Args:
+            episode (int): Position of the episode, 0 being the oldest stored episode.
+
+        Returns:
+            int: The buffer index of the episode's last record.
+        """
+        return int(self.episode_indices[(self.episode_start + episode) % self.capacity])
+
+    def _get_contiguous_episode_indices(self):
+        """
+        Returns:
+            np.ndarray: The episode indices starting with the oldest episode (PyTorch only).
+        """
+        return np.roll(self.episode_indices, -self.episode_start)
+
     def get_state(self):
         return {
             "index": self.index,
             "size": self.size,
             "num_episodes": self.num_episodes,
-            "episode_indices": self.episode_indices,
+            "episode_indices": self._get_contiguous_episode_indices(),
             "memory": self.memory
         }
+
+    def get_snapshot(self):
+        snapshot = super(RingBuffer, self).get_snapshot()
+        if snapshot is not None:
+            snapshot["metadata"]["index"] = self.index
+            snapshot["metadata"]["num_episodes"] = self.num_episodes
+            # Zero-copy numpy views, chunks are copied by the snapshotter.
+            snapshot["rings"]["records"]["columns"] = {key: column.numpy() for key, column in self.memory.items()}
+            snapshot["arrays"]["episode_indices"] = self._get_contiguous_episode_indices()
+        return snapshot
+
+    def restore_snapshot(self, snapshot):
+        self.size = snapshot["metadata"]["size"]
+        for name, values in snapshot["rings"]["records"]["columns"].items():
+            if values.dtype == object:
+                # Snapshots of list-based columns.
+                for i, value in enumerate(values):
+                    self.memory[name][i] = torch.as_tensor(value)
+            else:
+                self.memory[name][:] = torch.as_tensor(values)
+        self.index = snapshot["metadata"]["index"]
+        self.num_episodes = snapshot["metadata"]["num_episodes"]
+        self.episode_indices = np.asarray(snapshot["arrays"]["episode_indices"], dtype=np.int64)
+        self.episode_start = 0
@@ -25,6 +25,7 @@ from rlgraph.environments.openai_gym import OpenAIGymEnv
 from rlgraph.environments.random_env import RandomEnv
 from rlgraph.environments.vector_env import VectorEnv
 from rlgraph.environments.sequential_vector_env import SequentialVectorEnv
+from rlgraph.environments.subproc_vector_env import SubprocVectorEnv
 
 Environment.__lookup_classes__ = dict(
     deterministic=DeterministicEnv,
@@ -40,7 +41,9 @@ Environment.__lookup_classes__ = dict(
     random=RandomEnv,
     randomenv=RandomEnv,
     sequentialvector=SequentialVectorEnv,
-    sequentialvectorenv=SequentialVectorEnv
+    sequentialvectorenv=SequentialVectorEnv,
+    subprocvector=SubprocVectorEnv,
+    subprocvectorenv=SubprocVectorEnv
 )
 
 try:
@@ -20,6 +20,7 @@ from __future__ import print_function
 from queue import Queue
 from threading import Thread
 
+import numpy as np
 from six.moves import xrange as range_
 
 from rlgraph.environments import VectorEnv, Environment
@@ -58,6 +59,8 @@ class SequentialVectorEnv(VectorEnv):
             self.resetter = ThreadedResetter(env_spec, num_background_envs)
         else:
             self.resetter = Resetter()
+        # Results of environments stepped via `step_async` which were not fetched by `step_ready` yet.
+        self.ready_steps = []
 
     def seed(self, seed=None):
         return [env.seed(seed) for env in self.environments]
@@ -71,6 +74,7 @@ class SequentialVectorEnv(VectorEnv):
         return state
 
     def reset_all(self):
+        self.ready_steps = []
         states = []
         for i, env in enumerate(self.environments):
             state, env = self.resetter.swap(self.environments[i])
@@ -88,6 +92,18 @@ class SequentialVectorEnv(VectorEnv):
             infos.append(info)
         return states, rewards, terminals, infos
 
+    def step_async(self, actions, env_indices):
+        # Environments are stepped right away, so all of them are ready at the next `step_ready` call.
+        for index, action in zip(env_indices, actions):
+            self.ready_steps.append((index,) + tuple(self.environments[index].step(action)))
+
+    def step_ready(self, num_environments=1):
+        ready_steps, self.ready_steps = self.ready_steps, []
+        if len(ready_steps) == 0:
+            return np.zeros(shape=(0,), dtype=np.int64), [], [], [], []
+        indices, states, rewards, terminals, infos = (list(values) for values in zip(*ready_steps))
+        return np.asarray(indices, dtype=np.int64), states, rewards, terminals, infos
+
     def render(self, index=0):
         self.environments[index].render()
 
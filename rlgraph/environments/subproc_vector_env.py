@@ -0,0 +1,347 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+import numpy as np
+from six.moves import xrange as range_
+
+from rlgraph.environments import VectorEnv, Environment
+from rlgraph.utils.ops import flatten_op, unflatten_op
+from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.utils.util import convert_dtype
+
+
+def _make_env(env_spec):
+    if isinstance(env_spec, dict):
+        return Environment.from_spec(env_spec)
+    elif hasattr(env_spec, '__call__'):
+        return env_spec()
+    raise ValueError("Env_spec must be either a dict containing an environment spec or a callable"
+                     "returning a new environment object.")
+
+
+def _shared_views(buffers, num_environments):
+    """
+    Creates numpy views of shape [num_environments, *shape] on shared buffers.
+    """
+    return {key: np.frombuffer(raw, dtype=dtype).reshape((num_environments,) + shape)
+            for key, (raw, dtype, shape) in buffers.items()}
+
+
+def _subproc_worker(connection, env_spec, env_indices, num_environments, state_buffers, reset_state_buffers,
+                    reward_buffer, terminal_buffer, auto_reset):
+    """
+    Runs the environments `env_indices` in a worker process. Results are written into the shared buffers,
+    the pipe only carries commands, actions and infos.
+    """
+    # Forked processes inherit the parent's random state.
+    np.random.seed()
+    environments = [_make_env(env_spec) for _ in env_indices]
+    positions = {index: i for i, index in enumerate(env_indices)}
+    states = _shared_views(state_buffers, num_environments)
+    reset_states = _shared_views(reset_state_buffers, num_environments)
+    rewards = np.frombuffer(reward_buffer, dtype=np.float64)
+    terminals = np.frombuffer(terminal_buffer, dtype=np.bool_)
+
+    def write(views, index, state):
+        for key, value in flatten_op(state).items():
+            views[key][index] = value
+
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == "step":
+                infos = []
+                for index, action in zip(*data):
+                    env = environments[positions[index]]
+                    state, reward, terminal, info = env.step(action)
+                    write(states, index, state)
+                    rewards[index] = reward
+                    terminals[index] = terminal
+                    if auto_reset and terminal:
+                        write(reset_states, index, env.reset())
+                    infos.append(info)
+                connection.send(infos)
+            elif command == "reset":
+                for index in data:
+                    write(states, index, environments[positions[index]].reset())
+                connection.send(None)
+            elif command == "seed":
+                connection.send([env.seed(data) for env in environments])
+            elif command == "render":
+                environments[positions[data]].render()
+                connection.send(None)
+            elif command == "terminate":
+                environments[positions[data]].terminate()
+                connection.send(None)
+            elif command == "close":
+                for env in environments:
+                    env.terminate()
+                connection.send(None)
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
+
+
+class SubprocVectorEnv(VectorEnv):
+    """
+    Multi-environment class which steps its environments in parallel in worker processes.
+
+    Each worker process runs a contiguous block of environments. States, rewards and terminals are written by the
+    workers into shared-memory arrays (one [num_environments, *shape] array per primitive component of the state
+    space), so only actions and infos pass through the pipes, which also serve as the step barrier.
+
+    Steps can be split into `step_send` and `step_recv` to overlap stepping with other work. With `step_async` and
+    `step_ready`, subsets of the environments are stepped and whichever finished first are returned. Environments
+    are only returned independently of each other if they run in different processes, so use one process per
+    environment (the default) to avoid waiting for stragglers.
+
+    With `auto_reset`, environments reaching a terminal are reset by their worker right away. The following
+    `reset(index)` then returns the already computed reset state without a round trip.
+    """
+    def __init__(self, num_environments, env_spec, num_processes=None, auto_reset=False, start_method=None,
+                 state_space=None, action_space=None):
+        """
+        Args:
+            num_environments (int): Number of environments.
+            env_spec (Union[dict,callable]): Environment spec or callable returning a new environment. Must be
+                picklable if the "spawn" start method is used.
+            num_processes (Optional[int]): Number of worker processes. Default: One per environment.
+            auto_reset (bool): Whether workers reset environments reaching a terminal right away.
+            start_method (Optional[str]): Multiprocessing start method. Default: The platform's default.
+            state_space (Optional[Space]): State space of the environments. If not given, a temporary local
+                environment is created to read the spaces.
+            action_space (Optional[Space]): Action space of the environments.
+        """
+        if state_space is None or action_space is None:
+            env = _make_env(env_spec)
+            state_space, action_space = env.state_space, env.action_space
+            env.terminate()
+        super(SubprocVectorEnv, self).__init__(
+            num_environments=num_environments, state_space=state_space, action_space=action_space
+        )
+        self.auto_reset = auto_reset
+        self.num_processes = min(num_processes or num_environments, num_environments)
+
+        context = multiprocessing.get_context(start_method) if start_method else multiprocessing
+        flat_state_space = self.state_space.flatten()
+        self.container_states = not (len(flat_state_space) == 1 and "" in flat_state_space)
+
+        def create_buffers():
+            buffers = {}
+            for key, space in flat_state_space.items():
+                dtype = np.dtype(convert_dtype(space.dtype, to="np"))
+                shape = tuple(space.shape)
+                num_bytes = int(num_environments * np.prod(shape, dtype=np.int64)) * dtype.itemsize
+                buffers[key] = (context.RawArray("b", max(num_bytes, 1)), dtype, shape)
+            return buffers
+
+        state_buffers = create_buffers()
+        reset_state_buffers = create_buffers() if self.auto_reset else {}
+        reward_buffer = context.RawArray("b", num_environments * np.dtype(np.float64).itemsize)
+        terminal_buffer = context.RawArray("b", num_environments)
+        self.states = _shared_views(state_buffers, num_environments)
+        self.reset_states = _shared_views(reset_state_buffers, num_environments)
+        self.rewards = np.frombuffer(reward_buffer, dtype=np.float64)
+        self.terminals = np.frombuffer(terminal_buffer, dtype=np.bool_)
+        # Environments reset by their worker after a terminal, whose reset state has not been fetched yet.
+        self.pending_resets = np.zeros(shape=(num_environments,), dtype=np.bool_)
+        # Environments currently stepping.
+        self.stepping = np.zeros(shape=(num_environments,), dtype=np.bool_)
+
+        self.env_indices = [list(indices) for indices in np.array_split(np.arange(num_environments),
+                                                                        self.num_processes)]
+        # Process index per environment.
+        self.env_processes = np.concatenate([[i] * len(indices) for i, indices in enumerate(self.env_indices)])
+        # Env indices of the step commands sent to each process and not received yet (in order).
+        self.pending_steps = [deque() for _ in range_(self.num_processes)]
+        # Step results received while sending other commands, to be returned by the next step receive.
+        self.received_steps = []
+        self.connections = []
+        self.processes = []
+        for env_indices in self.env_indices:
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=_subproc_worker, args=(
+                child_connection, env_spec, [int(i) for i in env_indices], num_environments, state_buffers,
+                reset_state_buffers, reward_buffer, terminal_buffer, self.auto_reset
+            ))
+            process.daemon = True
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def _get_states(self, views, indices=None):
+        """
+        Copies states out of the shared buffers.
+
+        Returns:
+            Union[ndarray,list]: The states as one array or, for container state spaces, as a list of
+                (nested) per-environment states.
+        """
+        if indices is None:
+            indices = slice(None)
+        if not self.container_states:
+            return np.array(views[""][indices])
+        flat_states = {key: np.array(view[indices]) for key, view in views.items()}
+        num_states = len(next(iter(flat_states.values())))
+        return [unflatten_op({key: value[i] for key, value in flat_states.items()}) for i in range_(num_states)]
+
+    def _request(self, process, command, data=None):
+        """
+        Sends a command to a worker process and returns its reply. Results of steps still pending in that process
+        are received first and kept for the next step receive.
+        """
+        connection = self.connections[process]
+        while len(self.pending_steps[process]) > 0:
+            self.received_steps.append((self.pending_steps[process].popleft(), connection.recv()))
+        connection.send((command, data))
+        return connection.recv()
+
+    def seed(self, seed=None):
+        return [seed_ for process in range_(self.num_processes) for seed_ in self._request(process, "seed", seed)]
+
+    def get_env(self, index=0):
+        # Sub-environments only exist in the worker processes.
+        return None
+
+    def reset(self, index=0):
+        if self.pending_resets[index]:
+            self.pending_resets[index] = False
+            return self._get_states(self.reset_states, index)
+        self._request(self.env_processes[index], "reset", [index])
+        return self._get_states(self.states, index)
+
+    def reset_all(self):
+        if np.any(self.stepping):
+            self._wait_steps(self.num_environments)
+        for connection, env_indices in zip(self.connections, self.env_indices):
+            connection.send(("reset", env_indices))
+        for connection in self.connections:
+            connection.recv()
+        self.pending_resets[:] = False
+        return self._get_states(self.states)
+
+    def step(self, actions, **kwargs):
+        self.step_send(actions)
+        return self.step_recv()
+
+    def step_send(self, actions):
+        """
+        Sends actions to all environments without waiting for the results.
+
+        Args:
+            actions (Union[list,ndarray]): One action per environment.
+        """
+        self.step_async(actions, np.arange(self.num_environments))
+
+    def step_recv(self):
+        """
+        Waits for the results of the step started by `step_send`.
+
+        Returns:
+            tuple: States, rewards, terminals and infos of all environments.
+        """
+        indices, infos = self._wait_steps(self.num_environments)
+        ordered_infos = [None] * self.num_environments
+        for index, info in zip(indices, infos):
+            ordered_infos[index] = info
+        terminals = np.array(self.terminals)
+        if self.auto_reset:
+            self.pending_resets |= terminals
+        return self._get_states(self.states), np.array(self.rewards), terminals, ordered_infos
+
+    def step_async(self, actions, env_indices):
+        env_indices = np.asarray(env_indices, dtype=np.int64)
+        if np.any(self.stepping[env_indices]):
+            raise RLGraphError("Cannot send actions to environments whose previous step was not received yet.")
+        processes = self.env_processes[env_indices]
+        for process in np.unique(processes):
+            positions = np.flatnonzero(processes == process)
+            indices = [int(env_indices[i]) for i in positions]
+            self.connections[process].send(("step", (indices, [actions[i] for i in positions])))
+            self.pending_steps[process].append(indices)
+        self.stepping[env_indices] = True
+        # Reset states not fetched right after the last step are stale now.
+        self.pending_resets[env_indices] = False
+
+    def step_ready(self, num_environments=1):
+        indices, infos = self._wait_steps(num_environments)
+        indices = np.asarray(indices, dtype=np.int64)
+        terminals = self.terminals[indices]
+        if self.auto_reset:
+            self.pending_resets[indices] |= terminals
+        return indices, self._get_states(self.states, indices), self.rewards[indices], terminals, infos
+
+    def _wait_steps(self, num_environments):
+        """
+        Receives step results until at least `num_environments` environments (or all stepping ones) finished. Also
+        receives the results of all other processes which are done by then.
+
+        Returns:
+            Tuple[list,list]: Indices and infos of the finished environments.
+        """
+        num_environments = min(num_environments, int(np.sum(self.stepping)))
+        indices, infos = [], []
+        for step_indices, step_infos in self.received_steps:
+            indices.extend(step_indices)
+            infos.extend(step_infos)
+        self.received_steps = []
+        while True:
+            connections = [connection for connection, pending in zip(self.connections, self.pending_steps)
+                           if len(pending) > 0]
+            if len(connections) == 0:
+                break
+            # Block until enough environments finished, then only poll.
+            ready = wait(connections, timeout=None if len(indices) < num_environments else 0)
+            if len(ready) == 0:
+                break
+            for connection in ready:
+                process = self.connections.index(connection)
+                infos.extend(connection.recv())
+                indices.extend(self.pending_steps[process].popleft())
+        self.stepping[indices] = False
+        return indices, infos
+
+    def render(self, index=0):
+        self._request(self.env_processes[index], "render", index)
+
+    def terminate(self, index=0):
+        self._request(self.env_processes[index], "terminate", index)
+
+    def terminate_all(self):
+        if np.any(self.stepping):
+            self._wait_steps(self.num_environments)
+        for connection in self.connections:
+            connection.send(("close", None))
+        for connection in self.connections:
+            connection.recv()
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __str__(self):
+        return "SubprocVectorEnv({} environments in {} processes)".format(self.num_environments, self.num_processes)
@@ -23,6 +23,10 @@ from rlgraph.environments import Environment
 class VectorEnv(Environment):
     """
     Abstract multi-environment class to support stepping through multiple environments at once.
+
+    Besides stepping all environments at once via `step`, sub-environments can be stepped asynchronously:
+    `step_async` starts stepping a subset of the environments and `step_ready` returns the results of whichever
+    environments finished first, so fast environments do not have to wait for stragglers.
     """
     def __init__(self, num_environments, **kwargs):
         super(VectorEnv, self).__init__(**kwargs)
@@ -55,5 +59,28 @@ class VectorEnv(Environment):
         """
         raise NotImplementedError
 
+    def step_async(self, actions, env_indices):
+        """
+        Starts stepping the given sub-environments. None of them may currently be stepping.
+
+        Args:
+            actions (list): One action per environment in `env_indices`.
+            env_indices (Union[list,ndarray]): Indices of the environments to step.
+        """
+        raise NotImplementedError
+
+    def step_ready(self, num_environments=1):
+        """
+        Waits until at least `num_environments` of the environments started via `step_async` (or all of them if
+        fewer are stepping) have finished stepping and returns the results of all finished environments.
+
+        Args:
+            num_environments (int): Minimum number of environments to wait for.
+
+        Returns:
+            tuple: Env indices (ndarray) and the states, rewards, terminals and infos of these environments.
+        """
+        raise NotImplementedError
+
     def terminate_all(self):
         raise NotImplementedError
@@ -17,9 +17,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import logging
 import random
+import time
 from threading import Thread
 
+import numpy as np
 from six.moves import queue
 
 from rlgraph import get_distributed_backend
@@ -28,8 +31,11 @@ from rlgraph.environments import Environment
 from rlgraph.execution.ray import RayValueWorker
 from rlgraph.execution.ray.apex.ray_memory_actor import RayMemoryActor
 from rlgraph.execution.ray.ray_executor import RayExecutor
-from rlgraph.execution.ray.ray_util import create_colocated_ray_actors, RayTaskPool, RayWeight
-from rlgraph.spaces import Dict
+from rlgraph.execution.ray.ray_util import create_colocated_ray_actors, RaySampleBatchTuner, RayTaskPool, \
+    RayWeightBroadcaster
+from rlgraph.spaces import Dict, Tuple
+from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.utils.util import convert_dtype
 
 if get_distributed_backend() == "ray":
     import ray
@@ -79,10 +85,22 @@ class ApexExecutor(RayExecutor):
         self.weight_syncs_executed = 0
         self.steps_since_weights_synced = {}
 
+        # Versioned weight snapshots, optionally quantized ("float16" or "bfloat16") and delta-encoded.
+        self.weight_broadcaster = RayWeightBroadcaster(
+            quantization=self.executor_spec.get("weight_quantization", None),
+            delta_encoding=self.executor_spec.get("weight_delta_encoding", False)
+        )
+        # Weight version last sent to each worker.
+        self.worker_weight_versions = {}
+
         # These are the tasks actually interacting with the environment.
         self.env_sample_tasks = RayTaskPool()
         self.env_interaction_task_depth = self.executor_spec["env_interaction_task_depth"]
         self.worker_sample_size = self.executor_spec["num_worker_samples"] + self.worker_spec["n_step_adjustment"] - 1
+        self.worker_tasks_in_flight = {}
+        # Optional online tuning of worker sample size and task depth, see `RaySampleBatchTuner`.
+        self.sample_tuning_spec = self.executor_spec.get("sample_tuning_spec", None)
+        self.sample_tuner = None
 
         assert not ray_spec, "ERROR: ray_spec still contains items: {}".format(ray_spec)
         self.logger.info("Setting up execution for Apex executor.")
@@ -99,6 +117,9 @@ class ApexExecutor(RayExecutor):
         self.agent_config["state_space"] = environment.state_space
         self.agent_config["action_space"] = environment.action_space
         self.apex_replay_spec["memory_spec"]["state_space"] = environment.state_space
+        # Frame-deduplicating memories share frames between states and their n-step next-states.
+        if self.apex_replay_spec["memory_spec"].get("frame_stack_length", None) is not None:
+            self.apex_replay_spec["memory_spec"]["n_step"] = self.worker_spec["n_step_adjustment"]
 
         # Ray cannot serialise Dict, must be dict.
         if isinstance(environment.action_space, Dict):
@@ -112,7 +133,8 @@ class ApexExecutor(RayExecutor):
         # Set up worker thread for performing updates.
         self.update_worker = UpdateWorker(
             agent=self.local_agent,
-            in_queue_size=self.executor_spec["learn_queue_size"]
+            in_queue_size=self.executor_spec["learn_queue_size"],
+            prefetch_depth=self.executor_spec.get("prefetch_depth", 2)
         )
         self.ray_init()
 
@@ -148,6 +170,16 @@ class ApexExecutor(RayExecutor):
             # *args
             self.worker_spec, self.environment_spec, self.worker_frame_skip
         )
+        if self.sample_tuning_spec is not None:
+            tuning_spec = dict(self.sample_tuning_spec)
+            # Workers need at least n steps for one n-step transition.
+            tuning_spec["min_sample_size"] = max(
+                tuning_spec.get("min_sample_size", self.worker_sample_size // 4), self.worker_spec["n_step_adjustment"]
+            )
+            self.sample_tuner = RaySampleBatchTuner(
+                sample_size=self.worker_sample_size, task_depth=self.env_interaction_task_depth,
+                num_workers=self.num_sample_workers, **tuning_spec
+            )
         self.init_tasks()
 
     def init_tasks(self):
@@ -162,15 +194,31 @@ class ApexExecutor(RayExecutor):
 
         # Env interaction tasks via RayWorkers which each
         # have a local agent.
-        weights = RayWeight(self.local_agent.get_weights())
+        self.weight_broadcaster.publish(self.local_agent.get_weights())
         for ray_worker in self.ray_env_sample_workers:
-            ray_worker.set_weights.remote(weights)
+            ray_worker.set_weights.remote(self.weight_broadcaster.get_weights_for(0))
+            self.worker_weight_versions[ray_worker] = self.weight_broadcaster.version
             self.steps_since_weights_synced[ray_worker] = 0
 
             self.logger.info("Synced worker {} weights, initializing sample tasks.".format(
                 self.worker_ids[ray_worker]))
-            for _ in range(self.env_interaction_task_depth):
-                self.env_sample_tasks.add_task(ray_worker, ray_worker.execute_and_get_with_count.remote())
+            self.worker_tasks_in_flight[ray_worker] = 0
+            self._schedule_sample_tasks(ray_worker)
+
+    def _schedule_sample_tasks(self, ray_worker):
+        """
+        Schedules sample tasks on a worker until it has as many tasks in flight as the (possibly tuned) task depth.
+
+        Args:
+            ray_worker (RayValueWorker): The worker.
+        """
+        if self.sample_tuner is None:
+            task_depth, sample_size = self.env_interaction_task_depth, None
+        else:
+            task_depth, sample_size = self.sample_tuner.task_depth, self.sample_tuner.sample_size
+        while self.worker_tasks_in_flight[ray_worker] < task_depth:
+            self.env_sample_tasks.add_task(ray_worker, ray_worker.execute_and_get_with_count.remote(sample_size))
+            self.worker_tasks_in_flight[ray_worker] += 1
 
     def _execute_step(self):
         """
@@ -182,13 +230,15 @@ class ApexExecutor(RayExecutor):
         - Have a separate learn thread sample batches from the memory and compute updates
         - Sync weights to the shared model so remot eworkers can update their weights.
         """
+        if self.update_worker.error is not None:
+            raise RLGraphError("Update worker failed: {}".format(self.update_worker.error))
+
         # Env steps done during this rollout.
         env_steps = 0
         update_steps = 0
         discarded = 0
         queue_inserts = 0
         rewards = []
-        weights = None
 
         # 1. Fetch results from RayWorkers.
         completed_sample_tasks = list(self.env_sample_tasks.get_completed())
@@ -203,34 +253,39 @@ class ApexExecutor(RayExecutor):
 
             self.steps_since_weights_synced[ray_worker] += sample_steps
             if self.steps_since_weights_synced[ray_worker] >= self.weight_sync_steps:
-                if weights is None or self.update_worker.update_done:
+                # Publish a new version only if the weights changed since the last one.
+                if self.update_worker.update_done:
                     self.update_worker.update_done = False
-                    weights = ray.put(RayWeight(self.local_agent.get_weights()))
-                # self.logger.debug("Syncing weights for worker {}".format(self.worker_ids[ray_worker]))
-                # self.logger.debug("Weights type: {}, weights = {}".format(type(weights), weights))
-                ray_worker.set_weights.remote(weights)
-                self.weight_syncs_executed += 1
+                    self.weight_broadcaster.publish(self.local_agent.get_weights())
+                # The worker is ready for a sync: Send it the latest version (or the delta to it).
+                weights = self.weight_broadcaster.get_weights_for(self.worker_weight_versions[ray_worker])
+                if weights is not None:
+                    ray_worker.set_weights.remote(weights)
+                    self.worker_weight_versions[ray_worker] = self.weight_broadcaster.version
+                    self.weight_syncs_executed += 1
                 self.steps_since_weights_synced[ray_worker] = 0
 
             # Reschedule environment samples.
-            self.env_sample_tasks.add_task(ray_worker, ray_worker.execute_and_get_with_count.remote())
+            self.worker_tasks_in_flight[ray_worker] -= 1
+            if self.sample_tuner is not None:
+                self.sample_tuner.observe_task(
+                    sample_steps, sample_batch_metrics[i]["runtime"], sample_batch_metrics[i]["sample_bytes"]
+                )
+            self._schedule_sample_tasks(ray_worker)
 
         # 2. Fetch completed replay priority sampling task, move to worker, reschedule.
         for ray_memory, replay_remote_task in self.prioritized_replay_tasks.get_completed():
             # Immediately schedule new batch sampling tasks on these workers.
             self.prioritized_replay_tasks.add_task(ray_memory, ray_memory.get_batch.remote())
 
-            # Retrieve results via id.
             # self.logger.info("replay task obj id {}".format(replay_remote_task))
             if self.discard_queued_samples and self.update_worker.input_queue.full():
                 discarded += 1
             else:
-                sampled_batch = ray.get(object_ids=replay_remote_task)
-                # Pass to the agent doing the actual updates.
+                # Pass the object id to the update worker whose prefetch thread retrieves the batch.
                 # The ray worker is passed along because we need to update its priorities later in the subsequent
                 # task (see loop below).
-                # Copy due to memory leaks in Ray, see https://github.com/ray-project/ray/pull/3484/
-                self.update_worker.input_queue.put((ray_memory, sampled_batch and sampled_batch.copy()))
+                self.update_worker.input_queue.put((ray_memory, replay_remote_task))
                 queue_inserts += 1
 
         # 3. Update priorities on priority sampling workers using loss values produced by update worker.
@@ -243,28 +298,51 @@ class ApexExecutor(RayExecutor):
             # len of loss per item is update count.
             update_steps += len(indices)
 
+        # Adjust worker sample size and task depth. The learner not keeping up (discarded or queued up batches) is
+        # backpressure.
+        if self.sample_tuner is not None:
+            self.sample_tuner.update(backpressure=discarded > 0 or self.update_worker.input_queue.full())
+
         return env_steps, update_steps, {
             "discarded": discarded,
             "queue_inserts": queue_inserts,
             "rewards": rewards
         }
 
+    def get_aggregate_worker_results(self):
+        """
+        Fetches execution statistics from remote workers and aggregates them. Includes the weight broadcast
+        metrics (see `RayWeightBroadcaster.get_metrics`), the learner metrics (see `UpdateWorker.get_metrics`) and,
+        if enabled, the sample tuning metrics (see `RaySampleBatchTuner.get_metrics`).
+
+        Returns:
+            dict: Aggregate worker statistics.
+        """
+        results = super(ApexExecutor, self).get_aggregate_worker_results()
+        results.update(self.weight_broadcaster.get_metrics())
+        results.update(self.update_worker.get_metrics())
+        if self.sample_tuner is not None:
+            results.update(self.sample_tuner.get_metrics())
+        return results
+
 
 class UpdateWorker(Thread):
     """
     Executes learning separate from the main event loop as described in the Ape-X paper.
     Communicates with the main thread via a queue.
+
+    Sample batches are prefetched on a separate thread: It retrieves the batches from the object store and copies
+    them into writable arrays of the agent's input dtypes, so the update thread only has to run the updates.
     """
 
-    def __init__(self, agent, in_queue_size):
+    def __init__(self, agent, in_queue_size, prefetch_depth=2):
         """
         Initializes the worker with a RLGraph agent and queues for
 
         Args:
             agent (Agent): RLGraph agent used to execute local updates.
-            input_queue (queue.Queue): Input queue the worker will use to poll samples.
-            output_queue (queue.Queue): Output queue the worker will use to push results of local
-                update computations.
+            in_queue_size (int): Size of the input queue the worker will use to poll object ids of samples.
+            prefetch_depth (int): Number of batches to prepare ahead of the updates.
         """
         super(UpdateWorker, self).__init__()
 
@@ -272,24 +350,126 @@ class UpdateWorker(Thread):
         self.agent = agent
         self.input_queue = queue.Queue(maxsize=in_queue_size)
         self.output_queue = queue.Queue()
+        # Batches ready for updating.
+        self.prefetch_queue = queue.Queue(maxsize=prefetch_depth)
+        # Numpy dtype of states, or a dict/tuple of dtypes for container state spaces.
+        self.state_dtype = self.get_state_dtype(agent.preprocessed_state_space)
 
         # Terminate when host process terminates.
         self.daemon = True
+        self.prefetch_thread = Thread(target=self.prefetch)
+        self.prefetch_thread.daemon = True
 
         # Flag for main thread.
         self.update_done = False
+        # Error terminating the update thread.
+        self.error = None
+
+        # Learner metrics.
+        self.num_updates = 0
+        self.update_time = 0.0
+        # Time spent waiting for prefetched batches.
+        self.idle_time = 0.0
+        # Sums of the queue sizes at the start of each update.
+        self.input_queue_occupancy = 0
+        self.prefetch_queue_occupancy = 0
+
+    def start(self):
+        self.prefetch_thread.start()
+        super(UpdateWorker, self).start()
 
     def run(self):
+        try:
+            while True:
+                self.step()
+        except Exception as e:
+            # Fails the executor on its next step (see `ApexExecutor._execute_step`).
+            self.error = e
+            logging.getLogger(__name__).exception("Update worker failed.")
+
+    def prefetch(self):
         while True:
-            self.step()
+            memory_actor, batch_id = self.input_queue.get()
+            try:
+                sample_batch = ray.get(batch_id)
+                # Memories return None until they hold enough records for sampling.
+                if sample_batch is not None:
+                    self.prefetch_queue.put((memory_actor, self.prepare_batch(sample_batch)))
+            except Exception as e:
+                # Hand the error to the update thread instead of letting it wait for batches forever.
+                self.prefetch_queue.put((memory_actor, e))
+                return
+
+    @staticmethod
+    def get_state_dtype(space):
+        """
+        Returns the numpy dtype of a state space, mirroring the structure of container spaces.
+
+        Args:
+            space (Space): The (preprocessed) state space.
+
+        Returns:
+            Union[np.dtype,dict,tuple]: The dtype, or a dict or tuple of dtypes for Dict and Tuple spaces.
+        """
+        if isinstance(space, Dict):
+            return {key: UpdateWorker.get_state_dtype(sub_space) for key, sub_space in space.items()}
+        elif isinstance(space, Tuple):
+            return tuple(UpdateWorker.get_state_dtype(sub_space) for sub_space in space)
+        return convert_dtype(space.dtype, to="np")
+
+    def prepare_batch(self, sample_batch):
+        """
+        Copies a batch retrieved from the object store into writable arrays, converting states to the agent's
+        preprocessed state dtype. Copying also releases the batch in the object store (see
+        https://github.com/ray-project/ray/pull/3484/).
+
+        Args:
+            sample_batch (dict): Sample batch as returned by `RayMemoryActor.get_batch`.
+
+        Returns:
+            dict: The prepared batch.
+        """
+        def copy(value, dtype=None):
+            if isinstance(value, dict):
+                return {key: copy(sub_value, dtype[key] if isinstance(dtype, dict) else None)
+                        for key, sub_value in value.items()}
+            elif isinstance(dtype, tuple):
+                return tuple(copy(sub_value, sub_dtype) for sub_value, sub_dtype in zip(value, dtype))
+            return np.array(value, dtype=dtype)
+
+        return {key: copy(value, self.state_dtype if key in ["states", "next_states"] else None)
+                for key, value in sample_batch.items()}
 
     def step(self):  # TODO: time-percentage calculation missing here
         # Fetch input for update:
         # Replay memory used.
-        memory_actor, sample_batch = self.input_queue.get()
-
-        if sample_batch is not None:
-            losses = self.agent.update(batch=sample_batch)  # TODO: pass in time-percentage
-            # Just pass back indices for updating.
-            self.output_queue.put((memory_actor, sample_batch["indices"], losses[1]))
-            self.update_done = True
+        start = time.perf_counter()
+        memory_actor, sample_batch = self.prefetch_queue.get()
+        if isinstance(sample_batch, Exception):
+            raise RLGraphError("Prefetching sample batches failed: {}".format(sample_batch))
+        update_start = time.perf_counter()
+        self.idle_time += update_start - start
+        self.input_queue_occupancy += self.input_queue.qsize()
+        self.prefetch_queue_occupancy += self.prefetch_queue.qsize()
+
+        losses = self.agent.update(batch=sample_batch)  # TODO: pass in time-percentage
+        self.update_time += time.perf_counter() - update_start
+        self.num_updates += 1
+        # Just pass back indices for updating.
+        self.output_queue.put((memory_actor, sample_batch["indices"], losses[1]))
+        self.update_done = True
+
+    def get_metrics(self):
+        """
+        Returns:
+            dict: Number of updates, total and relative time spent waiting for batches and mean number of
+                queued batches (object ids and prefetched batches) at the start of an update.
+        """
+        num_updates = max(self.num_updates, 1)
+        return dict(
+            learner_updates=self.num_updates,
+            learner_idle_time=self.idle_time,
+            learner_idle_fraction=self.idle_time / ((self.idle_time + self.update_time) or 1e-10),
+            mean_learner_input_queue_occupancy=self.input_queue_occupancy / num_updates,
+            mean_learner_prefetch_queue_occupancy=self.prefetch_queue_occupancy / num_updates
+        )
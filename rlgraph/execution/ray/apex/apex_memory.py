@@ -17,21 +17,42 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import json
+import multiprocessing.pool
+import os
+
 import numpy as np
 import operator
+from six import string_types
 from six.moves import xrange as range_
 
-from rlgraph.utils import SMALL_NUMBER
+from rlgraph.utils.numpy import create_array
 from rlgraph.utils.specifiable import Specifiable
+from rlgraph.components.helpers.mem_frame_store import MemFrameStore
 from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree, MinSumSegmentTree
-from rlgraph.execution.ray.ray_util import ray_decompress
+from rlgraph.execution.ray.ray_util import ray_decompress, ray_decompress_frames, RayCompressedBatch, \
+    RayCompressedTransitions
 
 
 class ApexMemory(Specifiable):
     """
     Apex prioritized replay implementing compression.
+
+    Records are either kept as a list of per-record tuples or, if `columnar_storage` is True, in one
+    preallocated numpy ring array per field (and per key for container actions), so that reading a batch
+    is a single gather per column.
+
+    For stacked-frame states (see `Sequence` preprocessor), `frame_stack_length` enables a frame store that keeps
+    every single frame only once and rebuilds stacked states and next-states at sampling time.
+
+    With a `storage_directory`, all columns (and priorities) live in memory-mapped files, so capacity is bounded
+    by disk instead of RAM. The segment trees stay in memory. A memory created on an existing directory reopens
+    the stored records as of the last metadata write, which happens every `metadata_interval` inserted records
+    and on `flush`.
     """
-    def __init__(self, state_space=None, action_space=None, capacity=1000, alpha=1.0, beta=1.0):
+    def __init__(self, state_space=None, action_space=None, capacity=1000, alpha=1.0, beta=1.0,
+                 columnar_storage=False, frame_stack_length=None, frame_stack_add_rank=True, frame_capacity=None,
+                 n_step=1, storage_directory=None, metadata_interval=1000, num_decompression_threads=1):
         """
         Args:
             state_space (dict): State spec.
@@ -39,6 +60,22 @@ class ApexMemory(Specifiable):
             capacity (int): Max capacity.
             alpha (float): Initial weight.
             beta (float): Prioritisation factor.
+            columnar_storage (bool): If true, store records in preallocated per-field columns instead of
+                a list of record tuples.
+            frame_stack_length (Optional[int]): If given, states are stacks of this many frames, which are stored
+                deduplicated in a `MemFrameStore`. Implies `columnar_storage`. Compressed states are decompressed
+                on insert.
+            frame_stack_add_rank (bool): Whether frames are stacked in an extra last rank (True) or concatenated
+                within the last rank (False).
+            frame_capacity (Optional[int]): Number of single frames to hold. Default: 2 x capacity.
+            n_step (int): N-step offset between states and next-states of inserted trajectories.
+            storage_directory (Optional[str]): Directory for memory-mapped column files. Implies
+                `columnar_storage`. Compressed states are decompressed on insert.
+            metadata_interval (int): Number of inserted records after which the metadata needed to reopen a
+                memory-mapped memory is written. Records inserted since the last write are lost on reopening unless
+                `flush` is called.
+            num_decompression_threads (int): Number of threads decompressing the states of sampled (or inserted)
+                batches in parallel.
         """
         super(ApexMemory, self).__init__()
 
@@ -49,6 +86,8 @@ class ApexMemory(Specifiable):
         self.index = 0
         self.capacity = capacity
         self.size = 0
+        # Total number of records ever inserted (for incremental snapshots).
+        self.num_inserted = 0
         self.max_priority = 1.0
         self.alpha = alpha
         self.beta = beta
@@ -59,9 +98,9 @@ class ApexMemory(Specifiable):
             self.priority_capacity *= 2
 
         # Create segment trees, initialize with neutral elements.
-        sum_values = [0.0 for _ in range_(2 * self.priority_capacity)]
+        sum_values = np.zeros(shape=(2 * self.priority_capacity,))
         sum_segment_tree = MemSegmentTree(sum_values, self.priority_capacity, operator.add)
-        min_values = [float('inf') for _ in range_(2 * self.priority_capacity)]
+        min_values = np.full(shape=(2 * self.priority_capacity,), fill_value=float('inf'))
         min_segment_tree = MemSegmentTree(min_values, self.priority_capacity, min)
         self.merged_segment_tree = MinSumSegmentTree(
             sum_tree=sum_segment_tree,
@@ -69,23 +108,338 @@ class ApexMemory(Specifiable):
             capacity=self.priority_capacity
         )
 
+        self.storage_directory = storage_directory
+        self.metadata_interval = metadata_interval
+        self.records_since_metadata = 0
+        if self.storage_directory is not None and not os.path.exists(self.storage_directory):
+            os.makedirs(self.storage_directory)
+
+        self.frame_store = None
+        if frame_stack_length is not None:
+            self.frame_store = MemFrameStore(
+                capacity=self.capacity, sequence_length=frame_stack_length, add_rank=frame_stack_add_rank,
+                frame_capacity=frame_capacity, storage_directory=self.storage_directory
+            )
+        self.n_step = n_step
+
+        self.columnar_storage = columnar_storage or self.frame_store is not None or \
+            self.storage_directory is not None
+        # Frame stores and memory-mapped columns hold raw states.
+        self.decompress_states = self.frame_store is not None or self.storage_directory is not None
+        # Shape and dtype of states inserted as `RayCompressedBatch`es, which are stored as raw LZ4 frames.
+        self.state_layout = None
+        self.num_decompression_threads = num_decompression_threads
+        self.decompression_pool = None
+        if self.num_decompression_threads > 1:
+            self.decompression_pool = multiprocessing.pool.ThreadPool(self.num_decompression_threads)
+        # Flat column name (e.g. "actions/some_key") -> column.
+        self.columns = None
+        if self.columnar_storage:
+            self.columns = {}
+            self._create_column("rewards", shape=(), dtype=np.float32)
+            self._create_column("terminals", shape=(), dtype=np.bool_)
+            if self.storage_directory is not None:
+                # Leaf values of the segment trees, to rebuild them on reopening.
+                self._create_column("priorities", shape=(), dtype=np.float64)
+            # Action columns are sized from the action space if known, otherwise from the first inserted record.
+            if self.container_actions:
+                for name, space in self.action_space.items():
+                    self._create_column("actions/" + name, shape=space.shape, dtype=space.dtype)
+            elif self.action_space is not None:
+                self._create_column("actions", shape=self.action_space.shape, dtype=self.action_space.dtype)
+            # N.b. State columns are always created on the first insert, as stored states are preprocessed
+            # (and usually compressed), so they do not match `state_space`.
+            if self.storage_directory is not None and os.path.exists(self._metadata_path()):
+                self._reopen()
+                self._evict_overwritten_frames()
+
+    def _column_path(self, name):
+        if self.storage_directory is None:
+            return None
+        return os.path.join(self.storage_directory, name.replace("/", "-") + ".npy")
+
+    def _metadata_path(self):
+        return os.path.join(self.storage_directory, "memory.json")
+
+    def _create_column(self, name, shape=None, dtype=None, value=None):
+        """
+        Preallocates one ring array of size `capacity` for a record field.
+
+        Args:
+            name (str): Flat name of the column.
+            shape (Optional[tuple]): Shape of a single field value.
+            dtype (Optional[np.dtype]): Dtype of the field.
+            value (Optional[any]): Single field value to use for shape and dtype if none are given.
+                Compressed values (strings) are stored in an (in-memory) object column.
+        """
+        if shape is None:
+            if isinstance(value, (bytes, string_types)):
+                self.columns[name] = np.empty(shape=(self.capacity,), dtype=object)
+                return
+            value = np.asarray(value)
+            shape, dtype = value.shape, value.dtype
+        self.columns[name] = create_array(
+            shape=(self.capacity,) + tuple(shape), dtype=dtype, file_path=self._column_path(name)
+        )
+
+    def _reopen(self):
+        """
+        Restores indices, lazily created columns and priorities of a memory stored in `storage_directory`.
+        """
+        with open(self._metadata_path()) as f:
+            metadata = json.load(f)
+        self.index = metadata["index"]
+        self.size = metadata["size"]
+        self.num_inserted = metadata.get("num_inserted", self.index)
+        self.max_priority = metadata["max_priority"]
+        for name in metadata["columns"]:
+            if name not in self.columns:
+                self.columns[name] = np.load(self._column_path(name), mmap_mode="r+")
+        if self.frame_store is not None:
+            self.frame_store.frame_count = metadata["frame_count"]
+        if self.size > 0:
+            self.merged_segment_tree.insert_batch(np.arange(self.size), self.columns["priorities"][:self.size])
+
+    def _write_metadata(self):
+        """
+        Writes the state needed to reopen the memory next to the column files.
+        """
+        self.records_since_metadata = 0
+        metadata = dict(
+            index=self.index,
+            size=self.size,
+            num_inserted=self.num_inserted,
+            max_priority=float(self.max_priority),
+            columns=sorted(self.columns.keys()),
+            frame_count=self.frame_store.frame_count if self.frame_store is not None else 0
+        )
+        # Write-then-rename, so a crash never leaves a partially written file.
+        temp_path = self._metadata_path() + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(metadata, f)
+        os.rename(temp_path, self._metadata_path())
+
+    def _maybe_write_metadata(self, num_records):
+        """
+        Writes the metadata once `metadata_interval` records were inserted since the last write.
+
+        Args:
+            num_records (int): Number of records just inserted.
+        """
+        if self.storage_directory is None:
+            return
+        self.records_since_metadata += num_records
+        if self.records_since_metadata >= self.metadata_interval:
+            self._write_metadata()
+
+    def flush(self):
+        """
+        Flushes all memory-mapped columns to disk and writes the metadata. Should be called before shutting down,
+        as the metadata is only written periodically (column pages are kept by the OS across process restarts).
+        """
+        if self.storage_directory is None:
+            return
+        for column in self.columns.values():
+            if isinstance(column, np.memmap):
+                column.flush()
+        if self.frame_store is not None and self.frame_store.frames is not None:
+            self.frame_store.frames.flush()
+        self._write_metadata()
+
+    def _write_columns(self, indices, states, actions, rewards, terminals, next_states, priorities):
+        """
+        Writes single values (for an int index) or batches of values (for an index array) into the columns.
+        """
+        batched = not np.isscalar(indices)
+        if self.decompress_states:
+            states = self._decompress_states(states) if batched else ray_decompress(states)
+            next_states = self._decompress_states(next_states) if batched else ray_decompress(next_states)
+        elif batched and isinstance(states, RayCompressedBatch):
+            states = states.frames()
+            next_states = next_states.frames()
+
+        if self.frame_store is not None:
+            self.frame_store.insert_batch(
+                indices if batched else np.asarray([indices]),
+                states if batched else np.asarray(states)[None],
+                next_states if batched else np.asarray(next_states)[None],
+                n_step=self.n_step
+            )
+            # States are not kept in columns.
+            states_and_next_states = []
+        else:
+            states_and_next_states = [("states", states), ("next_states", next_states)]
+
+        for key, values in states_and_next_states:
+            if key not in self.columns:
+                self._create_column(key, value=values[0] if batched else values)
+            if batched and self.columns[key].dtype == object:
+                values = np.asarray(values, dtype=object)
+            self.columns[key][indices] = values
+
+        if self.container_actions:
+            for name in self.action_space.keys():
+                self.columns["actions/" + name][indices] = actions[name]
+        else:
+            if "actions" not in self.columns:
+                self._create_column("actions", value=actions[0] if batched else actions)
+            self.columns["actions"][indices] = actions
+        self.columns["rewards"][indices] = rewards
+        self.columns["terminals"][indices] = terminals
+        if "priorities" in self.columns:
+            self.columns["priorities"][indices] = priorities
+
     def insert_records(self, record):
         # TODO: This has the record interface, but actually expects a specific structure anyway, so
         # may as well change API?
-        if self.index >= self.size:
-            self.memory_values.append(record)
-        else:
-            self.memory_values[self.index] = record
-
         # Weights. # TODO this is problematic due to index not existing.
         if record[5] is not None:
-            self.merged_segment_tree.insert(self.index, record[5] ** self.alpha)
+            priority = record[5] ** self.alpha
         else:
-            self.merged_segment_tree.insert(self.index, self.max_priority ** self.alpha)
+            priority = self.max_priority ** self.alpha
+        self.merged_segment_tree.insert(self.index, priority)
+
+        if self.columnar_storage:
+            self._write_columns(self.index, *record[:5], priorities=priority)
+        elif self.index >= self.size:
+            self.memory_values.append(record)
+        else:
+            self.memory_values[self.index] = record
 
         # Update indices.
         self.index = (self.index + 1) % self.capacity
         self.size = min(self.size + 1, self.capacity)
+        self.num_inserted += 1
+        self._evict_overwritten_frames()
+        self._maybe_write_metadata(1)
+
+    def insert_batch(self, records):
+        """
+        Inserts a batch of records.
+
+        Args:
+            records (dict): Dict with keys "states", "actions", "rewards", "terminals", "next_states" and
+                "importance_weights" holding a batch of values each. Container actions are dicts of batches.
+                Instead of "states" and "next_states", compressed states may be given as "transitions"
+                (`RayCompressedTransitions`), whose shared frames are stored only once.
+        """
+        num_records = len(records["rewards"])
+        if isinstance(records.get("transitions", None), RayCompressedTransitions):
+            transitions = records["transitions"]
+            if self.decompress_states:
+                states, next_states = transitions.decompress()
+            else:
+                self.state_layout = (transitions.shape, transitions.dtype)
+                states, next_states = transitions.get_frames()
+            records = dict(records, states=states, next_states=next_states)
+        elif isinstance(records["states"], RayCompressedBatch) and not self.decompress_states:
+            self.state_layout = (records["states"].shape, records["states"].dtype)
+        if not self.columnar_storage:
+            for i in range_(num_records):
+                # If Actions is dict with vectors per key, convert to single dict.
+                if isinstance(records["actions"], dict):
+                    action = {k: v[i] for k, v in records["actions"].items()}
+                else:
+                    action = records["actions"][i]
+                self.insert_records((
+                    records["states"][i],
+                    action,
+                    records["rewards"][i],
+                    records["terminals"][i],
+                    records["next_states"][i],
+                    records["importance_weights"][i]
+                ))
+            return
+
+        indices = np.arange(self.index, self.index + num_records) % self.capacity
+        weights = records.get("importance_weights", None)
+        if weights is not None:
+            priorities = np.power(np.asarray(weights, dtype=np.float64), self.alpha)
+        else:
+            priorities = np.full(shape=(num_records,), fill_value=self.max_priority ** self.alpha)
+        self.merged_segment_tree.insert_batch(indices, priorities)
+        self._write_columns(indices, records["states"], records["actions"], records["rewards"],
+                            records["terminals"], records["next_states"], priorities=priorities)
+
+        # Update indices.
+        self.index = (self.index + num_records) % self.capacity
+        self.size = min(self.size + num_records, self.capacity)
+        self.num_inserted += num_records
+        self._evict_overwritten_frames()
+        self._maybe_write_metadata(num_records)
+
+    def _evict_overwritten_frames(self):
+        """
+        Excludes the (oldest) transitions whose frames were overwritten in the frame ring from sampling.
+        """
+        if self.frame_store is None:
+            return
+        oldest_index = (self.index - self.size) % self.capacity
+        num_overwritten = self.frame_store.num_overwritten(oldest_index, self.size)
+        if num_overwritten > 0:
+            indices = (oldest_index + np.arange(num_overwritten)) % self.capacity
+            self.merged_segment_tree.insert_batch(
+                indices, np.zeros(shape=(num_overwritten,)),
+                min_elements=np.full(shape=(num_overwritten,), fill_value=float("inf"))
+            )
+
+    def _decompress_states(self, values):
+        """
+        Decompresses a batch of stored (compressed) states into one preallocated array, using the decompression
+        thread pool if there is one. Values occurring more than once (e.g. a record sampled more than once or a
+        frame shared by a state and a next-state) are only decompressed once and then copied.
+
+        Args:
+            values (Union[list,ndarray,RayCompressedBatch]): Compressed states.
+
+        Returns:
+            ndarray: The decompressed states.
+        """
+        if isinstance(values, RayCompressedBatch):
+            return values.decompress()
+        elif isinstance(values, np.ndarray) and values.dtype != object:
+            return values
+        num_values = len(values)
+        if num_values == 0:
+            return np.asarray([])
+
+        # Stored values are immutable, so equal objects can be found by identity.
+        _, positions, inverse = np.unique([id(value) for value in values], return_index=True, return_inverse=True)
+        if self.state_layout is not None:
+            shape, dtype = self.state_layout
+        else:
+            first_value = np.asarray(ray_decompress(values[positions[0]]))
+            shape, dtype = first_value.shape, first_value.dtype
+        out = np.empty(shape=(num_values,) + tuple(shape), dtype=dtype)
+
+        def decompress(chunk_positions):
+            if self.state_layout is not None:
+                ray_decompress_frames([values[position] for position in chunk_positions], shape, dtype, out=out,
+                                      out_indices=chunk_positions)
+            else:
+                for position in chunk_positions:
+                    out[position] = ray_decompress(values[position])
+
+        if self.decompression_pool is None or len(positions) < 2 * self.num_decompression_threads:
+            decompress(positions)
+        else:
+            # LZ4 releases the GIL, so chunks are decompressed in parallel.
+            self.decompression_pool.map(decompress, np.array_split(positions, self.num_decompression_threads))
+
+        sources = positions[np.reshape(inverse, (-1,))]
+        duplicates = np.flatnonzero(sources != np.arange(num_values))
+        out[duplicates] = out[sources[duplicates]]
+        return out
+
+    def _decompress_state_pairs(self, states, next_states):
+        """
+        Decompresses sampled states and next-states together, so frames shared between them are decompressed once.
+        """
+        num_states = len(states)
+        values = self._decompress_states(list(states) + list(next_states))
+        if len(values) == 0:
+            return values, values
+        return values[:num_states], values[num_states:]
 
     def read_records(self, indices):
         """
@@ -97,6 +451,9 @@ class ApexMemory(Specifiable):
         Returns:
              dict: Record value dict.
         """
+        if self.columnar_storage:
+            return self._read_columns(indices)
+
         states = []
         if self.container_actions:
             actions = {k: [] for k in self.action_space.keys()}
@@ -107,7 +464,7 @@ class ApexMemory(Specifiable):
         next_states = []
         for index in indices:
             state, action, reward, terminal, next_state, weight = self.memory_values[index]
-            states.append(ray_decompress(state))
+            states.append(state)
 
             if self.container_actions:
                 for name in self.action_space.keys():
@@ -116,40 +473,163 @@ class ApexMemory(Specifiable):
                 actions.append(action)
             rewards.append(reward)
             terminals.append(terminal)
-            next_states.append(ray_decompress(next_state))
+            next_states.append(next_state)
 
         if self.container_actions:
             for name in self.action_space.keys():
                 actions[name] = np.squeeze(np.array(actions[name]))
         else:
             actions = np.array(actions)
+        states, next_states = self._decompress_state_pairs(states, next_states)
         return dict(
-            states=np.asarray(states),
+            states=states,
             actions=actions,
             rewards=np.asarray(rewards),
             terminals=np.asarray(terminals),
-            next_states=np.asarray(next_states)
+            next_states=next_states
+        )
+
+    def _read_columns(self, indices):
+        """
+        Gathers record values for the provided indices from the columns.
+        """
+        indices = np.asarray(indices)
+        if self.storage_directory is not None:
+            # Read memory-mapped columns in ascending index order, then restore the sampled order.
+            order = np.argsort(indices, kind="mergesort")
+            sorted_indices = indices[order]
+
+            def gather(column):
+                values = column[sorted_indices]
+                result = np.empty_like(values)
+                result[order] = values
+                return result
+        else:
+            def gather(column):
+                return column[indices]
+
+        records = dict(
+            rewards=gather(self.columns["rewards"]),
+            terminals=gather(self.columns["terminals"])
         )
+        if self.frame_store is not None:
+            records["states"], records["next_states"] = self.frame_store.get_states(indices)
+        elif self.columns["states"].dtype == object:
+            records["states"], records["next_states"] = self._decompress_state_pairs(
+                self.columns["states"][indices], self.columns["next_states"][indices]
+            )
+        else:
+            records["states"] = gather(self.columns["states"])
+            records["next_states"] = gather(self.columns["next_states"])
+        if self.container_actions:
+            records["actions"] = {name: gather(self.columns["actions/" + name]) for name in self.action_space.keys()}
+        else:
+            records["actions"] = gather(self.columns["actions"])
+        return records
 
     def get_records(self, num_records):
-        indices = []
-        prob_sum = self.merged_segment_tree.sum_segment_tree.get_sum(0, self.size)
-        samples = np.random.random(size=(num_records,)) * prob_sum
-        for sample in samples:
-            indices.append(self.merged_segment_tree.sum_segment_tree.index_of_prefixsum(prefix_sum=sample))
-
-        sum_prob = self.merged_segment_tree.sum_segment_tree.get_sum()
-        min_prob = self.merged_segment_tree.min_segment_tree.get_min_value() / sum_prob + SMALL_NUMBER
-        max_weight = (min_prob * self.size) ** (-self.beta)
-        weights = []
-        for index in indices:
-            sample_prob = self.merged_segment_tree.sum_segment_tree.get(index) / sum_prob
-            weight = (sample_prob * self.size) ** (-self.beta)
-            weights.append(weight / max_weight)
+        indices = self.merged_segment_tree.sample_batch(num_records, limit=self.size)
+        weights = self.merged_segment_tree.get_importance_weights(indices, beta=self.beta)
 
-        return self.read_records(indices=indices), np.asarray(indices), np.asarray(weights)
+        return self.read_records(indices=indices), indices, weights
 
     def update_records(self, indices, update):
-        for index, loss in zip(indices, update):
-            self.merged_segment_tree.insert(index, loss ** self.alpha)
-            self.max_priority = max(self.max_priority, loss)
+        update = np.asarray(update)
+        if len(update) == 0:
+            return
+        indices = np.asarray(indices)
+        if self.frame_store is not None:
+            # Do not resample transitions evicted since they were sampled.
+            valid = ~self.frame_store.is_overwritten(indices)
+            indices, update = indices[valid], update[valid]
+        priorities = np.power(update, self.alpha)
+        self.merged_segment_tree.insert_batch(indices, priorities)
+        self.max_priority = max(self.max_priority, np.max(update))
+        if self.storage_directory is not None:
+            self.columns["priorities"][indices] = priorities
+
+    def get_snapshot(self):
+        """
+        Returns the memory contents for a `MemSnapshotter`: Records (columns or record tuples), frames and
+        priorities.
+
+        Returns:
+            dict: Snapshot with keys "metadata", "rings" and "arrays".
+        """
+        metadata = dict(
+            index=self.index,
+            size=self.size,
+            num_inserted=self.num_inserted,
+            max_priority=float(self.max_priority),
+            state_layout=None if self.state_layout is None else [list(self.state_layout[0]), self.state_layout[1]]
+        )
+        if self.columnar_storage:
+            columns = {name: column for name, column in self.columns.items() if name != "priorities"}
+        else:
+            columns = dict(records=self.memory_values)
+        rings = dict(records=dict(columns=columns, capacity=self.capacity, num_written=self.num_inserted))
+        if self.frame_store is not None:
+            columns["frame_state_positions"] = self.frame_store.state_positions
+            columns["frame_next_state_positions"] = self.frame_store.next_state_positions
+            metadata["frame_count"] = self.frame_store.frame_count
+            if self.frame_store.frames is not None:
+                rings["frames"] = dict(
+                    columns=dict(frames=self.frame_store.frames), capacity=self.frame_store.frame_capacity,
+                    num_written=self.frame_store.frame_count
+                )
+        priority_leaves = self.merged_segment_tree.sum_segment_tree.values[self.priority_capacity:]
+        return dict(
+            metadata=metadata,
+            rings=rings,
+            arrays=dict(priorities=priority_leaves[:self.capacity])
+        )
+
+    def restore_snapshot(self, snapshot):
+        """
+        Restores the memory contents from a snapshot created by `get_snapshot`.
+
+        Args:
+            snapshot (dict): Snapshot with keys "metadata", "rings" and "arrays".
+        """
+        metadata = snapshot["metadata"]
+        self.index = metadata["index"]
+        self.size = metadata["size"]
+        self.num_inserted = metadata["num_inserted"]
+        self.max_priority = metadata["max_priority"]
+        if metadata.get("state_layout", None) is not None:
+            self.state_layout = (tuple(metadata["state_layout"][0]), metadata["state_layout"][1])
+
+        columns = snapshot["rings"]["records"]["columns"]
+        if self.frame_store is not None:
+            self.frame_store.state_positions[:] = columns.pop("frame_state_positions")
+            self.frame_store.next_state_positions[:] = columns.pop("frame_next_state_positions")
+            self.frame_store.frame_count = metadata["frame_count"]
+            # The next insert must not chain onto a stack written before the restore.
+            self.frame_store.last_stack = None
+            if "frames" in snapshot["rings"]:
+                frames = snapshot["rings"]["frames"]["columns"]["frames"]
+                if self.frame_store.frames is None:
+                    self.frame_store.frames = create_array(
+                        shape=frames.shape, dtype=frames.dtype, file_path=self.frame_store._file_path("frames")
+                    )
+                self.frame_store.frames[:] = frames
+        if self.columnar_storage:
+            for name, values in columns.items():
+                if name not in self.columns:
+                    if values.dtype == object:
+                        self._create_column(name, value=values[0])
+                    else:
+                        self._create_column(name, shape=values.shape[1:], dtype=values.dtype)
+                self.columns[name][:] = values
+        else:
+            self.memory_values = list(columns["records"])
+
+        priorities = snapshot["arrays"]["priorities"]
+        if self.storage_directory is not None:
+            self.columns["priorities"][:] = priorities
+        self.merged_segment_tree.sum_segment_tree.values[:] = 0.0
+        self.merged_segment_tree.min_segment_tree.values[:] = float("inf")
+        self.merged_segment_tree.insert_batch(np.arange(self.size), priorities[:self.size])
+        self._evict_overwritten_frames()
+        if self.storage_directory is not None:
+            self._write_metadata()
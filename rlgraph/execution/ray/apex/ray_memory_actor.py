@@ -19,7 +19,6 @@ from __future__ import print_function
 
 import numpy as np
 from rlgraph.utils import SMALL_NUMBER
-from six.moves import xrange as range_
 from rlgraph import get_distributed_backend
 from rlgraph.execution.ray.apex.apex_memory import ApexMemory
 from rlgraph.execution.ray.ray_actor import RayActor
@@ -73,28 +72,11 @@ class RayMemoryActor(RayActor):
         N.b. For performance reason, data layout is slightly different for apex.
         """
         records = env_sample.get_batch()
-        num_records = len(records['states'])
 
         # TODO port to tf PR behaviour.
         if self.clip_rewards:
-            rewards = np.sign(records["rewards"])
-        else:
-            rewards = records["rewards"]
-        for i in range_(num_records):
-            # If Actions is dict with vectors per key, convert to single dict.
-            if isinstance(records["actions"], dict):
-                action = {k: v[i] for k, v in records["actions"].items()}
-            else:
-                action = records["actions"][i]
-
-            self.memory.insert_records((
-                records["states"][i],
-                action,
-                rewards[i],
-                records["terminals"][i],
-                records["next_states"][i],
-                records["importance_weights"][i]
-            ))
+            records = dict(records, rewards=np.sign(records["rewards"]))
+        self.memory.insert_batch(records)
 
     def update_priorities(self, indices, loss):
         """
@@ -107,3 +89,9 @@ class RayMemoryActor(RayActor):
         """
         loss = np.abs(loss) + SMALL_NUMBER
         self.memory.update_records(indices, loss)
+
+    def flush_memory(self):
+        """
+        Persists a memory-mapped replay memory, so it can be reopened from its storage directory.
+        """
+        self.memory.flush()
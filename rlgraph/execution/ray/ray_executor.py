@@ -273,6 +273,12 @@ class RayExecutor(object):
             Agent: RLGraph agent object.
         """
         config = deepcopy(agent_config)
+        # Key a configured build cache by the agent config, so that all workers with the same config share one entry.
+        build_cache = (config.get("execution_spec") or {}).get("build_cache")
+        if build_cache is not None and build_cache.get("key") is None:
+            key = deepcopy(agent_config)
+            key["execution_spec"] = {k: v for k, v in key["execution_spec"].items() if k != "build_cache"}
+            build_cache["key"] = key
         # Pop type on a copy because this may be called by multiple classes/worker types.
         agent_cls = Agent.__lookup_classes__.get(config.pop('type'))
         return agent_cls(**config)
@@ -24,10 +24,11 @@ from six.moves import xrange as range_
 from rlgraph.utils import util
 from rlgraph import get_distributed_backend
 from rlgraph.environments.sequential_vector_env import SequentialVectorEnv
+from rlgraph.environments.subproc_vector_env import SubprocVectorEnv
 from rlgraph.execution.environment_sample import EnvironmentSample
 from rlgraph.execution.ray import RayExecutor
 from rlgraph.execution.ray.ray_actor import RayActor
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.ray.ray_util import ray_compress_batch
 
 if get_distributed_backend() == "ray":
     import ray
@@ -62,8 +63,16 @@ class RayPolicyWorker(RayActor):
         self.compress = worker_spec.pop("compress_states", False)
         self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         num_background_envs = worker_spec.pop("num_background_envs", 1)
-
-        self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        # Number of processes to step environments in (0: step sequentially in this process).
+        num_env_processes = worker_spec.pop("num_env_processes", 0)
+        # If given, environments are stepped asynchronously and the worker acts for whichever (at least)
+        # `num_ready_environments` environments finished stepping first.
+        self.num_ready_environments = worker_spec.pop("num_ready_environments", None)
+
+        if num_env_processes > 0:
+            self.vector_env = SubprocVectorEnv(self.num_environments, env_spec, num_processes=num_env_processes)
+        else:
+            self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
 
         # Then update agent config.
         agent_config['state_space'] = self.vector_env.state_space
@@ -119,6 +128,11 @@ class RayPolicyWorker(RayActor):
         # Was the last state a terminal state so env should be reset in next call?
         self.last_terminals = [False for _ in range_(self.num_environments)]
 
+        # Asynchronous stepping: Whether an environment is stepping and the action it is stepping with.
+        # The state the action was picked for stays in the preprocessed states buffer until the step finished.
+        self.env_stepping = np.zeros(shape=(self.num_environments,), dtype=np.bool_)
+        self.env_actions = [None for _ in range_(self.num_environments)]
+
     def get_constructor_success(self):
         """
         For debugging: fetch the last attribute. Will fail if constructor failed.
@@ -195,70 +209,41 @@ class RayPolicyWorker(RayActor):
         current_episode_start_timestamps = self.last_ep_start_timestamps
         current_episode_sample_times = self.last_ep_sample_times
 
-        # Whether the episode in each env has terminated.
+        # Whether the last step of each env was terminal.
         terminals = [False] * self.num_environments
 
         while timesteps_executed < num_timesteps:
             current_iteration_start_timestamp = time.perf_counter()
-            for i, env_id in enumerate(self.env_ids):
-                state, _ = self.agent.state_space.force_batch(env_states[i])
-                if self.preprocessors[env_id] is not None:
-                    if self.is_preprocessed[env_id] is False:
-                        self.preprocessed_states_buffer[i] = self.preprocessors[env_id].preprocess(state)
-                        self.is_preprocessed[env_id] = True
-                else:
-                    self.preprocessed_states_buffer[i] = env_states[i]
-
-            actions = self.agent.get_action(states=self.preprocessed_states_buffer,
-                                            use_exploration=use_exploration, apply_preprocessing=False)
-
-            if self.agent.flat_action_space is not None:
-                some_key = next(iter(actions))
-                assert isinstance(actions, dict) and isinstance(actions[some_key], np.ndarray),\
-                    "ERROR: Cannot flip container-action batch with dict keys if returned value is not a dict OR " \
-                    "values of returned value are not np.ndarrays!"
-                if hasattr(actions[some_key], "__len__"):
-                    env_actions = [{key: value[i] for key, value in actions.items()} for i in range(len(actions[some_key]))]
-                else:
-                    # Action was not array type.
-                    env_actions = actions
-            # No flipping necessary.
+            if self.num_ready_environments is None:
+                env_indices, env_actions, next_states, step_rewards, step_terminals = \
+                    self._step_all_environments(env_states, use_exploration)
             else:
-                env_actions = actions
-                if self.num_environments == 1 and env_actions.shape == ():
-                    env_actions = [env_actions]
-            next_states, step_rewards, terminals, infos = self.vector_env.step(actions=env_actions)
-            # Worker frameskip not needed as done in env.
-            # for _ in range_(self.worker_frameskip):
-            #     next_states, step_rewards, terminals, infos = self.vector_env.step(actions=actions)
-            #     env_frames += self.num_environments
-            #
-            #     for i, env_id in enumerate(self.env_ids):
-            #         rewards[env_id] += step_rewards[i]
-            #     if np.any(terminals):
-            #         break
-
-            timesteps_executed += self.num_environments
-            env_frames += self.num_environments
-            env_states = next_states
+                env_indices, env_actions, next_states, step_rewards, step_terminals = \
+                    self._step_ready_environments(env_states, use_exploration)
+
+            timesteps_executed += len(env_indices)
+            env_frames += len(env_indices)
             current_iteration_time = time.perf_counter() - current_iteration_start_timestamp
 
-            # Do accounting for each environment.
-            state_buffer = np.array(self.preprocessed_states_buffer)
-            for i, env_id in enumerate(self.env_ids):
+            # Do accounting for each stepped environment.
+            state_buffer = self.preprocessed_states_buffer[env_indices]
+            for j, i in enumerate(env_indices):
+                env_id = self.env_ids[i]
+                env_states[i] = next_states[j]
+                terminals[i] = step_terminals[j]
                 # Set is preprocessed to False because env_states are currently NOT preprocessed.
                 self.is_preprocessed[env_id] = False
                 current_episode_timesteps[i] += 1
                 # Each position is the running episode reward of that episode. Add step reward.
-                current_episode_rewards[i] += step_rewards[i]
-                sample_states[env_id].append(state_buffer[i])
+                current_episode_rewards[i] += step_rewards[j]
+                sample_states[env_id].append(state_buffer[j])
                 if self.container_actions:
                     for name in self.action_space.keys():
-                        sample_actions[env_id][name].append(env_actions[i][name])
+                        sample_actions[env_id][name].append(env_actions[j][name])
                 else:
-                    sample_actions[env_id].append(env_actions[i])
-                sample_rewards[env_id].append(step_rewards[i])
-                sample_terminals[env_id].append(terminals[i])
+                    sample_actions[env_id].append(env_actions[j])
+                sample_rewards[env_id].append(step_rewards[j])
+                sample_terminals[env_id].append(step_terminals[j])
                 current_episode_sample_times[i] += current_iteration_time
 
                 # Terminate and reset episode for that environment.
@@ -306,7 +291,7 @@ class RayPolicyWorker(RayActor):
                     current_episode_start_timestamps[i] = time.perf_counter()
                     current_episode_sample_times[i] = 0.0
 
-            if 0 < num_timesteps <= timesteps_executed or (break_on_terminal and np.any(terminals)):
+            if 0 < num_timesteps <= timesteps_executed or (break_on_terminal and np.any(step_terminals)):
                 self.total_worker_steps += timesteps_executed
                 break
 
@@ -364,17 +349,108 @@ class RayPolicyWorker(RayActor):
             )
         )
 
+    def _step_all_environments(self, env_states, use_exploration):
+        """
+        Picks actions for and steps all environments.
+
+        Returns:
+            tuple: Env indices, env actions, next states, rewards and terminals of the stepped environments.
+        """
+        env_indices = np.arange(self.num_environments)
+        self._preprocess_states(env_indices, env_states)
+        actions = self.agent.get_action(states=self.preprocessed_states_buffer,
+                                        use_exploration=use_exploration, apply_preprocessing=False)
+        env_actions = self._flip_actions(actions)
+        next_states, step_rewards, terminals, infos = self.vector_env.step(actions=env_actions)
+        # Worker frameskip not needed as done in env.
+        # for _ in range_(self.worker_frameskip):
+        #     next_states, step_rewards, terminals, infos = self.vector_env.step(actions=actions)
+        #     env_frames += self.num_environments
+        #
+        #     for i, env_id in enumerate(self.env_ids):
+        #         rewards[env_id] += step_rewards[i]
+        #     if np.any(terminals):
+        #         break
+        return env_indices, env_actions, next_states, step_rewards, terminals
+
+    def _step_ready_environments(self, env_states, use_exploration):
+        """
+        Picks actions for and starts stepping all environments not currently stepping, then waits for whichever
+        (at least) `num_ready_environments` environments finish first. The others keep stepping in the background.
+
+        Returns:
+            tuple: Env indices, env actions, next states, rewards and terminals of the finished environments.
+        """
+        env_indices = np.flatnonzero(~self.env_stepping)
+        if len(env_indices) > 0:
+            self._preprocess_states(env_indices, env_states)
+            actions = self.agent.get_action(states=self.preprocessed_states_buffer[env_indices],
+                                            use_exploration=use_exploration, apply_preprocessing=False)
+            env_actions = self._flip_actions(actions)
+            for j, i in enumerate(env_indices):
+                self.env_actions[i] = env_actions[j]
+            self.vector_env.step_async(env_actions, env_indices)
+            self.env_stepping[env_indices] = True
+
+        env_indices, next_states, step_rewards, terminals, _ = self.vector_env.step_ready(
+            self.num_ready_environments
+        )
+        self.env_stepping[env_indices] = False
+        return env_indices, [self.env_actions[i] for i in env_indices], next_states, step_rewards, terminals
+
+    def _preprocess_states(self, env_indices, env_states):
+        """
+        Writes the preprocessed current states of the given environments into the preprocessed states buffer.
+        """
+        for i in env_indices:
+            env_id = self.env_ids[i]
+            state, _ = self.agent.state_space.force_batch(env_states[i])
+            if self.preprocessors[env_id] is not None:
+                if self.is_preprocessed[env_id] is False:
+                    self.preprocessed_states_buffer[i] = self.preprocessors[env_id].preprocess(state)
+                    self.is_preprocessed[env_id] = True
+            else:
+                self.preprocessed_states_buffer[i] = env_states[i]
+
+    def _flip_actions(self, actions):
+        """
+        Splits a batch of actions into one action per environment.
+        """
+        if self.agent.flat_action_space is not None:
+            some_key = next(iter(actions))
+            assert isinstance(actions, dict) and isinstance(actions[some_key], np.ndarray),\
+                "ERROR: Cannot flip container-action batch with dict keys if returned value is not a dict OR " \
+                "values of returned value are not np.ndarrays!"
+            if hasattr(actions[some_key], "__len__"):
+                return [{key: value[i] for key, value in actions.items()} for i in range(len(actions[some_key]))]
+            else:
+                # Action was not array type.
+                return actions
+        # No flipping necessary.
+        elif np.shape(actions) == ():
+            return [actions]
+        return actions
+
     @ray.method(num_return_vals=2)
-    def execute_and_get_with_count(self):
-        sample = self.execute_and_get_timesteps(num_timesteps=self.worker_sample_size)
+    def execute_and_get_with_count(self, worker_sample_size=None):
+        """
+        Executes one sample task.
+
+        Args:
+            worker_sample_size (Optional[int]): Number of samples per environment, e.g. as tuned by the executor.
+                Default: The worker sample size of the worker spec.
+
+        Returns:
+            Tuple[EnvironmentSample,int]: The sample and its size.
+        """
+        num_timesteps = self.worker_sample_size if worker_sample_size is None else \
+            worker_sample_size * self.num_environments
+        sample = self.execute_and_get_timesteps(num_timesteps=num_timesteps)
         return sample, sample.batch_size
 
     def set_weights(self, weights):
-        policy_weights = {k: v for k,v in zip(weights.policy_vars, weights.policy_values)}
-        vf_weights = None
-        if weights.has_vf:
-            vf_weights = {k: v for k, v in zip(weights.value_function_vars, weights.value_function_values)}
-        self.agent.set_weights(policy_weights, value_function_weights=vf_weights)
+        weights = weights.get_weights()
+        self.agent.set_weights(weights["policy_weights"], value_function_weights=weights["value_function_weights"])
 
     def get_workload_statistics(self):
         """
@@ -432,8 +508,7 @@ class RayPolicyWorker(RayActor):
 
         if self.compress:
             env_dtype = self.vector_env.state_space.dtype
-            states = [ray_compress(np.asarray(state, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                      for state in states]
+            states = ray_compress_batch(np.asarray(states, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
         return dict(
             states=states,
             actions=actions,
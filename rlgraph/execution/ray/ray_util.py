@@ -19,6 +19,7 @@ from __future__ import print_function
 
 import os
 import base64
+import time
 import numpy as np
 from six import string_types
 from rlgraph import get_distributed_backend
@@ -30,30 +31,264 @@ if get_distributed_backend() == "ray":
     import pyarrow
 
 
+def quantize_array(value, quantization):
+    """
+    Quantizes a floating point array to 16 bits.
+
+    Args:
+        value (ndarray): The array to quantize.
+        quantization (str): One of "float16" or "bfloat16". Numpy has no bfloat16 type, bfloat16 values are stored
+            as the upper 16 bits (rounded to nearest even) of the float32 values in a uint16 array.
+
+    Returns:
+        ndarray: The quantized array.
+    """
+    if quantization == "float16":
+        return value.astype(np.float16)
+    elif quantization == "bfloat16":
+        bits = np.ascontiguousarray(value, dtype=np.float32).view(np.uint32)
+        rounding = ((bits >> 16) & 1) + np.uint32(0x7FFF)
+        return ((bits + rounding) >> 16).astype(np.uint16)
+    raise RLGraphError("Unknown weight quantization '{}'. Must be one of 'float16' or 'bfloat16'.".format(
+        quantization))
+
+
+def dequantize_array(value, quantization, dtype):
+    """
+    Reverts `quantize_array`.
+
+    Args:
+        value (ndarray): The quantized array.
+        quantization (str): One of "float16" or "bfloat16".
+        dtype (np.dtype): The dtype of the original array.
+
+    Returns:
+        ndarray: The dequantized array.
+    """
+    if quantization == "bfloat16":
+        value = (value.astype(np.uint32) << 16).view(np.float32)
+    return value.astype(dtype)
+
+
 # Follows utils used in Ray RLlib.
 class RayWeight(object):
     """
     Wrapper to transport TF weights to deal with serialisation bugs in Ray/Arrow.
 
+    Weights can be versioned, quantized to 16 bits (see `quantize_array`) and delta-encoded. Delta-encoded weights
+    contain the differences of floating point variables to the weights of the previous version and the values of
+    all other changed variables. Variables which did not change are omitted. Use `get_weights` to decode.
+
     #TODO investigate serialisation bugs in Ray/flatten values.
     """
 
-    def __init__(self, weights):
-        self.policy_vars = []
-        self.policy_values = []
+    def __init__(self, weights, version=None, base_weights=None, quantization=None):
+        """
+        Args:
+            weights (dict): Weights as returned by `Agent.get_weights`.
+            version (Optional[int]): Version of the weights.
+            base_weights (Optional[dict]): If given, weights of the previous version (as held by the receivers) to
+                encode the differences to.
+            quantization (Optional[str]): One of "float16" or "bfloat16" to quantize floating point values (or
+                differences).
+        """
+        self.version = version
+        self.is_delta = base_weights is not None
+        self.quantization = quantization
 
-        for k, v in weights["policy_weights"].items():
-            self.policy_vars.append(k)
-            self.policy_values.append(v)
+        self.policy_vars, self.policy_values, self.policy_dtypes = self._encode(
+            weights["policy_weights"], base_weights["policy_weights"] if self.is_delta else None
+        )
 
         self.has_vf = False
-        if "value_function_weights" in weights:
-            self.value_function_vars = []
-            self.value_function_values = []
+        if weights.get("value_function_weights") is not None:
             self.has_vf = True
-            for k, v in weights["value_function_weights"].items():
-                self.value_function_vars.append(k)
-                self.value_function_values.append(v)
+            self.value_function_vars, self.value_function_values, self.value_function_dtypes = self._encode(
+                weights["value_function_weights"], base_weights["value_function_weights"] if self.is_delta else None
+            )
+
+    def _encode(self, values, base_values):
+        names = []
+        encoded_values = []
+        # Original dtypes of quantized values (None if not quantized).
+        dtypes = []
+        for name, value in values.items():
+            value = np.asarray(value)
+            floating = np.issubdtype(value.dtype, np.floating)
+            if base_values is not None:
+                if not floating:
+                    if np.array_equal(value, base_values[name]):
+                        continue
+                else:
+                    value = value - base_values[name]
+                    if not np.any(value):
+                        continue
+            names.append(name)
+            if floating and self.quantization is not None:
+                dtypes.append(value.dtype)
+                value = quantize_array(value, self.quantization)
+            else:
+                dtypes.append(None)
+            encoded_values.append(value)
+        return names, encoded_values, dtypes
+
+    def _decode(self, names, values, dtypes, base_values):
+        weights = dict(base_values) if self.is_delta else {}
+        for name, value, dtype in zip(names, values, dtypes):
+            if dtype is not None:
+                value = dequantize_array(value, self.quantization, dtype)
+            if self.is_delta and np.issubdtype(value.dtype, np.floating):
+                value = (base_values[name] + value).astype(value.dtype)
+            weights[name] = value
+        return weights
+
+    def get_weights(self, base_weights=None):
+        """
+        Decodes the weights.
+
+        Args:
+            base_weights (Optional[dict]): Weights of the previous version, required for delta-encoded weights.
+
+        Returns:
+            dict: Weights in the format of `Agent.get_weights` (value function weights are None if not contained).
+        """
+        if self.is_delta and base_weights is None:
+            raise RLGraphError("Delta-encoded weights of version {} require the weights of the previous "
+                               "version.".format(self.version))
+        weights = dict(
+            policy_weights=self._decode(
+                self.policy_vars, self.policy_values, self.policy_dtypes,
+                base_weights["policy_weights"] if self.is_delta else None
+            ),
+            value_function_weights=None
+        )
+        if self.has_vf:
+            weights["value_function_weights"] = self._decode(
+                self.value_function_vars, self.value_function_values, self.value_function_dtypes,
+                base_weights["value_function_weights"] if self.is_delta else None
+            )
+        return weights
+
+    @property
+    def nbytes(self):
+        values = self.policy_values + (self.value_function_values if self.has_vf else [])
+        return sum(value.nbytes for value in values)
+
+
+class RayWeightBroadcaster(object):
+    """
+    Publishes monotonically versioned weight snapshots to remote workers.
+
+    Each `publish` creates a new version whose encoded weights are put into the object store once and shared by all
+    workers. Workers are handed the latest version when they are ready for a sync (see `get_weights_for`): With
+    delta encoding, workers holding the previous version receive the differences to it, all others receive a full
+    snapshot. Deltas are computed against the weights the workers hold after decoding, so quantization errors do
+    not accumulate over versions.
+    """
+
+    def __init__(self, quantization=None, delta_encoding=False):
+        """
+        Args:
+            quantization (Optional[str]): One of "float16" or "bfloat16" to quantize weights, see `RayWeight`.
+            delta_encoding (bool): Whether to send workers holding the previous version only the differences to it.
+        """
+        assert quantization in [None, "float16", "bfloat16"]
+        self.quantization = quantization
+        self.delta_encoding = delta_encoding
+
+        # Version 0: Nothing published yet.
+        self.version = 0
+        # Weights of the current version as held by workers after decoding (raw weights without delta encoding).
+        self.weights = None
+        # Object ids of the full snapshot (created on demand) and the delta of the current version.
+        self.full_weights_id = None
+        self.delta_weights_id = None
+
+        # Encoded bytes and encode+put latencies of all objects put, and the bytes sent to workers.
+        self.broadcast_bytes = []
+        self.broadcast_times = []
+        self.num_full_syncs = 0
+        self.num_delta_syncs = 0
+        self.sync_bytes = 0
+        self.full_weights_bytes = 0
+        self.delta_weights_bytes = 0
+
+    def publish(self, weights):
+        """
+        Publishes the weights as a new version.
+
+        Args:
+            weights (dict): Weights as returned by `Agent.get_weights`.
+
+        Returns:
+            int: The new version.
+        """
+        self.version += 1
+        self.full_weights_id = None
+        self.delta_weights_id = None
+        if not self.delta_encoding:
+            self.weights = weights
+        elif self.weights is None:
+            # Workers hold the decoded full snapshot.
+            start = time.perf_counter()
+            full_weights = RayWeight(weights, version=self.version, quantization=self.quantization)
+            self.weights = full_weights.get_weights()
+            self._put_full(full_weights, start)
+        else:
+            start = time.perf_counter()
+            delta_weights = RayWeight(weights, version=self.version, base_weights=self.weights,
+                                      quantization=self.quantization)
+            self.weights = delta_weights.get_weights(self.weights)
+            self.delta_weights_id = ray.put(delta_weights)
+            self.delta_weights_bytes = delta_weights.nbytes
+            self.broadcast_bytes.append(self.delta_weights_bytes)
+            self.broadcast_times.append(time.perf_counter() - start)
+        return self.version
+
+    def _put_full(self, full_weights, start):
+        self.full_weights_id = ray.put(full_weights)
+        self.full_weights_bytes = full_weights.nbytes
+        self.broadcast_bytes.append(self.full_weights_bytes)
+        self.broadcast_times.append(time.perf_counter() - start)
+
+    def get_weights_for(self, version):
+        """
+        Returns the weights to bring a worker from its version to the latest version.
+
+        Args:
+            version (int): The version the worker holds (0 if it holds none).
+
+        Returns:
+            any: Object id of a `RayWeight`, or None if the worker holds the latest version.
+        """
+        if version == self.version:
+            return None
+        elif version == self.version - 1 and self.delta_weights_id is not None:
+            self.num_delta_syncs += 1
+            self.sync_bytes += self.delta_weights_bytes
+            return self.delta_weights_id
+        if self.full_weights_id is None:
+            start = time.perf_counter()
+            self._put_full(RayWeight(self.weights, version=self.version, quantization=self.quantization), start)
+        self.num_full_syncs += 1
+        self.sync_bytes += self.full_weights_bytes
+        return self.full_weights_id
+
+    def get_metrics(self):
+        """
+        Returns:
+            dict: Broadcast metrics: Number of versions, number of full and delta syncs, bytes sent to workers and
+                bytes and latencies of the encoded weights put into the object store.
+        """
+        return dict(
+            weight_versions=self.version,
+            weight_full_syncs=self.num_full_syncs,
+            weight_delta_syncs=self.num_delta_syncs,
+            weight_sync_bytes=self.sync_bytes,
+            mean_weight_broadcast_bytes=np.mean(self.broadcast_bytes) if self.broadcast_bytes else 0,
+            mean_weight_broadcast_latency=np.mean(self.broadcast_times) if self.broadcast_times else 0,
+            max_weight_broadcast_latency=np.max(self.broadcast_times) if self.broadcast_times else 0
+        )
 
 
 class RayTaskPool(object):
@@ -96,6 +331,143 @@ class RayTaskPool(object):
                 yield (self.ray_tasks.pop(obj_id), self.ray_objects.pop(obj_id))
 
 
+class RaySampleBatchTuner(object):
+    """
+    Tunes the number of samples per worker task and the number of sample tasks in flight per worker online to
+    maximise the sample throughput.
+
+    Both knobs are tuned by coordinate-wise hill climbing over windows of completed tasks: At the end of a window,
+    its throughput (samples per second) is compared to the throughput of the previous window. The knob changed last
+    keeps its direction if the throughput did not decrease and reverses it otherwise, then the other knob is moved
+    one step in its direction. Sample sizes are scaled by `sample_size_factor`, task depths change by one. No knob is
+    increased after windows with backpressure (the learner did not keep up with the sampled data) or if the bytes of
+    all tasks in flight would exceed `max_inflight_bytes`.
+    """
+
+    def __init__(self, sample_size, task_depth, num_workers, min_sample_size=None, max_sample_size=None,
+                 min_task_depth=1, max_task_depth=4, tuning_interval=None, sample_size_factor=1.5,
+                 max_inflight_bytes=None):
+        """
+        Args:
+            sample_size (int): Initial number of samples per task (per environment of a worker).
+            task_depth (int): Initial number of tasks in flight per worker.
+            num_workers (int): Number of sample workers.
+            min_sample_size (Optional[int]): Lower bound for the sample size. Default: A quarter of the initial one.
+            max_sample_size (Optional[int]): Upper bound for the sample size. Default: Four times the initial one.
+            min_task_depth (int): Lower bound for the task depth.
+            max_task_depth (int): Upper bound for the task depth.
+            tuning_interval (Optional[int]): Number of completed tasks per window. Default: Twice the maximum number
+                of tasks in flight, so most tasks of a window were scheduled with its settings.
+            sample_size_factor (float): Factor by which sample sizes are increased or decreased.
+            max_inflight_bytes (Optional[int]): Upper bound for the bytes of all sample tasks in flight (estimated
+                from the mean bytes per sample).
+        """
+        self.min_sample_size = min_sample_size or max(1, sample_size // 4)
+        self.max_sample_size = max_sample_size or sample_size * 4
+        self.min_task_depth = min_task_depth
+        self.max_task_depth = max(max_task_depth, task_depth)
+        self.sample_size = int(np.clip(sample_size, self.min_sample_size, self.max_sample_size))
+        self.task_depth = task_depth
+        self.num_workers = num_workers
+        self.tuning_interval = tuning_interval or 2 * self.max_task_depth * num_workers
+        self.sample_size_factor = sample_size_factor
+        self.max_inflight_bytes = max_inflight_bytes
+
+        # Knob to change next and directions of both knobs.
+        self.knob = "sample_size"
+        self.directions = dict(sample_size=1, task_depth=1)
+        self.last_throughput = None
+
+        # Stats of the current window.
+        self.window_start = None
+        self.window_tasks = 0
+        self.window_samples = 0
+        self.window_backpressure = False
+
+        # Totals for metrics.
+        self.num_tasks = 0
+        self.num_samples = 0
+        self.task_latency = 0.0
+        self.task_bytes = 0
+
+    def observe_task(self, batch_size, runtime, sample_bytes):
+        """
+        Records a completed sample task.
+
+        Args:
+            batch_size (int): Number of samples returned.
+            runtime (float): Runtime of the task on the worker in seconds.
+            sample_bytes (int): Size of the returned sample in bytes.
+        """
+        if self.window_start is None:
+            self.window_start = time.perf_counter()
+        self.window_tasks += 1
+        self.window_samples += batch_size
+        self.num_tasks += 1
+        self.num_samples += batch_size
+        self.task_latency += runtime
+        self.task_bytes += sample_bytes
+
+    def update(self, backpressure=False):
+        """
+        Ends the current window if it is complete and moves one knob.
+
+        Args:
+            backpressure (bool): Whether the learner did not keep up with the sampled data since the last call.
+
+        Returns:
+            bool: True if a knob was changed.
+        """
+        self.window_backpressure = self.window_backpressure or backpressure
+        if self.window_tasks < self.tuning_interval:
+            return False
+
+        throughput = self.window_samples / ((time.perf_counter() - self.window_start) or 1e-10)
+        if self.last_throughput is not None and throughput < self.last_throughput:
+            self.directions[self.knob] *= -1
+        self.last_throughput = throughput
+        self.knob = "task_depth" if self.knob == "sample_size" else "sample_size"
+
+        sample_size, task_depth = self.sample_size, self.task_depth
+        direction = self.directions[self.knob]
+        if self.window_backpressure:
+            direction = -1
+        if self.knob == "sample_size":
+            factor = self.sample_size_factor if direction > 0 else 1.0 / self.sample_size_factor
+            sample_size = int(np.clip(round(sample_size * factor), self.min_sample_size, self.max_sample_size))
+        else:
+            task_depth = int(np.clip(task_depth + direction, self.min_task_depth, self.max_task_depth))
+
+        # Bytes of all tasks in flight with the new settings must stay within budget.
+        bytes_per_sample = self.task_bytes / max(self.num_samples, 1)
+        if self.max_inflight_bytes is not None and sample_size * task_depth > self.sample_size * self.task_depth \
+                and bytes_per_sample * sample_size * task_depth * self.num_workers > self.max_inflight_bytes:
+            sample_size, task_depth = self.sample_size, self.task_depth
+
+        changed = (sample_size, task_depth) != (self.sample_size, self.task_depth)
+        self.sample_size, self.task_depth = sample_size, task_depth
+        self.window_start = time.perf_counter()
+        self.window_tasks = 0
+        self.window_samples = 0
+        self.window_backpressure = False
+        return changed
+
+    def get_metrics(self):
+        """
+        Returns:
+            dict: Current sample size and task depth, throughput of the last window and mean latency and bytes per
+                sample task.
+        """
+        num_tasks = max(self.num_tasks, 1)
+        return dict(
+            worker_sample_size=self.sample_size,
+            worker_task_depth=self.task_depth,
+            tuned_sample_throughput=self.last_throughput,
+            mean_sample_task_latency=self.task_latency / num_tasks,
+            mean_sample_task_bytes=self.task_bytes / num_tasks
+        )
+
+
 def create_colocated_ray_actors(cls, config, num_agents, max_attempts=10):
     """
     Creates a specified number of co-located RayActors.
@@ -171,6 +543,178 @@ def ray_decompress(data):
     return data
 
 
+class RayCompressedBatch(object):
+    """
+    A batch of equally shaped arrays, each compressed into its own LZ4 frame of the raw array bytes.
+
+    All frames are stored back to back in one contiguous bytes buffer, so a batch is transported as a single
+    raw buffer (no per-item serialization or text encoding). Single items remain separately decompressible,
+    so replay memories can store and sample them individually.
+    """
+    def __init__(self, buffer, offsets, shape, dtype):
+        """
+        Args:
+            buffer (bytes): The concatenated LZ4 frames.
+            offsets (ndarray): Start offsets of all frames and the end offset of the last frame.
+            shape (tuple): Shape of a single (uncompressed) item.
+            dtype (Union[str,np.dtype]): Dtype of the items.
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    @staticmethod
+    def from_frames(frames, shape, dtype):
+        """
+        Creates a batch from a list of LZ4 frames.
+
+        Args:
+            frames (list): LZ4 frames (bytes), one per item.
+            shape (tuple): Shape of a single item.
+            dtype (Union[str,np.dtype]): Dtype of the items.
+
+        Returns:
+            RayCompressedBatch: The batch.
+        """
+        offsets = np.zeros(shape=(len(frames) + 1,), dtype=np.int64)
+        offsets[1:] = np.cumsum([len(frame) for frame in frames])
+        return RayCompressedBatch(b"".join(frames), offsets, shape, dtype)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def frames(self):
+        """
+        Returns:
+            list: The LZ4 frames (bytes) of all items.
+        """
+        return [self.buffer[start:end] for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def decompress(self, out=None):
+        """
+        Decompresses all items.
+
+        Args:
+            out (Optional[ndarray]): Preallocated output array of shape [len(self), *shape].
+
+        Returns:
+            ndarray: The decompressed batch.
+        """
+        return ray_decompress_frames(self.frames(), self.shape, self.dtype, out=out)
+
+
+class RayCompressedTransitions(object):
+    """
+    The states and next-states of a batch of transitions as indices into one shared `RayCompressedBatch` of frames.
+
+    Within a trajectory, the next-state of a transition is the state of a later transition, so nearly every frame is
+    both. Sharing the frames means each one is compressed, transported and decompressed once instead of twice.
+    """
+    def __init__(self, frames, state_indices, next_state_indices):
+        """
+        Args:
+            frames (RayCompressedBatch): The shared frame table.
+            state_indices (ndarray): Index of each transition's state in `frames`.
+            next_state_indices (ndarray): Index of each transition's next-state in `frames`.
+        """
+        self.frames = frames
+        self.state_indices = np.asarray(state_indices, dtype=np.int64)
+        self.next_state_indices = np.asarray(next_state_indices, dtype=np.int64)
+
+    @property
+    def shape(self):
+        return self.frames.shape
+
+    @property
+    def dtype(self):
+        return self.frames.dtype
+
+    def __len__(self):
+        return len(self.state_indices)
+
+    def get_frames(self):
+        """
+        Returns:
+            Tuple[list,list]: The LZ4 frames of the states and of the next-states. Shared frames are the same bytes
+                objects.
+        """
+        frames = self.frames.frames()
+        return [frames[i] for i in self.state_indices], [frames[i] for i in self.next_state_indices]
+
+    def decompress(self):
+        """
+        Decompresses each frame once.
+
+        Returns:
+            Tuple[ndarray,ndarray]: The states and the next-states.
+        """
+        frames = self.frames.decompress()
+        return frames[self.state_indices], frames[self.next_state_indices]
+
+    @staticmethod
+    def merge(transitions):
+        """
+        Concatenates transition batches.
+
+        Args:
+            transitions (list): The `RayCompressedTransitions` to merge.
+
+        Returns:
+            RayCompressedTransitions: The merged batch with one frame table.
+        """
+        frame_offsets = np.cumsum([0] + [len(t.frames) for t in transitions[:-1]])
+        return RayCompressedTransitions(
+            frames=RayCompressedBatch.from_frames(
+                [frame for t in transitions for frame in t.frames.frames()], transitions[0].shape,
+                transitions[0].dtype
+            ),
+            state_indices=np.concatenate([t.state_indices + offset for t, offset in zip(transitions, frame_offsets)]),
+            next_state_indices=np.concatenate([t.next_state_indices + offset for t, offset in
+                                               zip(transitions, frame_offsets)])
+        )
+
+
+def ray_compress_batch(data):
+    """
+    Compresses a batch of arrays into a `RayCompressedBatch`.
+
+    Args:
+        data (Union[ndarray,list]): Batch of equally shaped arrays.
+
+    Returns:
+        RayCompressedBatch: The compressed batch.
+    """
+    data = np.asarray(data)
+    frames = [lz4.frame.compress(np.ascontiguousarray(item)) for item in data]
+    return RayCompressedBatch.from_frames(frames, data.shape[1:], data.dtype)
+
+
+def ray_decompress_frames(frames, shape, dtype, out=None, out_indices=None):
+    """
+    Decompresses LZ4 frames of raw array bytes (as created by `ray_compress_batch`) into one array.
+
+    Args:
+        frames (Union[list,ndarray]): LZ4 frames (bytes), one per item.
+        shape (tuple): Shape of a single item.
+        dtype (Union[str,np.dtype]): Dtype of the items.
+        out (Optional[ndarray]): Preallocated output array of shape [len(frames), *shape].
+        out_indices (Optional[ndarray]): Rows of `out` to write the items to. Default: The first len(frames) rows.
+
+    Returns:
+        ndarray: The decompressed items.
+    """
+    if out is None:
+        out = np.empty(shape=(len(frames),) + tuple(shape), dtype=dtype)
+    for i, frame in enumerate(frames):
+        out[i if out_indices is None else out_indices[i]] = \
+            np.frombuffer(lz4.frame.decompress(frame), dtype=dtype).reshape(shape)
+    return out
+
+
 # Ray's magic constant worker explorations..
 def worker_exploration(worker_index, num_workers):
     """
@@ -190,7 +734,8 @@ def merge_samples(samples, decompress=False):
     Merges list of samples into a final batch.
     Args:
         samples (list): List of EnvironmentSamples
-        decompress (bool): If true, assume states are compressed and decompress them.
+        decompress (bool): If true, assume states are compressed and decompress them. Compressed transitions are
+            decompressed into "states" and "next_states".
 
     Returns:
         dict: Sample batch of numpy arrays.
@@ -203,10 +748,66 @@ def merge_samples(samples, decompress=False):
             batch[key] = {}
             for name in sample_layout[key].keys():
                 batch[key][name] = np.concatenate([sample.sample_batch[key][name] for sample in samples])
+        elif isinstance(sample_layout[key], RayCompressedTransitions):
+            transitions = [sample.sample_batch[key] for sample in samples]
+            if decompress:
+                num_transitions = sum(len(t) for t in transitions)
+                shape = (num_transitions,) + sample_layout[key].shape
+                batch["states"] = np.empty(shape=shape, dtype=sample_layout[key].dtype)
+                batch["next_states"] = np.empty(shape=shape, dtype=sample_layout[key].dtype)
+                start = 0
+                for t in transitions:
+                    states, next_states = t.decompress()
+                    batch["states"][start:start + len(t)] = states
+                    batch["next_states"][start:start + len(t)] = next_states
+                    start += len(t)
+            else:
+                batch[key] = RayCompressedTransitions.merge(transitions)
+        elif isinstance(sample_layout[key], RayCompressedBatch):
+            compressed = [sample.sample_batch[key] for sample in samples]
+            if decompress:
+                # Decompress all samples straight into one preallocated batch.
+                batch[key] = np.empty(
+                    shape=(sum(len(c) for c in compressed),) + sample_layout[key].shape, dtype=sample_layout[key].dtype
+                )
+                start = 0
+                for c in compressed:
+                    c.decompress(out=batch[key][start:start + len(c)])
+                    start += len(c)
+            else:
+                batch[key] = RayCompressedBatch.from_frames(
+                    [frame for c in compressed for frame in c.frames()], sample_layout[key].shape,
+                    sample_layout[key].dtype
+                )
         else:
             batch[key] = np.concatenate([sample.sample_batch[key] for sample in samples])
 
     if decompress:
         assert "states" in batch
-        batch["states"] = np.asarray([ray_decompress(state) for state in batch["states"]])
+        if "states" in sample_layout and not isinstance(sample_layout["states"], RayCompressedBatch):
+            batch["states"] = np.asarray([ray_decompress(state) for state in batch["states"]])
     return batch
+
+
+def get_sample_bytes(value):
+    """
+    Estimates the size of a (possibly compressed) sample batch in the object store.
+
+    Args:
+        value (any): Sample batch or one of its values.
+
+    Returns:
+        int: Approximate number of bytes.
+    """
+    if isinstance(value, RayCompressedBatch):
+        return len(value.buffer) + np.asarray(value.offsets).nbytes
+    elif isinstance(value, RayCompressedTransitions):
+        return get_sample_bytes(value.frames) + value.state_indices.nbytes + value.next_state_indices.nbytes
+    elif isinstance(value, dict):
+        return sum(get_sample_bytes(sub_value) for sub_value in value.values())
+    elif isinstance(value, (bytes, bytearray) + string_types):
+        return len(value)
+    elif isinstance(value, (list, tuple)) and len(value) > 0 and \
+            isinstance(value[0], (np.ndarray, dict, list, tuple, bytes, bytearray) + string_types):
+        return sum(get_sample_bytes(sub_value) for sub_value in value)
+    return np.asarray(value).nbytes
@@ -22,13 +22,16 @@ import numpy as np
 from six.moves import xrange as range_
 
 from rlgraph.utils import util
+from rlgraph.utils.numpy import n_step_transitions
 from rlgraph import get_distributed_backend
 from rlgraph.utils.util import SMALL_NUMBER
 from rlgraph.environments.sequential_vector_env import SequentialVectorEnv
+from rlgraph.environments.subproc_vector_env import SubprocVectorEnv
 from rlgraph.execution.environment_sample import EnvironmentSample
 from rlgraph.execution.ray import RayExecutor
 from rlgraph.execution.ray.ray_actor import RayActor
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.ray.ray_util import get_sample_bytes, ray_compress_batch, RayCompressedTransitions
+from rlgraph.utils.rlgraph_errors import RLGraphError
 
 if get_distributed_backend() == "ray":
     import ray
@@ -63,9 +66,14 @@ class RayValueWorker(RayActor):
         self.n_step_adjustment = worker_spec.pop("n_step_adjustment", 1)
         self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         num_background_envs = worker_spec.pop("num_background_envs", 1)
+        # Number of processes to step environments in (0: step sequentially in this process).
+        num_env_processes = worker_spec.pop("num_env_processes", 0)
 
         # TODO from spec once we decided on generic vectorization.
-        self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        if num_env_processes > 0:
+            self.vector_env = SubprocVectorEnv(self.num_environments, env_spec, num_processes=num_env_processes)
+        else:
+            self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
 
         # Then update agent config.
         agent_config['state_space'] = self.vector_env.state_space
@@ -115,6 +123,10 @@ class RayValueWorker(RayActor):
         self.total_worker_steps = 0
         self.episodes_executed = 0
 
+        # Latest weights set (decoded) and their version, see `RayWeightBroadcaster`.
+        self.weights = None
+        self.weights_version = 0
+
         # Step time and steps done per call to execute_and_get to measure throughput of this worker.
         self.sample_times = []
         self.sample_steps = []
@@ -209,6 +221,8 @@ class RayValueWorker(RayActor):
         else:
             batch_actions = []
         batch_states, batch_rewards, batch_next_states, batch_terminals = [], [], [], []
+        # Batch positions of the last transitions of finished episodes and of unfinished trajectory fragments.
+        batch_episode_ends, batch_fragment_ends = [], []
 
         # Running trajectories.
         sample_states, sample_actions, sample_rewards, sample_terminals = {}, {}, {}, {}
@@ -318,23 +332,18 @@ class RayValueWorker(RayActor):
                     # Extend because next state has a batch dim.
                     env_sample_next_states.extend(next_state)
 
-                    # Post-process this trajectory via n-step discounting.
-                    # print("processing terminal episode of length:", len(env_sample_states))
-                    post_s, post_a, post_r, post_next_s, post_t = self._truncate_n_step(env_sample_states,
-                        sample_actions[env_id], sample_rewards[env_id], env_sample_next_states,
-                        sample_terminals[env_id], was_terminal=True)
-
-                    # Append to final result trajectories.
-                    batch_states.extend(post_s)
+                    # Append to final result trajectories (n-step post-processed at once after sampling).
+                    batch_states.extend(env_sample_states)
                     if self.agent.flat_action_space is not None:
                         # Use actions here, not env actions.
                         for name in self.agent.flat_action_space.keys():
-                            batch_actions[name].extend(post_a[name])
+                            batch_actions[name].extend(sample_actions[env_id][name])
                     else:
-                        batch_actions.extend(post_a)
-                    batch_rewards.extend(post_r)
-                    batch_next_states.extend(post_next_s)
-                    batch_terminals.extend(post_t)
+                        batch_actions.extend(sample_actions[env_id])
+                    batch_rewards.extend(sample_rewards[env_id])
+                    batch_next_states.extend(env_sample_next_states)
+                    batch_terminals.extend(sample_terminals[env_id])
+                    batch_episode_ends.append(len(batch_rewards) - 1)
 
                     # Reset running trajectory for this env.
                     sample_states[env_id] = []
@@ -373,8 +382,9 @@ class RayValueWorker(RayActor):
         # We already accounted for all terminated episodes. This means we only
         # have to do accounting for any unfinished fragments.
         for i, env_id in enumerate(self.env_ids):
-            # This env was not terminal -> need to process remaining trajectory
-            if not terminals[i]:
+            # This env was not terminal -> need to process remaining trajectory. The trajectory is empty if the
+            # episode was ended by `max_timesteps_per_episode` in the last step (the env is already reset).
+            if not terminals[i] and len(sample_rewards[env_id]) > 0:
                 env_sample_states = sample_states[env_id]
                 # Get next states for this environment's trajectory.
                 env_sample_next_states = env_sample_states[1:]
@@ -388,24 +398,29 @@ class RayValueWorker(RayActor):
 
                 # Extend because next state has a batch dim.
                 env_sample_next_states.extend(next_state)
-                post_s, post_a, post_r, post_next_s, post_t = self._truncate_n_step(env_sample_states,
-                    sample_actions[env_id], sample_rewards[env_id], env_sample_next_states,
-                    sample_terminals[env_id], was_terminal=False)
 
-                batch_states.extend(post_s)
+                batch_states.extend(env_sample_states)
                 if self.agent.flat_action_space is not None:
                     # Use actions here, not env actions.
                     for name in self.agent.flat_action_space.keys():
-                        batch_actions[name].extend(post_a[name])
+                        batch_actions[name].extend(sample_actions[env_id][name])
                 else:
-                    batch_actions.extend(post_a)
-                batch_rewards.extend(post_r)
-                batch_next_states.extend(post_next_s)
-                batch_terminals.extend(post_t)
+                    batch_actions.extend(sample_actions[env_id])
+                batch_rewards.extend(sample_rewards[env_id])
+                batch_next_states.extend(env_sample_next_states)
+                batch_terminals.extend(sample_terminals[env_id])
+                batch_fragment_ends.append(len(batch_rewards) - 1)
+
+        # Post-process all trajectories via n-step discounting.
+        transition_indices, batch_rewards, batch_terminals, next_state_indices = self._truncate_n_step(
+            batch_rewards, batch_terminals, batch_episode_ends, batch_fragment_ends
+        )
 
         # Perform final batch-processing once.
-        sample_batch, batch_size = self._batch_process_sample(batch_states, batch_actions,
-                                                              batch_rewards, batch_next_states, batch_terminals)
+        sample_batch, batch_size = self._batch_process_sample(
+            batch_states, batch_actions, batch_rewards, batch_next_states, batch_terminals,
+            batch_episode_ends + batch_fragment_ends, transition_indices, next_state_indices
+        )
 
         total_time = (time.monotonic() - start) or 1e-10
         self.sample_steps.append(timesteps_executed)
@@ -427,19 +442,43 @@ class RayValueWorker(RayActor):
         )
 
     @ray.method(num_return_vals=2)
-    def execute_and_get_with_count(self):
-        sample = self.execute_and_get_timesteps(num_timesteps=self.worker_sample_size)
+    def execute_and_get_with_count(self, worker_sample_size=None):
+        """
+        Executes one sample task.
+
+        Args:
+            worker_sample_size (Optional[int]): Number of samples per environment, e.g. as tuned by the executor.
+                Default: The worker sample size of the worker spec.
+
+        Returns:
+            Tuple[EnvironmentSample,dict]: The sample and its size, last rewards, runtime and (approximate) bytes.
+        """
+        num_timesteps = self.worker_sample_size if worker_sample_size is None else \
+            worker_sample_size * self.num_environments
+        sample = self.execute_and_get_timesteps(num_timesteps=num_timesteps)
 
         # Return count and reward as separate task so learner thread does not need to download them before
         # inserting to buffers..
-        return sample, {"batch_size": sample.batch_size, "last_rewards": sample.metrics["last_rewards"]}
+        return sample, {"batch_size": sample.batch_size, "last_rewards": sample.metrics["last_rewards"],
+                        "runtime": sample.metrics["runtime"], "sample_bytes": get_sample_bytes(sample.sample_batch)}
 
     def set_weights(self, weights):
-        policy_weights = {k: v for k,v in zip(weights.policy_vars, weights.policy_values)}
-        vf_weights = None
-        if weights.has_vf:
-            vf_weights = {k: v for k, v in zip(weights.value_function_vars, weights.value_function_values)}
-        self.agent.set_weights(policy_weights, value_function_weights=vf_weights)
+        """
+        Sets the agent's weights. Versioned weights which are not newer than the held weights are ignored,
+        delta-encoded weights are applied to the held weights.
+
+        Args:
+            weights (RayWeight): The weights to set.
+        """
+        if weights.version is not None and weights.version <= self.weights_version:
+            return
+        if weights.is_delta and weights.version - 1 != self.weights_version:
+            raise RLGraphError("Cannot apply weights delta of version {} to weights of version {}.".format(
+                weights.version, self.weights_version))
+        self.weights = weights.get_weights(self.weights)
+        self.weights_version = weights.version or 0
+        self.agent.set_weights(self.weights["policy_weights"],
+                               value_function_weights=self.weights["value_function_weights"])
 
     def get_workload_statistics(self):
         """
@@ -481,71 +520,74 @@ class RayValueWorker(RayActor):
             mean_worker_env_frames_per_second=sum(adjusted_frames) / sum(self.sample_times)
         )
 
-    def _truncate_n_step(self, states, actions, rewards, next_states, terminals, was_terminal=True):
+    def _truncate_n_step(self, rewards, terminals, episode_ends, fragment_ends):
         """
-        Computes n-step truncation for exactly one episode segment of one environment.
+        Computes n-step transitions for the concatenated trajectories of all environments, see
+        `rlgraph.utils.numpy.n_step_transitions`. Episode and fragment ends only bound the n-step horizons, the
+        n-step terminals are the environments' terminals, so time-limited episodes are still bootstrapped.
+        Transitions at the end of unfinished fragments or time-limited episodes which lack a full n-step horizon
+        are dropped.
+
+        Args:
+            rewards (list): Rewards.
+            terminals (list): Terminals.
+            episode_ends (list): Batch positions of the last transitions of finished episodes (terminal or
+                time-limited).
+            fragment_ends (list): Batch positions of the last transitions of unfinished trajectories.
 
         Returns:
-             n-step truncated (shortened) version.
+             Tuple[ndarray,ndarray,ndarray,ndarray]: Batch positions of the kept transitions, their n-step rewards
+                and terminals and the batch positions of their n-step next states (among the 1-step next states).
         """
+        num_transitions = len(rewards)
         if self.n_step_adjustment > 1:
-            new_len = len(states) - self.n_step_adjustment + 1
-
-            # There are 2 cases. If the trajectory did not end in a terminal,
-            # we just have to move states forward and truncate.
-            if was_terminal:
-                # We know the ONLY last terminal is True.
-                terminal_position = len(rewards) - 1
-                for i in range(len(rewards)):
-                    for j in range(1, self.n_step_adjustment):
-                        # Outside sample data. Stop inner loop and set truncate = True
-                        if i + j >= len(next_states):
-                            break
-                        # Normal case: No terminal ahead (so far) in n-step sequence.
-                        if i + j < terminal_position:
-                            next_states[i] = next_states[i + j]
-                            rewards[i] += self.discount ** j * rewards[i + j]
-                        # Terminal ahead: Don't go beyond it.
-                        # Repeat it for the remaining n-steps and always assume r=0.0.
-                        else:
-                            next_states[i] = next_states[terminal_position]
-                            terminals[i] = True
-                            if i + j <= terminal_position:
-                                rewards[i] += self.discount ** j * rewards[i + j]
-            else:
-                # We know this segment does not contain any terminals so we simply have to adjust next
-                # states and rewards.
-                for i in range_(len(rewards) - self.n_step_adjustment + 1):
-                    for j in range_(1, self.n_step_adjustment):
-                        next_states[i] = next_states[i + j]
-                        rewards[i] += self.discount ** j * rewards[i + j]
-
-                if self.agent.flat_action_space is not None:
-                    for arr in [states, rewards, next_states, terminals]:
-                        del arr[new_len:]
-                    # Delete container actions separately.
-                    for name in self.agent.flat_action_space.keys():
-                        del actions[name][new_len:]
-                else:
-                    for arr in [states, actions, rewards, next_states, terminals]:
-                        del arr[new_len:]
+            sequence_end_mask = np.zeros(shape=(num_transitions,), dtype=np.bool_)
+            sequence_end_mask[episode_ends] = True
+            sequence_end_mask[fragment_ends] = True
+            rewards, next_state_indices, terminals, complete = n_step_transitions(
+                rewards, terminals, self.n_step_adjustment, self.discount, sequence_ends=sequence_end_mask
+            )
+            keep = np.flatnonzero(complete)
+            return keep, rewards[keep], terminals[keep], next_state_indices[keep]
 
-        return states, actions, rewards, next_states, terminals
+        positions = np.arange(num_transitions)
+        return positions, np.asarray(rewards), np.asarray(terminals), positions
 
-    def _batch_process_sample(self, states, actions, rewards, next_states, terminals):
+    def _batch_process_sample(self, states, actions, rewards, next_states, terminals, trajectory_ends,
+                              transition_indices, next_state_indices):
         """
         Batch Post-processes sample, e.g. by computing priority weights, and compressing.
 
+        States are compressed into one frame table holding all states plus the final next-state of each trajectory
+        (within a trajectory, the 1-step next-state of a transition is the state of the following transition).
+        States and next-states of the sample are indices into this table.
+
         Args:
-            states (list): List of states.
+            states (list): List of states of all collected transitions.
             actions (list, dict): List of actions or dict of lists  for container actions.
-            rewards (list): List of rewards.
-            next_states: (list): List of next_states.
-            terminals (list): List of terminals.
+            rewards (ndarray): n-step rewards of the kept transitions.
+            next_states: (list): List of 1-step next_states of all collected transitions.
+            terminals (ndarray): n-step terminals of the kept transitions.
+            trajectory_ends (list): Batch positions of the last transitions of all trajectories.
+            transition_indices (ndarray): Batch positions of the kept transitions.
+            next_state_indices (ndarray): Batch positions (in `next_states`) of the kept transitions' next-states.
 
         Returns:
             dict: Sample batch dict.
         """
+        num_transitions = len(states)
+        trajectory_ends = np.sort(np.asarray(trajectory_ends, dtype=np.int64))
+        env_dtype = util.convert_dtype(dtype=self.vector_env.state_space.dtype, to='np')
+        frames = np.asarray(states + [next_states[i] for i in trajectory_ends], dtype=env_dtype)
+        next_state_frames = np.arange(1, num_transitions + 1)
+        next_state_frames[trajectory_ends] = num_transitions + np.arange(len(trajectory_ends))
+        state_indices = transition_indices
+        next_state_indices = next_state_frames[next_state_indices]
+
+        if self.container_actions:
+            actions = {name: np.asarray(actions[name])[transition_indices] for name in self.action_space.keys()}
+        else:
+            actions = np.asarray(actions)[transition_indices]
         weights = np.ones_like(rewards)
 
         # Compute loss-per-item.
@@ -553,33 +595,21 @@ class RayValueWorker(RayActor):
             # Next states were just collected, we batch process them here.
             _, loss_per_item = self.agent.post_process(
                 dict(
-                    states=states,
+                    states=frames[state_indices],
                     actions=actions,
                     rewards=rewards,
                     terminals=terminals,
-                    next_states=next_states,
+                    next_states=frames[next_state_indices],
                     importance_weights=weights
                 )
             )
             weights = np.abs(loss_per_item) + SMALL_NUMBER
-        env_dtype = self.vector_env.state_space.dtype
-        compressed_states = [ray_compress(np.asarray(state, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                             for state in states]
 
-        compressed_next_states = compressed_states[self.n_step_adjustment:] + \
-                                 [ray_compress(np.asarray(next_s,dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                                  for next_s in next_states[-self.n_step_adjustment:]]
-        if self.container_actions:
-            for name in self.action_space.keys():
-                actions[name] = np.array(actions[name])
-        else:
-            actions = np.array(actions)
         return dict(
-            states=compressed_states,
+            transitions=RayCompressedTransitions(ray_compress_batch(frames), state_indices, next_state_indices),
             actions=actions,
-            rewards=np.array(rewards),
-            terminals=np.array(terminals),
-            next_states=compressed_next_states,
+            rewards=rewards,
+            terminals=terminals,
             importance_weights=np.array(weights)
         ), len(rewards)
 
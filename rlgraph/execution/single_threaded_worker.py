@@ -23,14 +23,23 @@ from six.moves import xrange as range_
 
 from rlgraph.components import PreprocessorStack
 from rlgraph.execution.worker import Worker
-from rlgraph.spaces.containers import Dict, Tuple
+from rlgraph.spaces.containers import ContainerSpace, Dict, Tuple
 from rlgraph.utils.rlgraph_errors import RLGraphError
-from rlgraph.utils.util import default_dict
+from rlgraph.utils.util import default_dict, convert_dtype
 
 
 class SingleThreadedWorker(Worker):
 
-    def __init__(self, preprocessing_spec=None, worker_executes_preprocessing=True, **kwargs):
+    def __init__(self, preprocessing_spec=None, worker_executes_preprocessing=True, num_ready_environments=None,
+                 **kwargs):
+        """
+        Args:
+            preprocessing_spec (Optional[list]): Preprocessors to run in the worker.
+            worker_executes_preprocessing (bool): Whether the worker (instead of the agent) preprocesses states.
+            num_ready_environments (Optional[int]): If given, environments are stepped asynchronously and the worker
+                acts for whichever (at least) `num_ready_environments` environments finished stepping first
+                instead of waiting for all of them. Requires a vector env implementing `step_async`/`step_ready`.
+        """
         super(SingleThreadedWorker, self).__init__(**kwargs)
 
         self.logger.info("Initialized single-threaded executor with {} environments '{}' and Agent '{}'".format(
@@ -44,12 +53,12 @@ class SingleThreadedWorker(Worker):
         self.worker_executes_preprocessing = worker_executes_preprocessing
         if self.worker_executes_preprocessing:
             self.preprocessors = {}
-            self.state_is_preprocessed = {}
             for env_id in self.env_ids:
                 self.preprocessors[env_id] = self.setup_preprocessor(
                     preprocessing_spec, self.vector_env.state_space.with_batch_rank()
                 )
-                self.state_is_preprocessed[env_id] = False
+        # Whether the current state of an environment is already in the preprocessed states buffer.
+        self.state_is_preprocessed = np.zeros(shape=(self.num_environments,), dtype=np.bool_)
 
         self.apply_preprocessing = not self.worker_executes_preprocessing
         self.preprocessed_states_buffer = np.zeros(
@@ -64,15 +73,26 @@ class SingleThreadedWorker(Worker):
         self.finished_episode_timesteps = [[] for _ in range_(self.num_environments)]
 
         # Accumulated return over the running episode.
-        self.episode_returns = [0 for _ in range_(self.num_environments)]
+        self.episode_returns = np.zeros(shape=(self.num_environments,), dtype=np.float64)
         # The number of steps taken in the running episode.
-        self.episode_timesteps = [0 for _ in range_(self.num_environments)]
+        self.episode_timesteps = np.zeros(shape=(self.num_environments,), dtype=np.int64)
         # Whether the running episode has terminated.
-        self.episode_terminals = [False for _ in range_(self.num_environments)]
+        self.episode_terminals = np.zeros(shape=(self.num_environments,), dtype=np.bool_)
         # Wall time of the last start of the running episode.
-        self.episode_starts = [0 for _ in range_(self.num_environments)]
-        # The current state of the running episode.
-        self.env_states = [None for _ in range_(self.num_environments)]
+        self.episode_starts = np.zeros(shape=(self.num_environments,), dtype=np.float64)
+        # The current state of the running episode. A [num_environments, *shape] array (a list for container
+        # state spaces), created on the first reset.
+        self.container_states = isinstance(self.vector_env.state_space, ContainerSpace)
+        self.env_states = None
+        # Rewards accumulated over the frameskip of the current step.
+        self.env_step_rewards = np.zeros(shape=(self.num_environments,), dtype=np.float64)
+
+        self.num_ready_environments = num_ready_environments
+        # Asynchronous stepping: Whether an environment is stepping, its action and the number of env-steps taken
+        # in its current frameskip. The state the action was picked for stays in the preprocessed states buffer.
+        self.env_stepping = np.zeros(shape=(self.num_environments,), dtype=np.bool_)
+        self.env_actions = [None for _ in range_(self.num_environments)]
+        self.env_step_frames = np.zeros(shape=(self.num_environments,), dtype=np.int64)
 
     @staticmethod
     def setup_preprocessor(preprocessing_spec, in_space):
@@ -175,15 +195,10 @@ class SingleThreadedWorker(Worker):
 
         num_timesteps = num_timesteps or 0
         num_episodes = num_episodes or 0
-        max_timesteps_per_episode = [max_timesteps_per_episode or 0 for _ in range_(self.num_environments)]
+        max_timesteps_per_episode = max_timesteps_per_episode or 0
         frameskip = frameskip or self.frameskip
 
-        # Stats.
-        timesteps_executed = 0
-        episodes_executed = 0
-
         start = time.perf_counter()
-        episode_terminals = self.episode_terminals
         if reset is True:
             self.env_frames = 0
             self.episodes_since_update = 0
@@ -191,149 +206,35 @@ class SingleThreadedWorker(Worker):
             self.finished_episode_durations = [[] for _ in range_(self.num_environments)]
             self.finished_episode_timesteps = [[] for _ in range_(self.num_environments)]
 
-            for i, env_id in enumerate(self.env_ids):
-                self.episode_returns[i] = 0
-                self.episode_timesteps[i] = 0
-                self.episode_terminals[i] = False
-                self.episode_starts[i] = time.perf_counter()
-                if self.worker_executes_preprocessing:
-                    self.state_is_preprocessed[env_id] = False
-
-            self.env_states = self.vector_env.reset_all()
-            self.agent.reset()
-        elif self.env_states[0] is None:
-            raise RLGraphError("Runner must be reset at the very beginning. Environment is in invalid state.")
+            self.episode_returns[:] = 0.0
+            self.episode_timesteps[:] = 0
+            self.episode_terminals[:] = False
+            self.episode_starts[:] = time.perf_counter()
+            self.state_is_preprocessed[:] = False
 
-        # Only run everything for at most num_timesteps (if defined).
-        env_states = self.env_states
-        while not (0 < num_timesteps <= timesteps_executed):
-            if self.render:
-                self.vector_env.render()
-
-            time_percentage = min(self.agent.timesteps / max_timesteps, 1.0)
-
-            if self.worker_executes_preprocessing:
-                for i, env_id in enumerate(self.env_ids):
-                    state, _ = self.agent.state_space.force_batch(env_states[i])
-                    if self.preprocessors[env_id] is not None:
-                        if self.state_is_preprocessed[env_id] is False:
-                            self.preprocessed_states_buffer[i] = self.preprocessors[env_id].preprocess(state)
-                            self.state_is_preprocessed[env_id] = True
-                    else:
-                        self.preprocessed_states_buffer[i] = env_states[i]
-                # TODO extra returns when worker is not applying preprocessing.
-                actions = self.agent.get_action(
-                    states=self.preprocessed_states_buffer, use_exploration=use_exploration,
-                    apply_preprocessing=self.apply_preprocessing, time_percentage=time_percentage
-                )
-                preprocessed_states = np.array(self.preprocessed_states_buffer)
+            states = self.vector_env.reset_all()
+            if self.container_states:
+                self.env_states = list(states)
             else:
-                actions, preprocessed_states = self.agent.get_action(
-                    states=np.array(env_states), use_exploration=use_exploration,
-                    apply_preprocessing=True, extra_returns="preprocessed_states", time_percentage=time_percentage
-                )
-
-            # Accumulate the reward over n env-steps (equals one action pick). n=self.frameskip.
-            env_rewards = [0 for _ in range_(self.num_environments)]
-            next_states = None
-
-            # For Dict action spaces, we have to treat each key as an array with batch-rank at index 0.
-            # The action-dict is then translated into a list of dicts where each dict contains the original data
-            # but without the batch-rank.
-            # E.g. {'A': array([0, 1]), 'B': array([2, 3])} -> [{'A': 0, 'B': 2}, {'A': 1, 'B': 3}]
-            if isinstance(self.agent.action_space, Dict):
-                some_key = next(iter(actions))
-                assert isinstance(actions, dict) and isinstance(actions[some_key], np.ndarray),\
-                    "ERROR: Cannot flip Dict-action batch with dict keys if returned value is not a dict OR " \
-                    "values of returned value are not np.ndarrays!"
-                # TODO: What if actions come as nested dicts (more than one level deep)?
-                # TODO: Use DataOpDict/Tuple's new `map` method.
-                if hasattr(actions[some_key], "__len__"):
-                    env_actions = [{key: value[i] for key, value in actions.items()} for i in range(len(actions[some_key]))]
-                else:
-                    # Action was not array type.
-                    env_actions = [{key: value for key, value in actions.items()}]
-            # Tuple action Spaces:
-            # E.g. Tuple(array([0, 1]), array([2, 3])) -> [(0, 2), (1, 3)]
-            elif isinstance(self.agent.action_space, Tuple):
-                assert isinstance(actions, tuple) and isinstance(actions[0], np.ndarray),\
-                    "ERROR: Cannot flip tuple-action batch if returned value is not a tuple OR " \
-                    "values of returned value are not np.ndarrays!"
-                # TODO: Use DataOpDict/Tuple's new `map` method.
-                env_actions = [tuple(value[i] for _, value in enumerate(actions)) for i in range(len(actions[0]))]
-            # No container batch-flipping necessary.
-            else:
-                env_actions = actions
-                if self.num_environments == 1 and env_actions.shape == ():
-                    env_actions = [env_actions]
-
-            for _ in range_(frameskip):
-                next_states, step_rewards, episode_terminals, _ = self.vector_env.step(actions=env_actions)
-
-                self.env_frames += self.num_environments
-                for i, step_reward in enumerate(step_rewards):
-                    env_rewards[i] += step_reward
-                if np.any(episode_terminals):
-                    break
-
-            # Only render once per action.
-            #if self.render:
-            #    self.vector_env.environments[0].render()
-
-            for i, env_id in enumerate(self.env_ids):
-                self.episode_returns[i] += env_rewards[i]
-                self.episode_timesteps[i] += 1
-
-                if 0 < max_timesteps_per_episode[i] <= self.episode_timesteps[i]:
-                    episode_terminals[i] = True
-                if self.worker_executes_preprocessing:
-                    self.state_is_preprocessed[env_id] = False
-                # Do accounting for finished episodes.
-                if episode_terminals[i]:
-                    episodes_executed += 1
-                    self.episodes_since_update += 1
-                    episode_duration = time.perf_counter() - self.episode_starts[i]
-                    self.finished_episode_returns[i].append(self.episode_returns[i])
-                    self.finished_episode_durations[i].append(episode_duration)
-                    self.finished_episode_timesteps[i].append(self.episode_timesteps[i])
-
-                    self.log_finished_episode(
-                        episode_return=self.episode_returns[i],
-                        duration=episode_duration,
-                        timesteps=self.episode_timesteps[i],
-                        env_num=i
+                if self.env_states is None:
+                    self.env_states = np.zeros(
+                        shape=(self.num_environments,) + self.vector_env.state_space.shape,
+                        dtype=convert_dtype(self.vector_env.state_space.dtype, to="np")
                     )
+                self.env_states[:] = states
+            self.env_stepping[:] = False
+            self.agent.reset()
+        elif self.env_states is None:
+            raise RLGraphError("Runner must be reset at the very beginning. Environment is in invalid state.")
 
-                    # Reset this environment and its preprocecssor stack.
-                    env_states[i] = self.vector_env.reset(i)
-                    if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
-                        self.preprocessors[env_id].reset()
-                        # This re-fills the sequence with the reset state.
-                        state, _ = self.agent.state_space.force_batch(env_states[i])
-                        # Pre - process, add to buffer
-                        self.preprocessed_states_buffer[i] = np.array(self.preprocessors[env_id].preprocess(state))
-                        self.state_is_preprocessed[env_id] = True
-
-                    self.episode_returns[i] = 0
-                    self.episode_timesteps[i] = 0
-                    self.episode_starts[i] = time.perf_counter()
-                else:
-                    # Otherwise assign states to next states
-                    env_states[i] = next_states[i]
-
-                if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
-                    #next_state, _ = self.agent.state_space.force_batch(env_states[i])
-                    next_states[i] = np.array(self.preprocessors[env_id].preprocess(env_states[i]))  # next_state
-                self._observe(
-                    self.env_ids[i], preprocessed_states[i], env_actions[i], env_rewards[i], next_states[i],
-                    episode_terminals[i]
-                )
-            self.update_if_necessary(time_percentage=time_percentage)
-            timesteps_executed += self.num_environments
-            num_timesteps_reached = (0 < num_timesteps <= timesteps_executed)
-
-            if 0 < num_episodes <= episodes_executed or num_timesteps_reached:
-                break
+        if self.num_ready_environments is not None:
+            timesteps_executed, episodes_executed = self._execute_ready_environments(
+                num_timesteps, num_episodes, max_timesteps, max_timesteps_per_episode, use_exploration, frameskip
+            )
+        else:
+            timesteps_executed, episodes_executed = self._execute_all_environments(
+                num_timesteps, num_episodes, max_timesteps, max_timesteps_per_episode, use_exploration, frameskip
+            )
 
         total_time = (time.perf_counter() - start) or 1e-10
 
@@ -356,8 +257,6 @@ class SingleThreadedWorker(Worker):
             max_episode_reward = np.max(all_finished_rewards)
             final_episode_reward = all_finished_rewards[-1]
 
-        self.episode_terminals = episode_terminals
-        self.env_states = env_states
         results = dict(
             runtime=total_time,
             # Agent act/observe throughput.
@@ -396,6 +295,278 @@ class SingleThreadedWorker(Worker):
 
         return results
 
+    def _execute_all_environments(self, num_timesteps, num_episodes, max_timesteps, max_timesteps_per_episode,
+                                  use_exploration, frameskip):
+        """
+        Execution loop stepping all environments at once.
+
+        Returns:
+            Tuple[int,int]: The number of timesteps and episodes executed.
+        """
+        timesteps_executed = 0
+        episodes_executed = 0
+
+        env_indices = np.arange(self.num_environments)
+        # Only run everything for at most num_timesteps (if defined).
+        while not (0 < num_timesteps <= timesteps_executed):
+            if self.render:
+                self.vector_env.render()
+
+            time_percentage = min(self.agent.timesteps / max_timesteps, 1.0)
+            actions, preprocessed_states = self._get_actions(env_indices, use_exploration, time_percentage)
+            env_actions = self._flip_actions(actions)
+
+            # Accumulate the reward over n env-steps (equals one action pick). n=self.frameskip.
+            self.env_step_rewards[:] = 0.0
+            next_states = None
+            step_terminals = None
+            for _ in range_(frameskip):
+                next_states, step_rewards, step_terminals, _ = self.vector_env.step(actions=env_actions)
+
+                self.env_frames += self.num_environments
+                self.env_step_rewards += step_rewards
+                if np.any(step_terminals):
+                    break
+
+            # Only render once per action.
+            #if self.render:
+            #    self.vector_env.environments[0].render()
+
+            episodes_executed += self._finish_timesteps(
+                env_indices, preprocessed_states, env_actions, self.env_step_rewards, next_states, step_terminals,
+                max_timesteps_per_episode
+            )
+            self.update_if_necessary(time_percentage=time_percentage)
+            timesteps_executed += self.num_environments
+            num_timesteps_reached = (0 < num_timesteps <= timesteps_executed)
+
+            if 0 < num_episodes <= episodes_executed or num_timesteps_reached:
+                break
+
+        return timesteps_executed, episodes_executed
+
+    def _execute_ready_environments(self, num_timesteps, num_episodes, max_timesteps, max_timesteps_per_episode,
+                                    use_exploration, frameskip):
+        """
+        Execution loop for asynchronous stepping: Picks actions for all environments not currently stepping, then
+        continues with whichever (at least) `num_ready_environments` environments finished first, while the others
+        keep stepping. Frameskip is applied per environment.
+
+        Returns:
+            Tuple[int,int]: The number of timesteps and episodes executed.
+        """
+        timesteps_executed = 0
+        episodes_executed = 0
+        while not (0 < num_timesteps <= timesteps_executed):
+            if self.render:
+                self.vector_env.render()
+
+            time_percentage = min(self.agent.timesteps / max_timesteps, 1.0)
+            env_indices = np.flatnonzero(~self.env_stepping)
+            if len(env_indices) > 0:
+                actions, preprocessed_states = self._get_actions(env_indices, use_exploration, time_percentage)
+                env_actions = self._flip_actions(actions)
+                for j, i in enumerate(env_indices):
+                    self.env_actions[i] = env_actions[j]
+                self.preprocessed_states_buffer[env_indices] = preprocessed_states
+                self.env_step_rewards[env_indices] = 0.0
+                self.env_step_frames[env_indices] = 0
+                self.vector_env.step_async(env_actions, env_indices)
+                self.env_stepping[env_indices] = True
+
+            env_indices, next_states, step_rewards, step_terminals, _ = self.vector_env.step_ready(
+                self.num_ready_environments
+            )
+            self.env_stepping[env_indices] = False
+            self.env_frames += len(env_indices)
+            self.env_step_rewards[env_indices] += step_rewards
+            self.env_step_frames[env_indices] += 1
+            # Environments repeat their action until the frameskip is reached or the episode ends.
+            step_terminals = np.asarray(step_terminals, dtype=np.bool_)
+            finished = step_terminals | (self.env_step_frames[env_indices] >= frameskip)
+
+            if np.any(finished):
+                positions = np.flatnonzero(finished)
+                finished_indices = env_indices[positions]
+                if self.container_states:
+                    next_states = [next_states[j] for j in positions]
+                else:
+                    next_states = np.asarray(next_states)[positions]
+                episodes_executed += self._finish_timesteps(
+                    finished_indices, self.preprocessed_states_buffer[finished_indices],
+                    [self.env_actions[i] for i in finished_indices], self.env_step_rewards[finished_indices],
+                    next_states, step_terminals[positions], max_timesteps_per_episode
+                )
+                timesteps_executed += len(finished_indices)
+
+            repeat_indices = env_indices[~finished]
+            if len(repeat_indices) > 0:
+                self.vector_env.step_async([self.env_actions[i] for i in repeat_indices], repeat_indices)
+                self.env_stepping[repeat_indices] = True
+            self.update_if_necessary(time_percentage=time_percentage)
+
+            if 0 < num_episodes <= episodes_executed:
+                break
+
+        return timesteps_executed, episodes_executed
+
+    def _get_actions(self, env_indices, use_exploration, time_percentage):
+        """
+        Preprocesses the current states of the given environments (if the worker executes preprocessing) and picks
+        actions for them.
+
+        Args:
+            env_indices (ndarray): Indices of the environments to act for.
+            use_exploration (bool): Whether to use exploration.
+            time_percentage (float): The time percentage passed to the agent.
+
+        Returns:
+            tuple: The actions and the preprocessed states.
+        """
+        if self.worker_executes_preprocessing:
+            for i in env_indices:
+                env_id = self.env_ids[i]
+                if self.preprocessors[env_id] is not None:
+                    if not self.state_is_preprocessed[i]:
+                        state, _ = self.agent.state_space.force_batch(self.env_states[i])
+                        self.preprocessed_states_buffer[i] = self.preprocessors[env_id].preprocess(state)
+                        self.state_is_preprocessed[i] = True
+                else:
+                    self.preprocessed_states_buffer[i] = self.env_states[i]
+            preprocessed_states = self.preprocessed_states_buffer[env_indices]
+            # TODO extra returns when worker is not applying preprocessing.
+            actions = self.agent.get_action(
+                states=preprocessed_states, use_exploration=use_exploration,
+                apply_preprocessing=self.apply_preprocessing, time_percentage=time_percentage
+            )
+            return actions, preprocessed_states
+        else:
+            if self.container_states:
+                states = np.array([self.env_states[i] for i in env_indices])
+            else:
+                states = self.env_states[env_indices]
+            return self.agent.get_action(
+                states=states, use_exploration=use_exploration,
+                apply_preprocessing=True, extra_returns="preprocessed_states", time_percentage=time_percentage
+            )
+
+    def _flip_actions(self, actions):
+        """
+        Splits a batch of actions into one action per environment.
+
+        Args:
+            actions (any): The batched actions returned by the agent.
+
+        Returns:
+            list: One action per environment.
+        """
+        # For Dict action spaces, we have to treat each key as an array with batch-rank at index 0.
+        # The action-dict is then translated into a list of dicts where each dict contains the original data
+        # but without the batch-rank.
+        # E.g. {'A': array([0, 1]), 'B': array([2, 3])} -> [{'A': 0, 'B': 2}, {'A': 1, 'B': 3}]
+        if isinstance(self.agent.action_space, Dict):
+            some_key = next(iter(actions))
+            assert isinstance(actions, dict) and isinstance(actions[some_key], np.ndarray),\
+                "ERROR: Cannot flip Dict-action batch with dict keys if returned value is not a dict OR " \
+                "values of returned value are not np.ndarrays!"
+            # TODO: What if actions come as nested dicts (more than one level deep)?
+            # TODO: Use DataOpDict/Tuple's new `map` method.
+            if hasattr(actions[some_key], "__len__"):
+                return [{key: value[i] for key, value in actions.items()} for i in range(len(actions[some_key]))]
+            else:
+                # Action was not array type.
+                return [{key: value for key, value in actions.items()}]
+        # Tuple action Spaces:
+        # E.g. Tuple(array([0, 1]), array([2, 3])) -> [(0, 2), (1, 3)]
+        elif isinstance(self.agent.action_space, Tuple):
+            assert isinstance(actions, tuple) and isinstance(actions[0], np.ndarray),\
+                "ERROR: Cannot flip tuple-action batch if returned value is not a tuple OR " \
+                "values of returned value are not np.ndarrays!"
+            # TODO: Use DataOpDict/Tuple's new `map` method.
+            return [tuple(value[i] for _, value in enumerate(actions)) for i in range(len(actions[0]))]
+        # No container batch-flipping necessary.
+        elif np.shape(actions) == ():
+            return [actions]
+        return actions
+
+    def _finish_timesteps(self, env_indices, preprocessed_states, actions, rewards, next_states, terminals,
+                          max_timesteps_per_episode):
+        """
+        Does the accounting for one (frame-skipped) step of the given environments, resets the environments whose
+        episode finished and lets the agent observe the transitions.
+
+        Args:
+            env_indices (ndarray): Indices of the environments.
+            preprocessed_states (ndarray): The preprocessed states the actions were picked for.
+            actions (list): The actions (one per environment).
+            rewards (ndarray): The rewards accumulated over the step.
+            next_states (Union[ndarray,list]): The next states returned by the environments.
+            terminals (Union[ndarray,list]): The terminals returned by the environments.
+            max_timesteps_per_episode (int): Maximum episode length (0 for no limit).
+
+        Returns:
+            int: The number of finished episodes.
+        """
+        self.episode_returns[env_indices] += rewards
+        self.episode_timesteps[env_indices] += 1
+        terminals = np.asarray(terminals, dtype=np.bool_)
+        if max_timesteps_per_episode > 0:
+            terminals = terminals | (self.episode_timesteps[env_indices] >= max_timesteps_per_episode)
+        self.episode_terminals[env_indices] = terminals
+        self.state_is_preprocessed[env_indices] = False
+
+        # Running episodes continue with their next states.
+        if self.container_states:
+            for j in np.flatnonzero(~terminals):
+                self.env_states[env_indices[j]] = next_states[j]
+        else:
+            next_states = np.asarray(next_states)
+            self.env_states[env_indices[~terminals]] = next_states[~terminals]
+        for i in env_indices[terminals]:
+            self._reset_environment(i)
+
+        for j, i in enumerate(env_indices):
+            env_id = self.env_ids[i]
+            next_state = next_states[j]
+            if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
+                next_state = np.array(self.preprocessors[env_id].preprocess(self.env_states[i]))
+            self._observe(env_id, preprocessed_states[j], actions[j], rewards[j], next_state, terminals[j])
+        return int(np.sum(terminals))
+
+    def _reset_environment(self, i):
+        """
+        Records the finished episode of an environment and resets the environment and its preprocessor stack.
+
+        Args:
+            i (int): Index of the environment.
+        """
+        env_id = self.env_ids[i]
+        self.episodes_since_update += 1
+        episode_duration = time.perf_counter() - self.episode_starts[i]
+        self.finished_episode_returns[i].append(self.episode_returns[i])
+        self.finished_episode_durations[i].append(episode_duration)
+        self.finished_episode_timesteps[i].append(self.episode_timesteps[i])
+
+        self.log_finished_episode(
+            episode_return=self.episode_returns[i],
+            duration=episode_duration,
+            timesteps=self.episode_timesteps[i],
+            env_num=i
+        )
+
+        self.env_states[i] = self.vector_env.reset(i)
+        if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
+            self.preprocessors[env_id].reset()
+            # This re-fills the sequence with the reset state.
+            state, _ = self.agent.state_space.force_batch(self.env_states[i])
+            # Pre - process, add to buffer
+            self.preprocessed_states_buffer[i] = np.array(self.preprocessors[env_id].preprocess(state))
+            self.state_is_preprocessed[i] = True
+
+        self.episode_returns[i] = 0.0
+        self.episode_timesteps[i] = 0
+        self.episode_starts[i] = time.perf_counter()
+
     def _observe(self, env_ids, states, actions, rewards, next_states, terminals):
         # TODO: If worker does not execute preprocessing, next state is not preprocessed here.
         # Observe per environment.
@@ -18,6 +18,8 @@ from __future__ import division
 from __future__ import print_function
 
 from rlgraph import get_backend
+from rlgraph.graphs.build_cache import BuildCache
+from rlgraph.graphs.build_profiler import BuildProfiler
 from rlgraph.graphs.meta_graph import MetaGraph
 from rlgraph.graphs.meta_graph_builder import MetaGraphBuilder
 from rlgraph.graphs.graph_builder import GraphBuilder
@@ -44,5 +46,5 @@ GraphExecutor.__lookup_classes__ = dict(
     pytorch=PyTorchExecutor
 )
 
-__all__ = ["MetaGraph", "MetaGraphBuilder", "GraphBuilder",
+__all__ = ["BuildCache", "BuildProfiler", "MetaGraph", "MetaGraphBuilder", "GraphBuilder",
            "GraphExecutor", "TensorFlowExecutor", "PyTorchExecutor", "backend_executor"]
@@ -0,0 +1,235 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import six
+
+import rlgraph
+from rlgraph import get_backend
+from rlgraph.utils.op_records import DataOpRecord
+from rlgraph.utils.ops import flatten_op, unflatten_op
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+if get_backend() == "tf":
+    import tensorflow as tf
+    from tensorflow.core.framework import variable_pb2
+
+
+# Hash of the RLgraph sources, computed once per process.
+_code_hash = None
+
+
+def get_code_hash():
+    """
+    Returns a hash of all RLgraph source files (except tests), so that cache entries of modified code are not reused.
+
+    Returns:
+        str: The hex digest.
+    """
+    global _code_hash
+    if _code_hash is None:
+        package_directory = os.path.dirname(os.path.abspath(rlgraph.__file__))
+        sha = hashlib.sha1()
+        for directory, subdirectories, files in os.walk(package_directory):
+            subdirectories[:] = sorted(name for name in subdirectories if name != "tests")
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    path = os.path.join(directory, name)
+                    sha.update(os.path.relpath(path, package_directory).encode("utf-8"))
+                    with open(path, "rb") as f:
+                        sha.update(f.read())
+        _code_hash = sha.hexdigest()
+    return _code_hash
+
+
+class BuildCache(object):
+    """
+    Persistent cache of built TensorFlow graphs, so that processes building the same agent (e.g. Ray workers)
+    can import the graph instead of building it.
+
+    Entries are keyed by a hash of a JSON-serializable build key (e.g. the agent config), the input spaces, the RLgraph
+    version and sources and the TensorFlow version. An entry consists of the exported MetaGraphDef and a layout file
+    which maps the API-methods' input- and output op-records, the Components' variable registries, the summaries of each
+    API-method and additional executor variables to graph element names. The meta graph (API-methods and Components) is
+    still built from the Components, only the backend graph build is replaced by the import.
+    """
+    META_GRAPH_FILE = "graph.meta"
+    LAYOUT_FILE = "layout.json"
+
+    def __init__(self, directory, key, input_spaces):
+        """
+        Args:
+            directory (str): Cache directory. Created if it does not exist.
+            key (any): JSON-serializable key describing everything the graph depends on besides the input spaces,
+                e.g. the agent config. Non-serializable values are serialized via `str`.
+            input_spaces (dict): The input spaces of the build.
+        """
+        self.directory = directory
+        self.hash = self.get_hash(key, input_spaces)
+        self.path = os.path.join(self.directory, self.hash)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def get_hash(key, input_spaces):
+        description = json.dumps(dict(
+            key=key,
+            input_spaces={name: str(space) for name, space in (input_spaces or {}).items()},
+            backend=get_backend(),
+            rlgraph_version=rlgraph.__version__,
+            code_hash=get_code_hash(),
+            version=tf.__version__ if get_backend() == "tf" else None
+        ), sort_keys=True, default=str)
+        return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, self.LAYOUT_FILE))
+
+    def store(self, graph, graph_builder, summaries, variables):
+        """
+        Writes the built graph to the cache. Does nothing if the entry exists already (e.g. written concurrently by
+        another process) or if the graph contains python-side values which cannot be cached.
+
+        Args:
+            graph (tf.Graph): The built graph.
+            graph_builder (GraphBuilder): The GraphBuilder which built the graph.
+            summaries (dict): Lists of summary ops by API-method name.
+            variables (dict): Additional variables of the executor by name. Values are single variables or lists of
+                variables (e.g. optimizer variables).
+
+        Returns:
+            bool: True if the entry was written.
+        """
+        if self.exists():
+            return False
+        protos = {}
+
+        def variable_name(variable):
+            if not isinstance(variable, tf.Variable):
+                raise RLGraphError("Cannot cache non-variable '{}'.".format(variable))
+            protos[variable.name] = base64.b64encode(variable.to_proto().SerializeToString()).decode("ascii")
+            return variable.name
+
+        try:
+            layout = dict(
+                api={name: dict(
+                    inputs=[self._op_names(op_rec.op) for op_rec in in_op_records],
+                    outputs=[self._op_names(op_rec.op) for op_rec in out_op_records]
+                ) for name, (in_op_records, out_op_records) in graph_builder.api.items()},
+                variable_registries={
+                    component.global_scope: {key: variable_name(variable) for key, variable in
+                                             component.variable_registry.items()}
+                    for component in graph_builder.root_component.get_all_sub_components(exclude_self=False)
+                },
+                summaries={name: [op.name for op in ops] for name, ops in summaries.items()},
+                variables={name: [variable_name(v) for v in value] if isinstance(value, (list, tuple)) else
+                           variable_name(value) for name, value in variables.items()}
+            )
+        except RLGraphError as e:
+            self.logger.warning("Not caching graph build: {}".format(e))
+            return False
+        layout["variable_protos"] = protos
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        # Write to a temporary directory and rename it, so readers never see incomplete entries.
+        temp_path = tempfile.mkdtemp(dir=self.directory)
+        tf.train.export_meta_graph(filename=os.path.join(temp_path, self.META_GRAPH_FILE), graph=graph)
+        with open(os.path.join(temp_path, self.LAYOUT_FILE), "w") as f:
+            json.dump(layout, f)
+        try:
+            os.rename(temp_path, self.path)
+        except OSError:
+            # Written by another process in the meantime.
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return False
+        self.logger.info("Stored graph build in cache entry {}.".format(self.path))
+        return True
+
+    def load(self, graph_builder):
+        """
+        Imports the cached graph into the current default graph and restores the API-methods' op-records and the
+        Components' variable registries of the graph builder's (meta-graph-built) root component.
+
+        Args:
+            graph_builder (GraphBuilder): The GraphBuilder whose api and root component to restore.
+
+        Returns:
+            Tuple[dict,dict]: Lists of summary ops by API-method name and the executor's additional variables by
+                name (see `store`).
+        """
+        with open(os.path.join(self.path, self.LAYOUT_FILE)) as f:
+            layout = json.load(f)
+        tf.train.import_meta_graph(os.path.join(self.path, self.META_GRAPH_FILE))
+        graph = tf.get_default_graph()
+
+        # Variables in standard collections are restored by the import, all others via their protos.
+        variables = {variable.name: variable for variable in tf.global_variables() + tf.local_variables()}
+        for name, serialized in layout["variable_protos"].items():
+            if name not in variables:
+                proto = variable_pb2.VariableDef()
+                proto.ParseFromString(base64.b64decode(serialized))
+                variables[name] = tf.Variable.from_proto(proto)
+
+        if set(layout["api"].keys()) != set(graph_builder.api.keys()):
+            raise RLGraphError("API-methods of cache entry {} do not match the meta graph.".format(self.path))
+        for name, (in_op_records, out_op_records) in graph_builder.api.items():
+            for op_rec, names in zip(in_op_records, layout["api"][name]["inputs"]):
+                op_rec.op = self._lookup_op(graph, names)
+            for op_rec, names in zip(out_op_records, layout["api"][name]["outputs"]):
+                op_rec.op = self._lookup_op(graph, names)
+
+        for component in graph_builder.root_component.get_all_sub_components(exclude_self=False):
+            registry = layout["variable_registries"].get(component.global_scope, {})
+            component.variable_registry.update({key: variables[name] for key, name in registry.items()})
+            component.input_complete = True
+            component.variable_complete = True
+            component.built = True
+
+        summaries = {name: [graph.as_graph_element(op_name) for op_name in op_names]
+                     for name, op_names in layout["summaries"].items()}
+        executor_variables = {name: [variables[n] for n in value] if isinstance(value, list) else variables[value]
+                              for name, value in layout["variables"].items()}
+        return summaries, executor_variables
+
+    @staticmethod
+    def _op_names(op):
+        if op is None:
+            return None
+        names = {}
+        for flat_key, value in flatten_op(op, mapping=lambda o: o.op if isinstance(o, DataOpRecord) else o).items():
+            if isinstance(value, (tf.Tensor, tf.Operation, tf.Variable)):
+                names[flat_key] = value.name
+            elif value is None or isinstance(value, (bool, float) + six.integer_types + six.string_types):
+                # Python constants.
+                names[flat_key] = dict(value=value)
+            else:
+                raise RLGraphError("Cannot cache op '{}' of type {}.".format(value, type(value)))
+        return names
+
+    @staticmethod
+    def _lookup_op(graph, names):
+        if names is None:
+            return None
+        return unflatten_op({flat_key: value["value"] if isinstance(value, dict) else graph.as_graph_element(value)
+                             for flat_key, value in names.items()})
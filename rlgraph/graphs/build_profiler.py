@@ -0,0 +1,212 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import bisect
+import json
+import os
+import time
+
+import numpy as np
+
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class BuildProfiler(object):
+    """
+    Attributes build time and op counts to individual Components and records the call latencies of API-methods
+    executed in define-by-run mode.
+
+    Build phases are recorded as nested spans per Component:
+    - "meta_graph": API-method calls while constructing the meta graph.
+    - "var_creation": Input-space checks and variable creation (`when_input_complete`).
+    - "graph_fn_tracing": graph_fn calls creating the backend ops.
+    The per-Component times of a phase exclude the time spent in nested spans (e.g. API-methods of sub-Components),
+    such that they add up to the total time of all spans. All spans and API-method calls can be exported as JSON or
+    as a Chrome trace (chrome://tracing).
+
+    Enable via the build option `build_profiler=True` and access via the graph executor's `build_profiler`.
+    """
+    PHASES = ["meta_graph", "var_creation", "graph_fn_tracing"]
+
+    # Latency histogram bucket edges in seconds (4 per decade from 1us to 10s).
+    LATENCY_BUCKETS = [float(edge) for edge in np.logspace(-6, 1, 29)]
+
+    def __init__(self, max_trace_events=100000):
+        """
+        Args:
+            max_trace_events (int): Maximum number of API-method call events to keep for the trace export. Latency
+                histograms include all calls.
+        """
+        self.max_trace_events = max_trace_events
+        self.origin = time.perf_counter()
+
+        # Finished spans and API-method calls as tuples: (phase, scope, name, start, duration).
+        self.events = []
+        self.num_api_call_events = 0
+        # Stats by Component global scope.
+        self.component_stats = {}
+        # Latency stats by API-method name.
+        self.api_call_stats = {}
+        # Open spans: [phase, scope, name, start, time of nested spans].
+        self.span_stack = []
+
+    def start(self, phase, scope, name):
+        """
+        Opens a span.
+
+        Args:
+            phase (str): One of `PHASES`.
+            scope (str): Global scope of the Component.
+            name (str): Name of the API-method or graph_fn.
+        """
+        self.span_stack.append([phase, scope, name, time.perf_counter(), 0.0])
+
+    def stop(self):
+        """
+        Closes the most recently opened span.
+        """
+        if len(self.span_stack) == 0:
+            raise RLGraphError("No open span to stop in BuildProfiler!")
+        phase, scope, name, start, nested_time = self.span_stack.pop()
+        duration = time.perf_counter() - start
+        if len(self.span_stack) > 0:
+            self.span_stack[-1][4] += duration
+        self.events.append((phase, scope, name, start - self.origin, duration))
+        stats = self.get_component_stats(scope)
+        stats[phase] += duration - nested_time
+        if phase == "graph_fn_tracing":
+            stats["graph_fn_calls"] += 1
+
+    def get_component_stats(self, scope):
+        """
+        Returns the (mutable) stats of a Component, creating them if necessary.
+
+        Args:
+            scope (str): Global scope of the Component.
+
+        Returns:
+            dict: Exclusive times per build phase, number of graph_fn calls, number of ops and number of variables.
+        """
+        if scope not in self.component_stats:
+            self.component_stats[scope] = dict(
+                meta_graph=0.0, var_creation=0.0, graph_fn_tracing=0.0, graph_fn_calls=0, num_ops=0, num_variables=0
+            )
+        return self.component_stats[scope]
+
+    def count_component_ops(self, root_component, op_names=None):
+        """
+        Counts variables per Component and attributes backend ops to the Component with the longest global scope
+        matching the op's name scope.
+
+        Args:
+            root_component (Component): The built root Component.
+            op_names (Optional[list]): Names of all ops of the backend graph (static graphs only).
+        """
+        components = root_component.get_all_sub_components(exclude_self=False)
+        for component in components:
+            self.get_component_stats(component.global_scope)["num_variables"] = len(component.variable_registry)
+        if op_names is None:
+            return
+        scopes = set(component.global_scope for component in components if component.global_scope)
+        for op_name in op_names:
+            # Walk up the name scope until a Component's scope matches. Unmatched ops go to the root (scope "").
+            scope = op_name
+            while scope not in scopes and "/" in scope:
+                scope = scope.rsplit("/", 1)[0]
+            self.get_component_stats(scope if scope in scopes else "")["num_ops"] += 1
+
+    def record_api_call(self, api_method, start, duration):
+        """
+        Records the latency of one API-method call.
+
+        Args:
+            api_method (str): Name of the API-method.
+            start (float): `time.perf_counter()` at the start of the call.
+            duration (float): Duration of the call in seconds.
+        """
+        if api_method not in self.api_call_stats:
+            self.api_call_stats[api_method] = dict(
+                count=0, total=0.0, min=float("inf"), max=0.0, histogram=[0] * (len(self.LATENCY_BUCKETS) + 1)
+            )
+        stats = self.api_call_stats[api_method]
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["min"] = min(stats["min"], duration)
+        stats["max"] = max(stats["max"], duration)
+        stats["histogram"][bisect.bisect_right(self.LATENCY_BUCKETS, duration)] += 1
+        if self.num_api_call_events < self.max_trace_events:
+            self.events.append(("api_call", "", api_method, start - self.origin, duration))
+            self.num_api_call_events += 1
+
+    def get_build_times(self):
+        """
+        Returns:
+            dict: Total time per build phase over all Components.
+        """
+        return {phase: sum(stats[phase] for stats in self.component_stats.values()) for phase in self.PHASES}
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON-serializable profile with per-Component stats, per-API-method latency stats (histogram
+                counts for the buckets given by `latency_buckets`, the last bucket counts all calls above the highest
+                edge) and all recorded events.
+        """
+        return dict(
+            build_times=self.get_build_times(),
+            components=self.component_stats,
+            api_calls={name: dict(stats, mean=stats["total"] / stats["count"]) for name, stats in
+                       self.api_call_stats.items()},
+            latency_buckets=self.LATENCY_BUCKETS,
+            events=[dict(phase=phase, component=scope, name=name, start=start, duration=duration) for
+                    phase, scope, name, start, duration in self.events]
+        )
+
+    def to_chrome_trace(self):
+        """
+        Returns:
+            dict: The recorded events in Chrome trace event format. Build spans and API-method calls are shown in
+                separate rows.
+        """
+        trace_events = []
+        for phase, scope, name, start, duration in self.events:
+            trace_events.append(dict(
+                name=name if phase == "api_call" else "{}.{}".format(scope or "root", name),
+                cat=phase, ph="X", ts=start * 1e6, dur=duration * 1e6, pid=os.getpid(),
+                tid=1 if phase == "api_call" else 0, args=dict(component=scope)
+            ))
+        return dict(traceEvents=trace_events, displayTimeUnit="ms")
+
+    def export_json(self, path):
+        """
+        Writes the profile (see `to_dict`) as JSON.
+
+        Args:
+            path (str): File to write.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def export_chrome_trace(self, path):
+        """
+        Writes the recorded events as Chrome trace (see `to_chrome_trace`).
+
+        Args:
+            path (str): File to write.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
@@ -19,16 +19,19 @@ import inspect
 import logging
 import re
 import time
+from collections import OrderedDict
 
 from rlgraph import get_backend, get_config
 from rlgraph.components.component import Component
+from rlgraph.graphs.build_profiler import BuildProfiler
 from rlgraph.spaces import Space, Dict
 from rlgraph.spaces.space_utils import get_space_from_op, check_space_equivalence
 from rlgraph.utils.define_by_run_ops import execute_define_by_run_graph_fn
 from rlgraph.utils.input_parsing import parse_summary_spec
 from rlgraph.utils.op_records import FlattenedDataOp, DataOpRecord, DataOpRecordColumnIntoGraphFn, \
     DataOpRecordColumnIntoAPIMethod, DataOpRecordColumnFromGraphFn, DataOpRecordColumnFromAPIMethod, get_call_param_name
-from rlgraph.utils.ops import is_constant, ContainerDataOp, DataOpDict, flatten_op, unflatten_op, TraceContext
+from rlgraph.utils.ops import is_constant, ContainerDataOp, DataOpDict, flatten_op, unflatten_op, TraceContext, \
+    get_leaf_paths, path_lookup
 from rlgraph.utils.rlgraph_errors import RLGraphError, RLGraphBuildError, RLGraphSpaceError
 from rlgraph.utils.specifiable import Specifiable
 from rlgraph.utils.util import force_list, force_tuple, get_shape
@@ -90,8 +93,11 @@ class GraphBuilder(Specifiable):
         self.num_ops = 0
         # Number of trainable variables (optimizable weights).
         self.num_trainable_parameters = 0
-        self.graph_call_times = []
-        self.var_call_times = []
+        # Optional BuildProfiler (set by the graph executor).
+        self.build_profiler = None
+        # BuildProfiler timing variable and op creation per Component during the build: `build_profiler` if set,
+        # otherwise a private one.
+        self.build_time_profiler = None
 
         # Create an empty root-Component into which everything will be assembled by an Algo.
         self.root_component = None
@@ -101,6 +107,8 @@ class GraphBuilder(Specifiable):
 
         self.op_records_to_process = set()
         self.op_recs_depending_on_variables = set()
+        # Complete graph_fn columns waiting for their Component to become input-/variable-complete (by Component).
+        self.parked_graph_fn_columns = OrderedDict()
 
         # A register for all created placeholders by name.
         self.placeholders = {}
@@ -171,8 +179,7 @@ class GraphBuilder(Specifiable):
         time_start = time.perf_counter()
         assert self.meta_graph.build_status, "ERROR: Meta graph must be built to build backend graph."
         self.root_component = self.meta_graph.root_component
-        self.graph_call_times = []
-        self.var_call_times = []
+        self.build_time_profiler = self.build_profiler if self.build_profiler is not None else BuildProfiler()
         self.api = self.meta_graph.api
         self.num_meta_ops = self.meta_graph.num_ops
 
@@ -213,20 +220,55 @@ class GraphBuilder(Specifiable):
 
         self.num_trainable_parameters = self.count_trainable_parameters()
         self.logger.info("Number of trainable parameters: {}".format(self.num_trainable_parameters))
+        if self.build_profiler is not None:
+            self.build_profiler.count_component_ops(
+                self.root_component, op_names=[op.name for op in tf.get_default_graph().get_operations()]
+            )
 
         # Sanity check the build.
         self.sanity_check_build()
 
-        # The build here is the actual build overhead, so build time minus the tensorflow calls and variable
-        # creations which would have to happen either way.
-        build_overhead = time_build - sum(self.graph_call_times) - sum(self.var_call_times)
+        return self._get_build_times(time_build, iterations)
 
-        return dict(
-            build_overhead=build_overhead,
-            total_build_time=time_build,
-            op_creation=sum(self.graph_call_times),
-            var_creation=sum(self.var_call_times)
-        )
+    def load_graph(self, meta_graph, build_cache, available_devices, device_strategy="default",
+                   default_device=None, device_map=None):
+        """
+        Imports a graph previously built for the same meta graph from a build cache instead of building it.
+
+        Args:
+            meta_graph (MetaGraph): MetaGraph the cached graph was built from.
+            build_cache (BuildCache): The build cache holding an entry for this build.
+            available_devices (list): Devices which can be used to assign parts of the graph
+                during graph assembly.
+            device_strategy (Optional[str]): Device strategy.
+            default_device (Optional[str]): Default device identifier.
+            device_map (Optional[Dict]): Dict of Component names mapped to device names to place the Component's ops.
+
+        Returns:
+            Tuple[dict,dict,dict]: The build times, the summary ops by API-method name and additional executor
+                variables by name (see `BuildCache.load`).
+        """
+        self.meta_graph = meta_graph
+        time_start = time.perf_counter()
+        assert self.meta_graph.build_status, "ERROR: Meta graph must be built to build backend graph."
+        self.root_component = self.meta_graph.root_component
+        self.api = self.meta_graph.api
+        self.num_meta_ops = self.meta_graph.num_ops
+        self.available_devices = available_devices
+        self.device_strategy = device_strategy
+        self.default_device = default_device
+        self.device_map = device_map or {}
+
+        for component in self.root_component.get_all_sub_components(exclude_self=False):
+            component.graph_builder = self
+        summaries, variables = build_cache.load(self)
+        time_build = time.perf_counter() - time_start
+        self.logger.info("Computation-Graph loaded from build cache entry {} in {} s.".format(
+            build_cache.path, time_build))
+
+        build_times = dict(build_overhead=time_build, total_build_time=time_build, op_creation=0.0, var_creation=0.0,
+                           iterations=0, component_build_times={})
+        return build_times, summaries, variables
 
     def build_input_space_ops(self, input_spaces):
         """
@@ -334,7 +376,9 @@ class GraphBuilder(Specifiable):
                                   format(component.name, component.api_method_inputs))
                 device = self.get_device(component, variables=True)
                 # This builds variables which would have to be done either way:
-                call_time = time.perf_counter()
+                profile = self.build_time_profiler is not None
+                if profile:
+                    self.build_time_profiler.start("var_creation", component.global_scope, "when_input_complete")
                 # If the Component throws a Space checking error, catch it here and perform the proper debugging
                 # routine.
                 try:
@@ -351,7 +395,8 @@ class GraphBuilder(Specifiable):
                     # Reraise e.
                     raise e
 
-                self.var_call_times.append(time.perf_counter() - call_time)
+                if profile:
+                    self.build_time_profiler.stop()
                 # Call all no-input graph_fns of the new Component.
                 for no_in_col in component.no_input_graph_fn_columns:
                     # Do not call _variables (only later, when Component is also variable-complete).
@@ -496,22 +541,49 @@ class GraphBuilder(Specifiable):
         return device
 
     def _run_in_context(self, graph_fn, component, *args, **kwargs):
-        is_build_time = self.phase == "building"
-        if is_build_time and TraceContext.ACTIVE_CALL_CONTEXT is False:
-            call_time = time.perf_counter()
-            TraceContext.ACTIVE_CALL_CONTEXT = True
-            TraceContext.CONTEXT_START = call_time
-
+        # Nested graph_fn calls are timed exclusively, as part of their own Component.
+        profile = self.phase == "building" and self.build_time_profiler is not None
+        if profile:
+            self.build_time_profiler.start("graph_fn_tracing", component.global_scope, graph_fn.__name__)
         component.start_summary_ops_buffer()
         ops = graph_fn(component, *args, **kwargs)
         summary_ops = component.pop_summary_ops_buffer()
-        if is_build_time and TraceContext.ACTIVE_CALL_CONTEXT is True:
-            self.graph_call_times.append(time.perf_counter() - TraceContext.CONTEXT_START)
-            TraceContext.CONTEXT_START = None
-            TraceContext.ACTIVE_CALL_CONTEXT = False
+        if profile:
+            self.build_time_profiler.stop()
 
         return ops, summary_ops
 
+    def _get_build_times(self, time_build, iterations):
+        """
+        Returns the build stats of the finished build, with variable and op creation times taken from the
+        per-Component stats of `build_time_profiler`.
+
+        Args:
+            time_build (float): Total build time.
+            iterations (int): Number of build iterations.
+
+        Returns:
+            dict: Total times, number of iterations and per-Component times (variable creation, op creation and
+                number of graph_fn calls by global scope).
+        """
+        component_stats = self.build_time_profiler.component_stats
+        component_build_times = {scope: dict(
+            var_creation=stats["var_creation"], op_creation=stats["graph_fn_tracing"],
+            graph_fn_calls=stats["graph_fn_calls"]
+        ) for scope, stats in component_stats.items()}
+        var_creation = sum(times["var_creation"] for times in component_build_times.values())
+        op_creation = sum(times["op_creation"] for times in component_build_times.values())
+        return dict(
+            # The build overhead is the build time minus the backend calls and variable creations which would
+            # have to happen either way.
+            build_overhead=time_build - op_creation - var_creation,
+            total_build_time=time_build,
+            op_creation=op_creation,
+            var_creation=var_creation,
+            iterations=iterations,
+            component_build_times=component_build_times
+        )
+
     def run_through_graph_fn(self, op_rec_column, create_new_out_column=None):
         """
         Pushes all ops in the column through the respective graph_fn (graph_fn-spec and call-options are part of
@@ -839,37 +911,68 @@ class GraphBuilder(Specifiable):
         Returns:
             Tuple[list,dict]: Fetch-list, feed-dict with relevant args.
         """
+        fetch_dict, feed_layout = self.get_execution_layout(*api_method_calls)
+        feed_values = self.get_feed_values(feed_layout, api_method_calls)
+        feed_dict = {placeholder: value for (placeholder, _, _, _), value in zip(feed_layout, feed_values)}
+        return fetch_dict, feed_dict
+
+    def get_call_params(self, api_method_call):
+        """
+        Splits an API-method call into its name, input params and return ops.
+
+        Args:
+            api_method_call (Union[str,callable,list,tuple]): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            Tuple[str,list,Optional[list]]: API-method name, input params, return ops.
+        """
+        api_method_name = api_method_call
+        params = []
+        return_ops = None
+
+        # Call is defined by a list/tuple of [method], [input params], [return_ops]?
+        if isinstance(api_method_call, (list, tuple)):
+            api_method_name = api_method_call[0] if not callable(api_method_call[0]) else \
+                api_method_call[0].__name__
+            # If input is one dict: Check first placeholder for being a dict as well and if so, do a normal 1:1
+            # mapping, otherwise, roll out the input dict as a list.
+            if isinstance(api_method_call[1], dict) and \
+                    not isinstance(self.api[api_method_name][0][0].op, DataOpDict):
+                params = [v for k, v in sorted(api_method_call[1].items())]
+            else:
+                params = force_list(api_method_call[1])
+
+            return_ops = force_list(api_method_call[2]) if len(api_method_call) > 2 and \
+                                                           api_method_call[2] is not None else None
+        # Allow passing the function directly
+        if callable(api_method_call):
+            api_method_name = api_method_call.__name__
+
+        if api_method_name not in self.api:
+            raise RLGraphError("No API-method with name '{}' found!".format(api_method_name))
+        return api_method_name, params, return_ops
+
+    def get_execution_layout(self, *api_method_calls):
+        """
+        Creates a fetch-dict and the feed layout for a graph session call. The layout only depends on the API-methods,
+        return ops and the container structure of the input params, so it can be reused for calls with the same
+        signature (see `get_feed_values`).
+
+        Args:
+            api_method_calls (dict): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            Tuple[dict,list]: Fetch-dict and feed layout: A list of tuples (placeholder, index of the API-method call,
+                index of the input param, path inside the param (see `get_leaf_paths`)).
+        """
         fetch_dict = {}
-        feed_dict = {}
+        feed_layout = []
 
-        for api_method_call in api_method_calls:
+        for call_index, api_method_call in enumerate(api_method_calls):
             if api_method_call is None:
                 continue
 
-            api_method_name = api_method_call
-            params = []
-            return_ops = None
-
-            # Call is defined by a list/tuple of [method], [input params], [return_ops]?
-            if isinstance(api_method_call, (list, tuple)):
-                api_method_name = api_method_call[0] if not callable(api_method_call[0]) else \
-                    api_method_call[0].__name__
-                # If input is one dict: Check first placeholder for being a dict as well and if so, do a normal 1:1
-                # mapping, otherwise, roll out the input dict as a list.
-                if isinstance(api_method_call[1], dict) and \
-                        not isinstance(self.api[api_method_name][0][0].op, DataOpDict):
-                    params = [v for k, v in sorted(api_method_call[1].items())]
-                else:
-                    params = force_list(api_method_call[1])
-
-                return_ops = force_list(api_method_call[2]) if len(api_method_call) > 2 and \
-                                                               api_method_call[2] is not None else None
-            # Allow passing the function directly
-            if callable(api_method_call):
-                api_method_name = api_method_call.__name__
-
-            if api_method_name not in self.api:
-                raise RLGraphError("No API-method with name '{}' found!".format(api_method_name))
+            api_method_name, params, return_ops = self.get_call_params(api_method_call)
 
             # API returns a dict.
             if len(self.api[api_method_name][1]) > 0 and self.api[api_method_name][1][0].kwarg is not None:
@@ -911,16 +1014,31 @@ class GraphBuilder(Specifiable):
                 placeholder = self.api[api_method_name][0][i].op  # 0=input op-recs; i=ith input op-rec
                 if isinstance(placeholder, ContainerDataOp):
                     flat_placeholders = flatten_op(placeholder)
-                    for flat_key, value in flatten_op(param).items():
-                        feed_dict[flat_placeholders[flat_key]] = value
+                    for flat_key, path in zip(flatten_op(param).keys(), get_leaf_paths(param)):
+                        feed_layout.append((flat_placeholders[flat_key], call_index, i, path))
                 # Special case: Get the default argument for this arg.
                 # TODO: Support API-method's kwargs here as well (mostly useful for test.test).
                 #elif param is None:
                 #    feed_dict[placeholder] = self.root_component.api_methods[api_method_call].default_values[i]
                 else:
-                    feed_dict[placeholder] = param
+                    feed_layout.append((placeholder, call_index, i, ()))
 
-        return fetch_dict, feed_dict
+        return fetch_dict, feed_layout
+
+    def get_feed_values(self, feed_layout, api_method_calls):
+        """
+        Returns the values to feed for API-method calls, in the order of a feed layout created by
+        `get_execution_layout` for calls with the same signature.
+
+        Args:
+            feed_layout (list): The feed layout.
+            api_method_calls (dict): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            list: The values to feed (one per feed layout entry).
+        """
+        params = [self.get_call_params(call)[1] if call is not None else None for call in api_method_calls]
+        return [path_lookup(params[call_index][i], path) for _, call_index, i, path in feed_layout]
 
     def execute_define_by_run_op(self, api_method, params=None):
         """
@@ -934,21 +1052,35 @@ class GraphBuilder(Specifiable):
         Returns:
             any: Results of executing this api-method.
         """
-        # Reset call profiler.
-        Component.reset_profile()
         if api_method not in self.api:
             raise RLGraphError("No API-method with name '{}' found!".format(api_method))
 
-        if params is not None:
-            if api_method in self.root_component.synthetic_methods:
-                return self.root_component.api_fn_by_name[api_method](self.root_component, *params)
-            else:
-                return self.root_component.api_fn_by_name[api_method](*params)
-        else:
-            if api_method in self.root_component.synthetic_methods:
-                return self.root_component.api_fn_by_name[api_method](self.root_component)
-            else:
-                return self.root_component.api_fn_by_name[api_method]()
+        params = params if params is not None else []
+        if api_method in self.root_component.synthetic_methods:
+            params = [self.root_component] + list(params)
+        return self.call_define_by_run_api_fn(api_method, self.root_component.api_fn_by_name[api_method], params)
+
+    def call_define_by_run_api_fn(self, api_method, api_fn, params):
+        """
+        Calls the function of an API method in define-by-run mode. Resets the call profile and records the call
+        latency in the `build_profiler` (if set).
+
+        Args:
+            api_method (str): Name of the API method.
+            api_fn (callable): The API method's function.
+            params (list): Arguments to call the function with.
+
+        Returns:
+            any: Results of the API method.
+        """
+        # Reset call profiler.
+        Component.reset_profile()
+        if self.build_profiler is not None:
+            start = time.perf_counter()
+            ret = api_fn(*params)
+            self.build_profiler.record_api_call(api_method, start, time.perf_counter() - start)
+            return ret
+        return api_fn(*params)
 
     def execute_define_by_run_graph_fn(self, component, graph_fn, options, *args, **kwargs):
         """
@@ -982,8 +1114,7 @@ class GraphBuilder(Specifiable):
         time_start = time.perf_counter()
         assert meta_graph.build_status, "ERROR: Meta graph must be built to build backend graph."
         self.root_component = meta_graph.root_component
-        self.graph_call_times = []
-        self.var_call_times = []
+        self.build_time_profiler = self.build_profiler if self.build_profiler is not None else BuildProfiler()
         self.api = meta_graph.api
         self.num_meta_ops = meta_graph.num_ops
 
@@ -1024,25 +1155,26 @@ class GraphBuilder(Specifiable):
 
         # Call post build logic.
         self.root_component._post_build(self.root_component)
+        if self.build_profiler is not None:
+            self.build_profiler.count_component_ops(self.root_component)
 
         time_build = time.perf_counter() - time_start
         self.logger.info("Define-by-run computation-graph build completed in {} s ({} iterations).".
                          format(time_build, iterations))
-        build_overhead = time_build - sum(self.graph_call_times) - sum(self.var_call_times)
         TraceContext.DEFINE_BY_RUN_CONTEXT = "execution"
-        return dict(
-            build_overhead=build_overhead,
-            total_build_time=time_build,
-            op_creation=sum(self.graph_call_times),
-            var_creation=sum(self.var_call_times)
-        )
+        return self._get_build_times(time_build, iterations)
 
     def _build(self, op_records_list):
         """
         Private implementation of the main build loop. For docs, see the respective build
         methods.
+
+        Works on a worklist of op-recs that just received their ops. Complete graph_fn columns whose Component is
+        not input-/variable-complete yet are parked per Component and only re-enter the worklist once that
+        Component becomes ready, which is checked once per iteration and Component (instead of once per op-rec).
         """
         loop_counter = 0
+        self.parked_graph_fn_columns = OrderedDict()
         while len(op_records_list) > 0:
             # In this iteration, do we still have API-method op-recs (which are part of columns that go into or come
             # from API-methods).
@@ -1063,6 +1195,9 @@ class GraphBuilder(Specifiable):
             # Set of Components that have been tried last to get input-complete. If build gets stuck, it'll be because
             # of the Components in this set.
             non_complete_components = set()
+            # GraphFn columns already recycled, parked or sent in this iteration. All op-recs of a column share the
+            # same decision, so only the first one is handled (and recycled).
+            handled_graph_fn_columns = set()
             for op_rec in op_records_list:  # type: DataOpRecord
                 # There are next records:
                 if len(op_rec.next) > 0:
@@ -1143,6 +1278,9 @@ class GraphBuilder(Specifiable):
                 # No next records:
                 # - Op belongs to a column going into a graph_fn.
                 elif isinstance(op_rec.column, DataOpRecordColumnIntoGraphFn):
+                    column = op_rec.column
+                    if column in handled_graph_fn_columns:
+                        continue
                     # Only call the GraphFn iff:
                     # There are no more DataOpRecordColumnIntoAPIMethod ops in our list: We would like to hold off
                     # any graph fn calls for as long as possible.
@@ -1151,37 +1289,28 @@ class GraphBuilder(Specifiable):
                     if have_api_method_recs:
                         # Recycle this op-rec.
                         self.op_records_to_process.add(op_rec)
+                        handled_graph_fn_columns.add(column)
                     # There are other graph_fn columns that have a higher Component nesting_level and are
                     # actually callable -> Call those first.
-                    elif highest_nesting_of_called_graph_fn_column > op_rec.column.component.nesting_level:
+                    elif highest_nesting_of_called_graph_fn_column > column.component.nesting_level:
                         # Recycle this op-rec.
                         self.op_records_to_process.add(op_rec)
+                        handled_graph_fn_columns.add(column)
                     # GraphFn column must be complete AND has not been sent through the graph_fn yet.
-                    elif op_rec.column.is_complete() and op_rec.column.already_sent is False:
-                        do_call = False  # Do the actual graph_fn call?
-
+                    elif column.is_complete() and column.already_sent is False:
+                        handled_graph_fn_columns.add(column)
                         # Only call the graph_fn if the Component is already input-complete.
-                        if op_rec.column.component.variable_complete or \
-                                (op_rec.column.requires_variable_completeness is False and
-                                 op_rec.column.component.input_complete):
-                            do_call = True
-                        # Component not input-/variable-complete yet. Recycle this op-rec.
-                        else:
-                            self.build_component_when_input_complete(op_rec.column.component)
-                            self.op_records_to_process.add(op_rec)
-                            if op_rec.column.component.input_complete is False:
-                                non_complete_components.add(op_rec.column.component.global_scope)
-                            # Call the graph_fn here right away iff component is ready now.
-                            elif op_rec.column.component.variable_complete or \
-                                    op_rec.column.requires_variable_completeness is False:
-                                do_call = True
-
-                        if do_call:
+                        if self._is_graph_fn_column_callable(column):
                             # Call the graph_fn with the given column and call-options.
-                            self.run_through_graph_fn_with_device_and_scope(op_rec.column)
+                            self.run_through_graph_fn_with_device_and_scope(column)
                             # Store all resulting op_recs (returned by the graph_fn) to be processed next.
-                            self.op_records_to_process.update(op_rec.column.out_graph_fn_column.op_records)
-                            highest_nesting_of_called_graph_fn_column = op_rec.column.component.nesting_level
+                            self.op_records_to_process.update(column.out_graph_fn_column.op_records)
+                            highest_nesting_of_called_graph_fn_column = column.component.nesting_level
+                        # Component not input-/variable-complete yet. Park the column until it is.
+                        else:
+                            parked_columns = self.parked_graph_fn_columns.setdefault(column.component, [])
+                            if column not in parked_columns:
+                                parked_columns.append(column)
 
                     # - There are still into-API-method-op-recs that should be handled first.
                     # - Op column is not complete yet: Discard this one (as others will keep coming in anyway).
@@ -1227,9 +1356,34 @@ class GraphBuilder(Specifiable):
                         else:
                             self.op_recs_depending_on_variables.add(op_rec)
 
+            # Check each Component with parked graph_fn columns once and move the columns that became callable back
+            # into the worklist.
+            for component, parked_columns in list(self.parked_graph_fn_columns.items()):
+                self.build_component_when_input_complete(component)
+                if component.input_complete is False:
+                    non_complete_components.add(component.global_scope)
+                    continue
+                still_parked = []
+                for column in parked_columns:
+                    # Column may have been sent by `build_component_when_input_complete` already.
+                    if column.already_sent is True:
+                        continue
+                    elif self._is_graph_fn_column_callable(column):
+                        self.op_records_to_process.add(column.op_records[0])
+                    else:
+                        still_parked.append(column)
+                if len(still_parked) > 0:
+                    self.parked_graph_fn_columns[component] = still_parked
+                else:
+                    del self.parked_graph_fn_columns[component]
+
             # Sanity check, whether we are stuck.
             new_op_records_list = self._sort_op_recs(self.op_records_to_process)
-            if op_records_list == new_op_records_list:
+            # Only parked columns left, but none of their Components can become ready anymore.
+            if len(new_op_records_list) == 0 and len(self.parked_graph_fn_columns) > 0:
+                self.sanity_check_build(still_building=True)
+                return loop_counter
+            elif op_records_list == new_op_records_list:
                 # Probably deadlocked. Do a premature sanity check to report possible problems.
                 if loop_counter > self.max_build_iterations:
                     self.sanity_check_build(still_building=True)
@@ -1240,6 +1394,16 @@ class GraphBuilder(Specifiable):
             loop_counter += 1
         return loop_counter
 
+    @staticmethod
+    def _is_graph_fn_column_callable(column):
+        """
+        Returns:
+            bool: Whether the column's Component is input-complete (and variable-complete, if required by the
+                column's graph_fn).
+        """
+        return column.component.variable_complete or \
+            (column.requires_variable_completeness is False and column.component.input_complete)
+
     @staticmethod
     def _sort_op_recs(recs):
         """
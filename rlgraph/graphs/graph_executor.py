@@ -20,6 +20,7 @@ from __future__ import print_function
 import logging
 
 from rlgraph.graphs import MetaGraphBuilder
+from rlgraph.graphs.build_profiler import BuildProfiler
 from rlgraph.utils.input_parsing import parse_saver_spec, parse_execution_spec
 from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.specifiable import Specifiable
@@ -95,6 +96,9 @@ class GraphExecutor(Specifiable):
         self.default_device = None
         self.device_map = None
 
+        # Optional BuildProfiler, enabled via the build option `build_profiler`.
+        self.build_profiler = None
+
     def build(self, root_components, input_spaces, **kwargs):
         """
         Sets up the computation graph by:
@@ -111,6 +115,23 @@ class GraphExecutor(Specifiable):
         """
         raise NotImplementedError
 
+    def init_build_profiler(self, build_options=None):
+        """
+        Creates a BuildProfiler if the build option `build_profiler` is set and passes it on to the graph builder.
+
+        Args:
+            build_options (Optional[dict]): The build options passed into `build`.
+
+        Returns:
+            Optional[BuildProfiler]: The profiler or None if profiling is disabled.
+        """
+        if build_options is not None and build_options.get("build_profiler", False) is True:
+            self.build_profiler = BuildProfiler()
+        else:
+            self.build_profiler = None
+        self.graph_builder.build_profiler = self.build_profiler
+        return self.build_profiler
+
     def execute(self, *api_method_calls):
         """
         Fetches one or more Socket outputs from the graph (given some api_methods) and returns their outputs.
@@ -24,6 +24,7 @@ from rlgraph.graphs import MetaGraph
 from rlgraph.spaces import Space
 from rlgraph.utils import force_list
 from rlgraph.utils.op_records import DataOpRecord
+from rlgraph.utils.ops import TraceContext
 from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.specifiable import Specifiable
 
@@ -37,7 +38,7 @@ class MetaGraphBuilder(Specifiable):
         super(MetaGraphBuilder, self).__init__()
         self.logger = logging.getLogger(__name__)
 
-    def build(self, root_component, input_spaces=None):
+    def build(self, root_component, input_spaces=None, build_profiler=None):
         """
         Builds the meta-graph by constructing op-record columns going into and coming out of all API-methods
         and graph_fns.
@@ -45,6 +46,7 @@ class MetaGraphBuilder(Specifiable):
         Args:
             root_component (Component): Root component of the meta graph to build.
             input_spaces (Optional[Space]): Input spaces for all (exposed) API methods of the root-component.
+            build_profiler (Optional[BuildProfiler]): Profiler to record the API-method calls of all Components in.
         """
 
         # Time the meta-graph build:
@@ -123,7 +125,11 @@ class MetaGraphBuilder(Specifiable):
             # Do the actual core API-method call (thereby assembling the meta-graph).
             args = [op_rec for op_rec in in_ops_records if op_rec.kwarg is None]
             kwargs = {op_rec.kwarg: op_rec for op_rec in in_ops_records if op_rec.kwarg is not None}
-            getattr(api_method_rec.component, api_method_name)(*args, **kwargs)
+            TraceContext.BUILD_PROFILER = build_profiler
+            try:
+                getattr(api_method_rec.component, api_method_name)(*args, **kwargs)
+            finally:
+                TraceContext.BUILD_PROFILER = None
 
             # Register core's interface.
             api[api_method_name] = (in_ops_records, api_method_rec.out_op_columns[-1].op_records)
@@ -19,6 +19,7 @@ from __future__ import print_function
 
 import os
 import time
+from functools import partial
 
 import numpy as np
 from rlgraph import get_backend
@@ -26,7 +27,9 @@ from rlgraph.components.component import Component
 from rlgraph.graphs import GraphExecutor
 from rlgraph.utils import util
 from rlgraph.utils.define_by_run_ops import define_by_run_flatten, define_by_run_unflatten
-from rlgraph.utils.util import force_torch_tensors
+from rlgraph.utils.ops import FLATTEN_SCOPE_PREFIX, get_leaf_paths, path_lookup
+from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.utils.util import force_torch_tensors, convert_param
 
 if get_backend() == "pytorch":
     import torch
@@ -58,15 +61,20 @@ class PyTorchExecutor(GraphExecutor):
         # Squeeze result dims, often necessary in tests.
         self.remove_batch_dims = True
 
+        # Compiled call plans by (api method, input signature), see `PyTorchCallPlan`.
+        self.compile_calls = self.execution_spec.get("compile_calls", True)
+        self.call_plans = {}
+
     def build(self, root_components, input_spaces, **kwargs):
         start = time.perf_counter()
         self.init_execution()
+        self.init_build_profiler(kwargs.get("build_options"))
 
         meta_build_times = []
         build_times = []
         for component in root_components:
             start = time.perf_counter()
-            meta_graph = self.meta_graph_builder.build(component, input_spaces)
+            meta_graph = self.meta_graph_builder.build(component, input_spaces, build_profiler=self.build_profiler)
             meta_build_times.append(time.perf_counter() - start)
 
             build_time = self.graph_builder.build_define_by_run_graph(
@@ -81,6 +89,9 @@ class PyTorchExecutor(GraphExecutor):
         )
 
     def execute(self, *api_method_calls):
+        if self.compile_calls:
+            return self.execute_compiled(*api_method_calls)
+
         # Have to call each method separately.
         ret = []
         for api_method in api_method_calls:
@@ -146,6 +157,120 @@ class PyTorchExecutor(GraphExecutor):
         ret = ret[0] if len(ret) == 1 else ret
         return ret
 
+    def execute_compiled(self, *api_method_calls):
+        """
+        Executes API methods via cached `PyTorchCallPlan`s, one per API method and input signature. Returns the
+        same results as the generic path in `execute`, but converts inputs and results without flattening and
+        re-nesting containers.
+        """
+        # Without autograd, no result requires grad.
+        detach = torch.is_grad_enabled()
+        ret = []
+        for api_method in api_method_calls:
+            if api_method is None:
+                continue
+            elif isinstance(api_method, (list, tuple)):
+                op_or_indices_to_return = api_method[2] if len(api_method) > 2 else None
+                params = util.force_list(api_method[1])
+                api_ret = self.get_call_plan(api_method[0], params)(params)
+                is_dict_result = isinstance(api_ret, dict)
+                if not isinstance(api_ret, (list, tuple)):
+                    api_ret = [api_ret]
+                if op_or_indices_to_return is None:
+                    to_return = api_ret
+                elif is_dict_result:
+                    if isinstance(op_or_indices_to_return, str):
+                        op_or_indices_to_return = [op_or_indices_to_return]
+                    to_return = [{key: api_ret[0][key] for key in op_or_indices_to_return}]
+                else:
+                    to_return = [api_ret[i] for i in sorted(op_or_indices_to_return)]
+            else:
+                # Api method is string without args.
+                api_ret = self.get_call_plan(api_method, [])([])
+                if api_ret is None:
+                    continue
+                to_return = api_ret if isinstance(api_ret, (list, tuple)) else [api_ret]
+
+            for result in to_return:
+                ret.append(self.convert_result(result, detach))
+
+        # Unwrap if len 1.
+        ret = ret[0] if len(ret) == 1 else ret
+        return ret
+
+    def get_call_plan(self, api_method, params):
+        """
+        Returns the call plan for an API method and the signature of the given parameters (compiled on first use).
+
+        Args:
+            api_method (str): Name of the API method.
+            params (list): Input parameters.
+
+        Returns:
+            PyTorchCallPlan: The call plan.
+        """
+        key = (api_method, tuple(PyTorchCallPlan.get_signature(param) for param in params))
+        plan = self.call_plans.get(key)
+        if plan is None:
+            plan = PyTorchCallPlan(self.graph_builder, api_method, params)
+            self.call_plans[key] = plan
+        return plan
+
+    def convert_result(self, result, detach=True):
+        """
+        Converts one result of an API method into numpy. Result tensors are copied, so returned arrays never share
+        memory with parameters or memory buffers.
+
+        Args:
+            result (any): Result to convert.
+            detach (bool): Whether results may require grad and therefore need to be detached.
+
+        Returns:
+            any: The converted result.
+        """
+        if isinstance(result, dict):
+            converted = self.convert_container({k: v for k, v in result.items() if v is not None}, detach)
+            return converted if converted is not None else {}
+        elif isinstance(result, torch.Tensor):
+            if detach and result.requires_grad:
+                result = result.detach()
+            return np.array(result.numpy())
+        elif self.remove_batch_dims and isinstance(result, np.ndarray):
+            return np.array(np.squeeze(result))
+        return result
+
+    @staticmethod
+    def convert_container(container, detach=True):
+        """
+        Converts the tensors in a nested result container to numpy copies. Like `clean_dict`, drops all non-tensor
+        values, returns tuples for all sequences and unflattens flat-key dicts (e.g. returned by graph_fns).
+
+        Args:
+            container (any): Container or value to convert.
+            detach (bool): Whether tensors may require grad.
+
+        Returns:
+            any: The converted container or None if it contains no tensors.
+        """
+        if isinstance(container, torch.Tensor):
+            return np.array(container.detach().numpy() if detach and container.requires_grad else container.numpy())
+        elif isinstance(container, dict):
+            ret = {}
+            for key, value in container.items():
+                value = PyTorchExecutor.convert_container(value, detach)
+                if value is not None:
+                    ret[key] = value
+            if len(ret) == 0:
+                return None
+            if any(key.startswith(FLATTEN_SCOPE_PREFIX) for key in ret):
+                return define_by_run_unflatten(ret)
+            return ret
+        elif isinstance(container, tuple):
+            ret = [PyTorchExecutor.convert_container(value, detach) for value in container]
+            ret = tuple(value for value in ret if value is not None)
+            return ret if len(ret) > 0 else None
+        return None
+
     def clean_results(self, ret, to_return):
         for result in to_return:
             if isinstance(result, dict):
@@ -218,3 +343,81 @@ class PyTorchExecutor(GraphExecutor):
 
     def terminate(self):
         pass
+
+
+class PyTorchCallPlan(object):
+    """
+    A compiled call of an API method for one input signature (see `get_signature`).
+
+    Stores the bound API function and one converter per input parameter. Container parameters are converted into
+    the same flat-key dicts as `force_torch_tensors` produces, but via the flat keys and leaf paths remembered from
+    the first call instead of flattening again. Writable numpy inputs are wrapped via `torch.from_numpy` without
+    copying, so callers must not modify them in place while the graph may still hold on to them (e.g. after inserting
+    into a python-side memory).
+    """
+    # Numpy dtypes which can be passed zero-copy, if `convert_param` keeps their dtype.
+    ZERO_COPY_DTYPES = [np.dtype(dtype) for dtype in [np.float32, np.float64, np.int32, np.int64, np.int16, np.uint8]]
+
+    def __init__(self, graph_builder, api_method, params):
+        """
+        Args:
+            graph_builder (GraphBuilder): The graph builder of the built define-by-run graph.
+            api_method (str): Name of the API method.
+            params (list): Example parameters defining the input signature.
+        """
+        if api_method not in graph_builder.api:
+            raise RLGraphError("No API-method with name '{}' found!".format(api_method))
+        root_component = graph_builder.root_component
+        self.api_method = api_method
+        self.api_fn = root_component.api_fn_by_name[api_method]
+        if api_method in root_component.synthetic_methods:
+            self.api_fn = partial(self.api_fn, root_component)
+        self.converters = [self.compile_param(param) for param in params]
+        self.graph_builder = graph_builder
+
+    def __call__(self, params):
+        return self.graph_builder.call_define_by_run_api_fn(
+            self.api_method, self.api_fn, [convert(param) for convert, param in zip(self.converters, params)]
+        )
+
+    @staticmethod
+    def get_signature(param):
+        """
+        Returns a hashable signature of a parameter: Its container structure and for each leaf the information
+        determining its conversion.
+        """
+        if isinstance(param, dict):
+            return tuple((key, PyTorchCallPlan.get_signature(param[key])) for key in sorted(param.keys()))
+        elif isinstance(param, tuple):
+            return (tuple,) + tuple(PyTorchCallPlan.get_signature(value) for value in param)
+        elif isinstance(param, np.ndarray):
+            return param.dtype, param.flags.writeable
+        return type(param)
+
+    @staticmethod
+    def compile_leaf(value):
+        if isinstance(value, torch.Tensor):
+            return lambda value_: value_
+        elif isinstance(value, np.ndarray) and value.flags.writeable:
+            if value.dtype == np.bool_:
+                # PyTorch cannot convert from np.bool_ (see `convert_param`).
+                return lambda value_: torch.from_numpy(value_.astype(np.uint8))
+            # Only zero-copy if `convert_param` would keep the dtype (it e.g. converts float64 to float32).
+            elif value.dtype in PyTorchCallPlan.ZERO_COPY_DTYPES and util.convert_dtype(value.dtype, to="pytorch") == \
+                    torch.from_numpy(np.empty(shape=(0,), dtype=value.dtype)).dtype:
+                return lambda value_: torch.from_numpy(np.ascontiguousarray(value_))
+        return lambda value_: convert_param(value_, False)
+
+    @staticmethod
+    def compile_param(param):
+        if not isinstance(param, dict):
+            return PyTorchCallPlan.compile_leaf(param)
+
+        flat_keys = list(define_by_run_flatten(param).keys())
+        paths = get_leaf_paths(param)
+        leaf_converters = [PyTorchCallPlan.compile_leaf(path_lookup(param, path)) for path in paths]
+        layout = list(zip(flat_keys, paths, leaf_converters))
+
+        def convert(param_):
+            return {flat_key: convert_leaf(path_lookup(param_, path_)) for flat_key, path_, convert_leaf in layout}
+        return convert
@@ -17,11 +17,13 @@ from __future__ import absolute_import, division, print_function
 
 import os
 import time
+from collections import OrderedDict
 
 from rlgraph import get_backend, get_distributed_backend
 import rlgraph.utils as util
 from rlgraph.components.common.multi_gpu_synchronizer import MultiGpuSynchronizer
 from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.graphs.build_cache import BuildCache
 from rlgraph.graphs.graph_executor import GraphExecutor
 from rlgraph.utils.util import force_list
 from rlgraph.utils.op_records import gather_summaries
@@ -86,6 +88,16 @@ class TensorFlowExecutor(GraphExecutor):
         # Just fetch CPUs. GPUs will be added when parsing the GPU configuration.
         self.available_devices = [x.name for x in self.local_device_protos if x.device_type == 'CPU']
 
+        # Build cache (see `get_build_cache`) and what was loaded from it.
+        self.build_cache = None
+        self.load_from_build_cache = False
+        self.cached_summaries = None
+        self.cached_optimizer_variables = None
+
+        # Call plans by signature of the API-method calls (LRU).
+        self.call_plans = OrderedDict()
+        self.call_plan_cache_size = self.execution_spec.get("call_plan_cache_size", 128)
+
         # Local session config which needs to be updated with device options during setup.
         self.tf_session_type = self.session_config.pop("type", "monitored-training-session")
         self.tf_session_auto_start = self.session_config.pop("auto_start", True)
@@ -174,6 +186,9 @@ class TensorFlowExecutor(GraphExecutor):
 
         # Check graph setup and construct the static graph object.
         self.init_execution()
+        self.build_cache = self.get_build_cache(root_components, input_spaces)
+        self.load_from_build_cache = self.build_cache is not None and self.build_cache.exists()
+        self.init_build_profiler(build_options)
         self.setup_graph()
 
         # 1. Build phase: Meta graph construction -> All of the root_component's API methods are being called once,
@@ -189,16 +204,36 @@ class TensorFlowExecutor(GraphExecutor):
 
             self._build_device_strategy(component, optimizer, batch_size=batch_size, extra_build_args=build_options)
             start = time.perf_counter()
-            meta_graph = self.meta_graph_builder.build(component, input_spaces)
+            meta_graph = self.meta_graph_builder.build(component, input_spaces, build_profiler=self.build_profiler)
             meta_build_times.append(time.perf_counter() - start)
 
             # 2. Build phase: Backend compilation, build actual TensorFlow graph from meta graph.
             # -> Inputs/Operations/variables
-            build_time = self.graph_builder.build_graph_with_options(
-                meta_graph=meta_graph, input_spaces=input_spaces, available_devices=self.available_devices,
-                device_strategy=self.device_strategy, default_device=self.default_device, device_map=self.device_map,
-                build_options=build_options
-            )
+            if self.load_from_build_cache:
+                build_time, self.cached_summaries, variables = self.graph_builder.load_graph(
+                    meta_graph=meta_graph, build_cache=self.build_cache, available_devices=self.available_devices,
+                    device_strategy=self.device_strategy, default_device=self.default_device,
+                    device_map=self.device_map
+                )
+                self.global_training_timestep = variables["global_training_timestep"]
+                self.global_timestep = variables["global_timestep"]
+                self.cached_optimizer_variables = variables["optimizer_variables"]
+            else:
+                build_time = self.graph_builder.build_graph_with_options(
+                    meta_graph=meta_graph, input_spaces=input_spaces, available_devices=self.available_devices,
+                    device_strategy=self.device_strategy, default_device=self.default_device,
+                    device_map=self.device_map, build_options=build_options
+                )
+                if self.build_cache is not None:
+                    optimizer_variables = []
+                    for optimizer in self.optimizers or []:
+                        optimizer_variables.extend(optimizer.get_optimizer_variables())
+                    self.build_cache.store(
+                        self.graph, self.graph_builder, summaries=self.get_summaries(), variables=dict(
+                            global_training_timestep=self.global_training_timestep,
+                            global_timestep=self.global_timestep, optimizer_variables=optimizer_variables
+                        )
+                    )
 
             # Build time is a dict containing the cost of different parts of the build.
             build_times.append(build_time)
@@ -216,16 +251,17 @@ class TensorFlowExecutor(GraphExecutor):
         )
 
     def execute(self, *api_method_calls):
-        # Fetch inputs for the different API-methods.
-        fetch_dict, feed_dict = self.graph_builder.get_execution_inputs(*api_method_calls)
-        for api_name in fetch_dict.keys():
-            if api_name in self.summary_ops:
-                fetch_dict[api_name].append(self.summary_ops[api_name])
-
-        fetch_dict["__GLOBAL_TRAINING_TIMESTEP"] = self.global_training_timestep
-        ret = self.monitored_session.run(
-            fetch_dict, feed_dict=feed_dict, options=self.tf_session_options, run_metadata=self.run_metadata
-        )
+        plan = self.get_call_plan(api_method_calls)
+        feed_values = self.graph_builder.get_feed_values(plan.feed_layout, api_method_calls)
+        if plan.callable is not None:
+            ret = plan.callable(*feed_values, options=self.tf_session_options, run_metadata=self.run_metadata)
+        else:
+            ret = self.monitored_session.run(
+                plan.fetch_dict, feed_dict={placeholder: value for (placeholder, _, _, _), value in
+                                            zip(plan.feed_layout, feed_values)},
+                options=self.tf_session_options, run_metadata=self.run_metadata
+            )
+        fetch_dict = plan.fetch_dict
         global_training_timestep_value = ret["__GLOBAL_TRAINING_TIMESTEP"]
         del ret["__GLOBAL_TRAINING_TIMESTEP"]
 
@@ -252,6 +288,64 @@ class TensorFlowExecutor(GraphExecutor):
 
         return ret
 
+    @staticmethod
+    def get_call_signature(api_method_calls):
+        """
+        Returns a hashable signature of API-method calls: The API-methods, return ops and the container structure of
+        the input params (see `GraphBuilder.get_execution_layout`).
+        """
+        def structure(value):
+            if isinstance(value, dict):
+                return tuple((key, structure(value[key])) for key in sorted(value.keys()))
+            elif isinstance(value, tuple):
+                return (tuple,) + tuple(structure(v) for v in value)
+            # Leaf: Only None-params change the layout.
+            return value is None
+
+        signature = []
+        for call in api_method_calls:
+            if isinstance(call, (list, tuple)):
+                params = call[1]
+                params = (list,) + tuple(structure(p) for p in params) if isinstance(params, list) else \
+                    structure(params)
+                return_ops = tuple(force_list(call[2])) if len(call) > 2 and call[2] is not None else None
+                signature.append((call[0], params, return_ops))
+            else:
+                signature.append(call)
+        return tuple(signature)
+
+    def get_call_plan(self, api_method_calls):
+        """
+        Returns the (LRU-cached) call plan for the signature of the given API-method calls. Compiles a new plan if
+        necessary.
+
+        Args:
+            api_method_calls (tuple): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            TensorFlowCallPlan: The call plan.
+        """
+        signature = self.get_call_signature(api_method_calls)
+        plan = self.call_plans.pop(signature, None)
+        if plan is None:
+            fetch_dict, feed_layout = self.graph_builder.get_execution_layout(*api_method_calls)
+            for api_name in fetch_dict.keys():
+                if api_name in self.summary_ops:
+                    fetch_dict[api_name].append(self.summary_ops[api_name])
+            fetch_dict["__GLOBAL_TRAINING_TIMESTEP"] = self.global_training_timestep
+
+            callable_ = None
+            # Monitored sessions have to run their hooks, so only plain sessions can use callables.
+            if isinstance(self.monitored_session, tf.Session):
+                callable_ = self.monitored_session.make_callable(
+                    fetch_dict, feed_list=[placeholder for placeholder, _, _, _ in feed_layout], accept_options=True
+                )
+            plan = TensorFlowCallPlan(fetch_dict, feed_layout, callable_)
+            while len(self.call_plans) >= self.call_plan_cache_size:
+                self.call_plans.popitem(last=False)
+        self.call_plans[signature] = plan
+        return plan
+
     def update_profiler_if_necessary(self):
         """
         Updates profiler according to specification.
@@ -354,24 +448,26 @@ class TensorFlowExecutor(GraphExecutor):
     def setup_graph(self):
         """
         Generates the tf-Graph object and enters its scope as default graph.
-        Also creates the global time step variable.
+        Also creates the global time step variable (unless the graph is loaded from the build cache).
         """
         self.graph = tf.Graph()
         self.graph_default_context = self.graph.as_default()
         self.graph_default_context.__enter__()
 
-        # Create global training (update) timestep. Gets increased once per update.
-        # Do not include this in GLOBAL_STEP collection as only one variable (`global_timestep`) should be in there.
-        self.global_training_timestep = tf.get_variable(
-            name="global-training-timestep", dtype=util.convert_dtype("int"), trainable=False, initializer=0,
-            collections=["global-training-timestep"]
-        )
-        # Create global (env-stepping) timestep. Gets increased once per environment step.
-        # For vector-envs, gets increased each action by the number of parallel environments.
-        self.global_timestep = tf.get_variable(
-            name="global-timestep", dtype=util.convert_dtype("int"), trainable=False, initializer=0,
-            collections=["global-timestep", tf.GraphKeys.GLOBAL_STEP]
-        )
+        if not self.load_from_build_cache:
+            # Create global training (update) timestep. Gets increased once per update.
+            # Do not include this in GLOBAL_STEP collection as only one variable (`global_timestep`) should be in
+            # there.
+            self.global_training_timestep = tf.get_variable(
+                name="global-training-timestep", dtype=util.convert_dtype("int"), trainable=False, initializer=0,
+                collections=["global-training-timestep"]
+            )
+            # Create global (env-stepping) timestep. Gets increased once per environment step.
+            # For vector-envs, gets increased each action by the number of parallel environments.
+            self.global_timestep = tf.get_variable(
+                name="global-timestep", dtype=util.convert_dtype("int"), trainable=False, initializer=0,
+                collections=["global-timestep", tf.GraphKeys.GLOBAL_STEP]
+            )
 
         # Set the random seed graph-wide.
         if self.seed is not None:
@@ -440,9 +536,7 @@ class TensorFlowExecutor(GraphExecutor):
         """
         self.summary_ops = dict()
 
-        for name, method in self.graph_builder.root_component.api_methods.items():
-            _, op_recs_to_fetch = self.graph_builder.api[name]
-            summaries = gather_summaries(op_recs_to_fetch)
+        for name, summaries in self.get_summaries().items():
             if len(summaries) > 0:
                 self.logger.info(f"Summaries for {name}: {len(summaries)}")
                 summary_op = tf.summary.merge(inputs=summaries)
@@ -475,6 +569,43 @@ class TensorFlowExecutor(GraphExecutor):
             hooks.append(summary_saver_hook)
         """
 
+    def get_summaries(self):
+        """
+        Returns:
+            dict: The summary ops generated during the build by API-method name.
+        """
+        if self.cached_summaries is not None:
+            return self.cached_summaries
+        summaries = {}
+        for name, method in self.graph_builder.root_component.api_methods.items():
+            _, op_recs_to_fetch = self.graph_builder.api[name]
+            summaries[name] = gather_summaries(op_recs_to_fetch)
+        return summaries
+
+    def get_build_cache(self, root_components, input_spaces):
+        """
+        Returns the BuildCache if one is configured in the execution spec ("build_cache": dict with "directory" and
+        "key") and the build can be cached (single root component, default device strategy, single execution mode).
+
+        Args:
+            root_components (list): The root components to build.
+            input_spaces (dict): The input spaces of the build.
+
+        Returns:
+            Optional[BuildCache]: The build cache.
+        """
+        build_cache_spec = self.execution_spec.get("build_cache")
+        if build_cache_spec is None:
+            return None
+        if build_cache_spec.get("key") is None:
+            raise RLGraphError("Build cache spec must provide a `key` describing the build (e.g. the agent config).")
+        if len(root_components) != 1 or self.device_strategy != "default" or \
+                self.execution_mode != "single":
+            self.logger.warning("Build cache is only supported for single root components with the default device "
+                                "strategy in single execution mode. Building without cache.")
+            return None
+        return BuildCache(build_cache_spec["directory"], build_cache_spec["key"], input_spaces)
+
     def setup_scaffold(self):
         """
         Creates a tf.train.Scaffold object to be used by the session to initialize variables and to save models
@@ -488,7 +619,9 @@ class TensorFlowExecutor(GraphExecutor):
 
         # We can not fetch optimizer vars.
         # TODO let graph builder do this
-        if self.optimizers is not None:
+        if self.cached_optimizer_variables is not None:
+            var_list.extend(self.cached_optimizer_variables)
+        elif self.optimizers is not None:
             for optimizer in self.optimizers:
                 var_list.extend(optimizer.get_optimizer_variables())
 
@@ -835,3 +968,19 @@ class TensorFlowExecutor(GraphExecutor):
             # Do not allow any GPUs to be used.
             self.gpus_enabled = False
             self.logger.info("gpu_spec is None, disabling GPUs.")
+
+
+class TensorFlowCallPlan(object):
+    """
+    Cached fetches and feeds for one signature of API-method calls (see `TensorFlowExecutor.get_call_signature`).
+    """
+    def __init__(self, fetch_dict, feed_layout, callable_=None):
+        """
+        Args:
+            fetch_dict (dict): The fetches per API-method.
+            feed_layout (list): The feed layout (see `GraphBuilder.get_execution_layout`).
+            callable_ (Optional[callable]): The `Session.make_callable` handle taking the feed values positionally.
+        """
+        self.fetch_dict = fetch_dict
+        self.feed_layout = feed_layout
+        self.callable = callable_
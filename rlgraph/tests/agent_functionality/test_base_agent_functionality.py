@@ -17,9 +17,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from copy import deepcopy
+import json
 import logging
+import os
+import tempfile
 import unittest
 
+from rlgraph import get_backend
 from rlgraph.agents import Agent, PPOAgent
 from rlgraph.environments import GridWorld, OpenAIGymEnv
 from rlgraph.tests.test_util import config_from_path, recursive_assert_almost_equal
@@ -102,3 +107,66 @@ class TestBaseAgentFunctionality(unittest.TestCase):
         self.assertGreater(build_times["op_creation"], 0.0)
         self.assertGreater(build_times["var_creation"], 0.0)
         self.assertGreater(build_times["total_build_time"], build_times["build_overhead"])
+        self.assertGreater(build_times["iterations"], 0)
+        # Per-Component times add up to the totals.
+        component_build_times = build_times["component_build_times"]
+        self.assertGreater(sum(times["graph_fn_calls"] for times in component_build_times.values()), 0)
+        self.assertAlmostEqual(
+            sum(times["op_creation"] for times in component_build_times.values()), build_times["op_creation"]
+        )
+        self.assertAlmostEqual(
+            sum(times["var_creation"] for times in component_build_times.values()), build_times["var_creation"]
+        )
+
+    def test_build_profiler(self):
+        """
+        Tests per-Component build profiling and its exports.
+        """
+        env = GridWorld(world="2x2")
+        agent_config = config_from_path("configs/dqn_agent_for_functionality_test.json")
+        agent_config["auto_build"] = False
+        agent = Agent.from_spec(agent_config, state_space=env.state_space, action_space=env.action_space)
+        agent.build(build_options=dict(build_profiler=True))
+        agent.get_action(env.reset())
+
+        profiler = agent.graph_executor.build_profiler
+        build_times = profiler.get_build_times()
+        self.assertGreater(build_times["meta_graph"], 0.0)
+        self.assertGreater(build_times["var_creation"], 0.0)
+        self.assertGreater(build_times["graph_fn_tracing"], 0.0)
+        # The policy's network has variables.
+        self.assertTrue(any(stats["num_variables"] > 0 for scope, stats in profiler.component_stats.items()
+                            if "policy" in scope))
+        if get_backend() == "tf":
+            self.assertGreater(sum(stats["num_ops"] for stats in profiler.component_stats.values()), 0)
+        elif get_backend() == "pytorch":
+            self.assertEqual(sum(stats["count"] for stats in profiler.api_call_stats.values()), 1)
+
+        directory = tempfile.mkdtemp()
+        profiler.export_json(os.path.join(directory, "profile.json"))
+        profiler.export_chrome_trace(os.path.join(directory, "trace.json"))
+        with open(os.path.join(directory, "trace.json")) as f:
+            trace = json.load(f)
+        self.assertEqual(len(trace["traceEvents"]), len(profiler.events))
+
+    def test_build_cache(self):
+        """
+        Tests loading an agent's graph from the build cache instead of building it.
+        """
+        env = GridWorld(world="2x2")
+        agent_config = config_from_path("configs/dqn_agent_for_functionality_test.json")
+        agent_config["execution_spec"]["build_cache"] = dict(
+            directory=tempfile.mkdtemp(), key=deepcopy(agent_config)
+        )
+
+        agent = Agent.from_spec(agent_config, state_space=env.state_space, action_space=env.action_space)
+        self.assertFalse(agent.graph_executor.load_from_build_cache)
+        weights = agent.get_weights()
+        agent.terminate()
+
+        cached_agent = Agent.from_spec(agent_config, state_space=env.state_space, action_space=env.action_space)
+        self.assertTrue(cached_agent.graph_executor.load_from_build_cache)
+        # Same seed -> same initial weights.
+        recursive_assert_almost_equal(cached_agent.get_weights(), weights)
+        state = env.reset()
+        self.assertTrue(env.action_space.contains(cached_agent.get_action(state)))
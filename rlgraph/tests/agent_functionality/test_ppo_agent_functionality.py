@@ -20,8 +20,10 @@ from __future__ import print_function
 import logging
 import unittest
 
+import numpy as np
+
 from rlgraph.agents import PPOAgent
-from rlgraph.environments import OpenAIGymEnv
+from rlgraph.environments import GridWorld, OpenAIGymEnv
 from rlgraph.spaces import FloatBox, BoolBox
 from rlgraph.tests.test_util import config_from_path
 from rlgraph.utils import root_logger
@@ -57,3 +59,32 @@ class TestPPOAgentFunctionality(unittest.TestCase):
             terminals=terminal_space.sample(num_samples, fill_value=0),
             sequence_indices=sequence_indices_space.sample(num_samples, fill_value=0)
         ))
+
+    def test_update_from_external_batch_with_epoch_minibatches(self):
+        """
+        Tests multi-epoch updates (batch of 200, 4 minibatches of 50 per epoch, 10 iterations), with and without
+        contiguous minibatches.
+        """
+        env = GridWorld("2x2")
+        for contiguous_minibatches in [False, True]:
+            agent_config = config_from_path("configs/ppo_agent_for_2x2_gridworld.json")
+            agent_config["update_spec"].update(dict(batch_size=200, sample_size=50, num_iterations=10))
+            agent_config["contiguous_minibatches"] = contiguous_minibatches
+            agent = PPOAgent.from_spec(
+                agent_config,
+                state_space=GridWorld.grid_world_2x2_flattened_state_space,
+                action_space=env.action_space
+            )
+
+            num_samples = 200
+            terminals = np.zeros(shape=(num_samples,), dtype=np.bool_)
+            terminals[49::50] = True
+            loss, loss_per_item = agent.update(dict(
+                states=agent.preprocessed_state_space.sample(num_samples),
+                actions=env.action_space.sample(num_samples),
+                rewards=np.random.random(size=(num_samples,)),
+                terminals=terminals
+            ))
+            self.assertTrue(np.isfinite(loss))
+            self.assertEqual(len(loss_per_item), 50)
+            agent.terminate()
@@ -208,3 +208,35 @@ class TestGeneralizedAdvantageEstimation(unittest.TestCase):
         recursive_assert_almost_equal(advantage_expected, advantage, decimals=5)
 
         test.terminate()
+
+    def test_non_terminal_sequence_ends_with_numpy_discount(self):
+        # Discount and lambda as numpy values, sequences ending with and without terminals.
+        gamma = np.float32(0.95)
+        gae_lambda = np.float32(0.9)
+        gae = GeneralizedAdvantageEstimation(gae_lambda=gae_lambda, discount=gamma)
+
+        test = ComponentTest(component=gae, input_spaces=self.input_spaces)
+
+        rewards_ = self.rewards.sample(12)
+        baseline_values_ = self.baseline_values.sample(12)
+        terminals_ = np.asarray([False] * 12)
+        terminals_[3] = True
+        sequence_indices = [False] * 12
+        sequence_indices[3] = True
+        sequence_indices[7] = True
+
+        input_ = [baseline_values_, rewards_, terminals_, sequence_indices]
+        # Deltas bootstrap from the last value at non-terminal sequence ends (lambda 0 returns the plain deltas).
+        deltas = self.gae_helper(
+            baseline=baseline_values_, reward=rewards_, gamma=gamma, gae_lambda=0.0, terminals=terminals_,
+            sequence_indices=list(sequence_indices)
+        )
+        recursive_assert_almost_equal(deltas[7], rewards_[7] + gamma * baseline_values_[7] - baseline_values_[7],
+                                      decimals=5)
+        # Discounting restarts at every sequence end.
+        advantage_expected = self.discount_all(deltas, gamma * gae_lambda, sequence_indices)
+
+        advantage = test.test(("calc_gae_values", input_))
+        recursive_assert_almost_equal(advantage_expected, advantage, decimals=5)
+
+        test.terminate()
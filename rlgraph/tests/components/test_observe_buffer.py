@@ -0,0 +1,82 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.components.helpers.observe_buffer import ObserveBuffer
+from rlgraph.spaces import Dict, FloatBox, IntBox, Tuple
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+
+
+class TestObserveBuffer(unittest.TestCase):
+    """
+    Tests writing single records and batches into the preallocated observe buffer.
+    """
+    def test_single_and_batched_records(self):
+        buffer = ObserveBuffer(4, FloatBox(shape=(2,)), IntBox(3))
+        buffer.add(np.ones(shape=(2,)), 1, [], 0.5, np.zeros(shape=(2,)), False)
+        buffer.add(np.ones(shape=(2, 2)), np.array([2, 0]), [], [1.0, -1.0], np.zeros(shape=(2, 2)),
+                   [False, False], batched=True)
+        self.assertEqual(len(buffer), 3)
+
+        states, actions, internals, rewards, next_states, terminals = buffer.get_records()
+        recursive_assert_almost_equal(states, np.ones(shape=(3, 2)))
+        recursive_assert_almost_equal(actions, [1, 2, 0])
+        recursive_assert_almost_equal(rewards, [0.5, 1.0, -1.0])
+        recursive_assert_almost_equal(terminals, [False, False, False])
+        recursive_assert_almost_equal(next_states, np.zeros(shape=(3, 2)))
+
+        # Growing beyond the preallocated capacity keeps existing records.
+        buffer.add(np.ones(shape=(2, 2)), np.array([1, 1]), [], [2.0, 3.0], np.zeros(shape=(2, 2)),
+                   [False, True], batched=True)
+        self.assertEqual(len(buffer), 5)
+        _, actions, _, rewards, _, terminals = buffer.get_records()
+        recursive_assert_almost_equal(actions, [1, 2, 0, 1, 1])
+        recursive_assert_almost_equal(rewards, [0.5, 1.0, -1.0, 2.0, 3.0])
+        self.assertTrue(terminals[-1])
+
+        # Records handed out stay valid after clearing.
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.get_column("rewards"), [])
+        buffer.add(np.full(shape=(2,), fill_value=5.0), 0, [], 0.0, np.zeros(shape=(2,)), False)
+        recursive_assert_almost_equal(rewards, [0.5, 1.0, -1.0, 2.0, 3.0])
+
+    def test_container_records(self):
+        state_space = Dict(a=FloatBox(shape=(2,)), b=Tuple(IntBox(2), FloatBox()))
+        action_space = Dict(x=IntBox(3), y=FloatBox())
+        buffer = ObserveBuffer(
+            2, state_space, action_space, state_keys=list(state_space.flatten(scope_separator_at_start=False).keys()),
+            action_keys=list(action_space.flatten().keys())
+        )
+        for i in range(2):
+            state = dict(a=np.full(shape=(2,), fill_value=float(i)), b=(i, 0.5 * i))
+            buffer.add(state, dict(x=i, y=-1.0 * i), [], 1.0, state, i == 1)
+
+        states, actions, _, _, next_states, terminals = buffer.get_records()
+        self.assertEqual(set(states.keys()), {"a", "b/_T0_", "b/_T1_"})
+        recursive_assert_almost_equal(states["a"], [[0.0, 0.0], [1.0, 1.0]])
+        recursive_assert_almost_equal(states["b/_T0_"], [0, 1])
+        recursive_assert_almost_equal(next_states["b/_T1_"], [0.0, 0.5])
+        recursive_assert_almost_equal(actions["/x"], [0, 1])
+        recursive_assert_almost_equal(actions["/y"], [0.0, -1.0])
+        recursive_assert_almost_equal(terminals, [False, True])
+        self.assertEqual(len(buffer.get_column("states")), 3)
@@ -17,12 +17,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import shutil
+import tempfile
 import unittest
 import numpy as np
 from six.moves import xrange as range_
+from rlgraph.components.helpers.mem_snapshotter import MemSnapshotter
 from rlgraph.components.memories.mem_prioritized_replay import MemPrioritizedReplay
 from rlgraph.execution.ray.apex.apex_memory import ApexMemory
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.environment_sample import EnvironmentSample
+from rlgraph.execution.ray.ray_util import ray_compress, ray_compress_batch, merge_samples, RayCompressedTransitions
 from rlgraph.spaces import Dict, IntBox, BoolBox, FloatBox
 
 
@@ -255,3 +259,361 @@ class TestPythonPrioritizedReplay(unittest.TestCase):
         self.assertEqual(tree.index_of_prefixsum(1.51), 2)
         self.assertEqual(tree.index_of_prefixsum(3.0), 3)
         self.assertEqual(tree.index_of_prefixsum(5.50), 3)
+
+    def test_batched_tree_insert_and_sample(self):
+        """
+        Tests batched insertion and batched prefix-sum sampling against the per-element versions.
+        """
+        batched_memory = ApexMemory(capacity=64)
+        memory = ApexMemory(capacity=64)
+
+        indices = np.random.randint(0, 64, size=(100,))
+        priorities = np.random.uniform(size=(100,))
+        batched_memory.merged_segment_tree.insert_batch(indices, priorities)
+        for index, priority in zip(indices, priorities):
+            memory.merged_segment_tree.insert(index, priority)
+
+        batched_tree = batched_memory.merged_segment_tree
+        tree = memory.merged_segment_tree
+        self.assertTrue(np.allclose(batched_tree.sum_segment_tree.values, tree.sum_segment_tree.values))
+        self.assertTrue(np.allclose(batched_tree.min_segment_tree.values, tree.min_segment_tree.values))
+
+        prefix_sums = np.random.uniform(size=(50,)) * tree.sum_segment_tree.get_sum()
+        sampled_indices = batched_tree.sum_segment_tree.sample_batch(prefix_sums)
+        for prefix_sum, index in zip(prefix_sums, sampled_indices):
+            self.assertEqual(tree.sum_segment_tree.index_of_prefixsum(prefix_sum), index)
+
+        # Max importance weight is 1.0 (for the min-priority element).
+        weights = batched_tree.get_importance_weights(np.unique(indices), beta=1.0)
+        self.assertTrue(np.isclose(np.max(weights), 1.0))
+
+    def test_columnar_apex_memory(self):
+        """
+        Tests columnar storage against the record-tuple storage of the Apex memory.
+        """
+        action_space = FloatBox(shape=(2,))
+        memory = ApexMemory(action_space=action_space, capacity=self.capacity)
+        columnar_memory = ApexMemory(action_space=action_space, capacity=self.capacity, columnar_storage=True)
+
+        # Insert more records than capacity to test wrap-around.
+        for _ in range_(3):
+            observation = self.apex_space.sample(size=5)
+            records = dict(
+                states=list(observation["states"]),
+                actions=observation["actions"],
+                rewards=observation["reward"],
+                terminals=observation["terminals"],
+                next_states=list(observation["states"]),
+                importance_weights=observation["weights"]
+            )
+            memory.insert_batch(records)
+            columnar_memory.insert_batch(records)
+        self.assertEqual(memory.size, columnar_memory.size)
+        self.assertEqual(memory.index, columnar_memory.index)
+
+        indices = np.asarray([0, 2, 2, 9])
+        expected = memory.read_records(indices)
+        batch = columnar_memory.read_records(indices)
+        for key in expected.keys():
+            self.assertTrue(np.allclose(expected[key], batch[key]))
+
+    def test_threaded_apex_memory_decompression(self):
+        """
+        Tests decompressing sampled batches with repeated indices in a thread pool.
+        """
+        observation = self.apex_space.sample(size=8)
+        states = observation["states"].astype(np.float32)
+        for num_threads in [1, 4]:
+            for compressed_states in [ray_compress_batch(states), [ray_compress(state) for state in states]]:
+                memory = ApexMemory(
+                    action_space=FloatBox(shape=(2,)), capacity=self.capacity, num_decompression_threads=num_threads
+                )
+                memory.insert_batch(dict(
+                    states=compressed_states,
+                    actions=observation["actions"],
+                    rewards=observation["reward"],
+                    terminals=observation["terminals"],
+                    next_states=compressed_states,
+                    importance_weights=observation["weights"]
+                ))
+                indices = np.asarray([5, 1, 5, 7, 0, 1, 1, 3, 5, 2])
+                batch = memory.read_records(indices)
+                self.assertTrue(np.allclose(batch["states"], states[indices]))
+                self.assertTrue(np.allclose(batch["next_states"], states[indices]))
+
+    def test_apex_memory_shared_frame_transitions(self):
+        """
+        Tests inserting and merging transitions whose states and next-states share one compressed frame table.
+        """
+        observation = self.apex_space.sample(size=6)
+        # One trajectory of 6 transitions: 7 frames, the next-state of each transition is the following state.
+        frames = np.random.uniform(size=(7, 4)).astype(np.float32)
+        transitions = RayCompressedTransitions(ray_compress_batch(frames), np.arange(6), np.arange(1, 7))
+        records = dict(
+            transitions=transitions,
+            actions=observation["actions"],
+            rewards=observation["reward"],
+            terminals=observation["terminals"],
+            importance_weights=observation["weights"]
+        )
+        for columnar_storage in [False, True]:
+            memory = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, columnar_storage=columnar_storage
+            )
+            memory.insert_batch(records)
+            indices = np.asarray([4, 0, 5, 4])
+            batch = memory.read_records(indices)
+            self.assertTrue(np.allclose(batch["states"], frames[indices]))
+            self.assertTrue(np.allclose(batch["next_states"], frames[indices + 1]))
+            if columnar_storage:
+                # Shared frames are stored once.
+                self.assertIs(memory.columns["next_states"][0], memory.columns["states"][1])
+
+        # Merging keeps one frame table per batch, decompressing yields states and next-states.
+        samples = [EnvironmentSample(sample_batch=records, batch_size=6, metrics={}) for _ in range_(2)]
+        merged = merge_samples(samples)
+        self.assertEqual(len(merged["transitions"]), 12)
+        self.assertEqual(len(merged["transitions"].frames), 14)
+        merged = merge_samples(samples, decompress=True)
+        self.assertTrue(np.allclose(merged["states"], np.concatenate([frames[:-1], frames[:-1]])))
+        self.assertTrue(np.allclose(merged["next_states"], np.concatenate([frames[1:], frames[1:]])))
+
+    def test_frame_deduplicating_apex_memory(self):
+        """
+        Tests storing stacked-frame states with each frame stored only once.
+        """
+        sequence_length = 4
+        memory = ApexMemory(
+            action_space=IntBox(2), capacity=self.capacity, frame_stack_length=sequence_length, n_step=1
+        )
+
+        # One episode of 6 frames, stacked like a `Sequence` preprocessor after reset.
+        frames = np.random.randint(0, 255, size=(7, 3, 3)).astype(np.uint8)
+        stacks = np.asarray([np.stack([frames[max(0, t - i)] for i in reversed(range_(sequence_length))], axis=-1)
+                             for t in range_(7)])
+        records = dict(
+            states=stacks[:-1],
+            actions=np.random.randint(0, 2, size=(6,)),
+            rewards=np.random.uniform(size=(6,)),
+            terminals=np.asarray([False] * 5 + [True]),
+            next_states=stacks[1:],
+            importance_weights=np.ones(shape=(6,))
+        )
+        memory.insert_batch(records)
+        # 6 states: 4 frames for the first, 1 for each following; the final next-state adds 1 more.
+        self.assertEqual(memory.frame_store.frame_count, 10)
+
+        indices = np.asarray([5, 0, 3])
+        batch = memory.read_records(indices)
+        self.assertTrue(np.array_equal(batch["states"], stacks[indices]))
+        self.assertTrue(np.array_equal(batch["next_states"], stacks[indices + 1]))
+
+    def test_frame_deduplicating_apex_memory_eviction(self):
+        """
+        Tests that transitions whose frames were overwritten in a too small frame ring are no longer sampled.
+        """
+        sequence_length = 4
+        memory = ApexMemory(
+            action_space=IntBox(2), capacity=16, frame_stack_length=sequence_length, frame_capacity=16, n_step=1
+        )
+        episodes = []
+        for _ in range_(2):
+            frames = np.random.randint(0, 255, size=(7, 3, 3)).astype(np.uint8)
+            stacks = np.asarray([np.stack([frames[max(0, t - i)] for i in reversed(range_(sequence_length))],
+                                          axis=-1) for t in range_(7)])
+            episodes.append(stacks)
+            memory.insert_batch(dict(
+                states=stacks[:-1],
+                actions=np.random.randint(0, 2, size=(6,)),
+                rewards=np.random.uniform(size=(6,)),
+                terminals=np.asarray([False] * 5 + [True]),
+                next_states=stacks[1:],
+                importance_weights=np.ones(shape=(6,))
+            ))
+        # 20 frames were written, so the first 4 frames (only referenced by the first 4 states) are gone.
+        self.assertEqual(memory.frame_store.num_overwritten(0, memory.size), 4)
+        self.assertTrue(np.array_equal(memory.frame_store.is_overwritten(np.arange(12)), np.arange(12) < 4))
+
+        # Late priority updates do not make evicted transitions sampleable again.
+        memory.update_records(np.asarray([0, 6]), np.asarray([5.0, 5.0]))
+        for _ in range_(10):
+            batch, indices, weights = memory.get_records(8)
+            self.assertTrue(np.all(indices >= 4))
+            self.assertTrue(np.all(weights <= 1.0))
+        batch = memory.read_records(np.asarray([4, 5, 6, 11]))
+        self.assertTrue(np.array_equal(batch["states"], np.concatenate([episodes[0][4:6], episodes[1][[0, 5]]])))
+        self.assertTrue(np.array_equal(batch["next_states"],
+                                       np.concatenate([episodes[0][5:7], episodes[1][[1, 6]]])))
+
+    def test_memory_mapped_apex_memory(self):
+        """
+        Tests reopening a memory whose columns are stored in memory-mapped files.
+        """
+        storage_directory = tempfile.mkdtemp()
+        try:
+            memory = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory
+            )
+            observation = self.apex_space.sample(size=5)
+            memory.insert_batch(dict(
+                states=observation["states"],
+                actions=observation["actions"],
+                rewards=observation["reward"],
+                terminals=observation["terminals"],
+                next_states=observation["states"],
+                importance_weights=observation["weights"]
+            ))
+            memory.update_records(np.asarray([1, 3]), np.asarray([0.5, 2.0]))
+            indices = np.asarray([4, 1, 3, 1])
+            expected = memory.read_records(indices)
+            expected_priority_sum = memory.merged_segment_tree.sum_segment_tree.get_sum()
+            memory.flush()
+
+            # Reopen from disk.
+            memory = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory
+            )
+            self.assertEqual(memory.size, 5)
+            self.assertEqual(memory.index, 5)
+            self.assertTrue(np.isclose(memory.merged_segment_tree.sum_segment_tree.get_sum(), expected_priority_sum))
+            batch = memory.read_records(indices)
+            for key in expected.keys():
+                self.assertTrue(np.allclose(expected[key], batch[key]))
+        finally:
+            shutil.rmtree(storage_directory)
+
+    def test_memory_mapped_apex_memory_metadata_interval(self):
+        """
+        Tests that the metadata of a memory-mapped memory is only written every `metadata_interval` records.
+        """
+        storage_directory = tempfile.mkdtemp()
+        try:
+            memory = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory,
+                metadata_interval=4
+            )
+            for _ in range(2):
+                observation = self.apex_space.sample(size=3)
+                memory.insert_batch(dict(
+                    states=observation["states"],
+                    actions=observation["actions"],
+                    rewards=observation["reward"],
+                    terminals=observation["terminals"],
+                    next_states=observation["states"],
+                    importance_weights=observation["weights"]
+                ))
+                reopened = ApexMemory(
+                    action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory
+                )
+                # Nothing is persisted before the interval is reached.
+                self.assertEqual(reopened.size, 0 if memory.size < 4 else memory.size)
+
+            memory.insert_records((
+                observation["states"][0], observation["actions"][0], observation["reward"][0],
+                observation["terminals"][0], observation["states"][0], None
+            ))
+            reopened = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory
+            )
+            self.assertEqual(reopened.size, 6)
+
+            memory.flush()
+            reopened = ApexMemory(
+                action_space=FloatBox(shape=(2,)), capacity=self.capacity, storage_directory=storage_directory
+            )
+            self.assertEqual(reopened.size, 7)
+        finally:
+            shutil.rmtree(storage_directory)
+
+    def test_apex_memory_snapshot(self):
+        """
+        Tests incremental snapshots of a columnar memory and restoring them into a new memory.
+        """
+        snapshot_directory = tempfile.mkdtemp()
+        try:
+            memory = ApexMemory(action_space=FloatBox(shape=(2,)), capacity=self.capacity, columnar_storage=True)
+            snapshotter = MemSnapshotter(snapshot_directory, chunk_size=2)
+
+            def insert(num_records):
+                observation = self.apex_space.sample(size=num_records)
+                memory.insert_batch(dict(
+                    states=observation["states"],
+                    actions=observation["actions"],
+                    rewards=observation["reward"],
+                    terminals=observation["terminals"],
+                    next_states=observation["states"],
+                    importance_weights=observation["weights"]
+                ))
+
+            insert(6)
+            snapshotter.snapshot(memory)
+            insert(1)
+            memory.update_records(np.asarray([1, 3]), np.asarray([0.5, 2.0]))
+            snapshotter.snapshot(memory)
+            snapshotter.wait()
+            # Only the chunk holding the 7th record was written again.
+            self.assertTrue(all(
+                files == {"0": "{}.0.0.npz".format(name), "1": "{}.1.0.npz".format(name),
+                          "2": "{}.2.0.npz".format(name), "3": "{}.3.1.npz".format(name),
+                          "4": "{}.4.0.npz".format(name)}
+                for name, files in snapshotter.manifest["rings"]["records"]["columns"].items()
+            ))
+
+            restored = ApexMemory(action_space=FloatBox(shape=(2,)), capacity=self.capacity, columnar_storage=True)
+            MemSnapshotter(snapshot_directory).restore(restored)
+            self.assertEqual(restored.size, 7)
+            self.assertEqual(restored.index, 7)
+            self.assertEqual(restored.max_priority, memory.max_priority)
+            self.assertTrue(np.allclose(
+                restored.merged_segment_tree.sum_segment_tree.values, memory.merged_segment_tree.sum_segment_tree.values
+            ))
+            self.assertTrue(np.allclose(
+                restored.merged_segment_tree.min_segment_tree.values, memory.merged_segment_tree.min_segment_tree.values
+            ))
+            indices = np.asarray([6, 1, 3, 1])
+            expected = memory.read_records(indices)
+            batch = restored.read_records(indices)
+            for key in expected.keys():
+                self.assertTrue(np.allclose(expected[key], batch[key]))
+        finally:
+            shutil.rmtree(snapshot_directory)
+
+    def test_frame_deduplicating_apex_memory_snapshot_restore(self):
+        """
+        Tests restoring a snapshot into a frame-deduplicating memory which already holds records and inserting
+        into it afterwards.
+        """
+        sequence_length = 4
+
+        def episode_stacks(length):
+            frames = np.random.randint(0, 255, size=(length, 3, 3)).astype(np.uint8)
+            return np.asarray([np.stack([frames[max(0, t - i)] for i in reversed(range_(sequence_length))], axis=-1)
+                               for t in range_(length)])
+
+        def insert(memory, stacks):
+            num_records = len(stacks) - 1
+            memory.insert_batch(dict(
+                states=stacks[:-1],
+                actions=np.random.randint(0, 2, size=(num_records,)),
+                rewards=np.random.uniform(size=(num_records,)),
+                terminals=np.zeros(shape=(num_records,), dtype=np.bool_),
+                next_states=stacks[1:],
+                importance_weights=np.ones(shape=(num_records,))
+            ))
+
+        memory = ApexMemory(action_space=IntBox(2), capacity=self.capacity, frame_stack_length=sequence_length)
+        snapshot_stacks = episode_stacks(4)
+        insert(memory, snapshot_stacks)
+        snapshot = memory.get_snapshot()
+
+        restored = ApexMemory(action_space=IntBox(2), capacity=self.capacity, frame_stack_length=sequence_length)
+        stacks = episode_stacks(9)
+        insert(restored, stacks[:5])
+        restored.restore_snapshot(snapshot)
+        # Continues the episode inserted before the restore: Its first state equals the last stack written then.
+        insert(restored, stacks[4:])
+
+        self.assertEqual(restored.size, 7)
+        batch = restored.read_records(np.arange(7))
+        self.assertTrue(np.array_equal(batch["states"], np.concatenate([snapshot_stacks[:-1], stacks[4:-1]])))
+        self.assertTrue(np.array_equal(batch["next_states"], np.concatenate([snapshot_stacks[1:], stacks[5:]])))
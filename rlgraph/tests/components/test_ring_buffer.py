@@ -260,3 +260,72 @@ class TestRingBufferMemory(unittest.TestCase):
             recursive_assert_almost_equal(batch["states"]["state2"], observation["states"]["state2"][-last_n:])
             recursive_assert_almost_equal(batch["terminals"], observation["terminals"][-last_n:])
 
+
+    def test_episodes_with_wrap_around(self):
+        """
+        Tests episode bookkeeping when inserts wrap around the end of the buffer and overwrite episodes.
+        """
+        ring_buffer = RingBuffer(capacity=self.capacity)
+        test = ComponentTest(component=ring_buffer, input_spaces=self.input_spaces)
+
+        # Episodes end at buffer indices 1 and 5.
+        observation = non_terminal_records(self.record_space, 6)
+        observation["terminals"][[1, 5]] = True
+        test.test(("insert_records", observation), expected_outputs=None)
+
+        # Write to buffer indices 6-9 and 0-1: Overwrites the episode ending at 1, adds episodes ending at 8 and 1.
+        observation = non_terminal_records(self.record_space, 6)
+        observation["terminals"][[2, 5]] = True
+        test.test(("insert_records", observation), expected_outputs=None)
+
+        ring_buffer_variables = test.get_variable_values(ring_buffer, self.ring_buffer_variables)
+        self.assertEqual(ring_buffer_variables["num-episodes"], 3)
+        self.assertEqual(ring_buffer_variables["index"], 2)
+        recursive_assert_almost_equal(ring_buffer_variables["episode-indices"][:3], [5, 8, 1])
+
+        # The two most recent episodes are exactly the second insert.
+        episodes = test.test(("get_episodes", 2), expected_outputs=None)
+        recursive_assert_almost_equal(episodes["states"]["state1"], observation["states"]["state1"])
+        recursive_assert_almost_equal(episodes["terminals"], observation["terminals"])
+
+        batch = test.test(("get_records", 4), expected_outputs=None)
+        recursive_assert_almost_equal(batch["actions"]["action1"], observation["actions"]["action1"][-4:])
+
+    def test_get_sequences(self):
+        """
+        Tests fetching padded batches of whole episodes and of fixed-length sub-sequences.
+        """
+        input_spaces = dict(self.input_spaces, num_sequences=int)
+        ring_buffer = RingBuffer(capacity=self.capacity)
+        test = ComponentTest(component=ring_buffer, input_spaces=input_spaces)
+
+        # Episodes of length 3, 2 and 4.
+        observation = non_terminal_records(self.record_space, 9)
+        observation["terminals"][[2, 4, 8]] = True
+        test.test(("insert_records", observation), expected_outputs=None)
+
+        # Two most recent episodes, padded to the longer one.
+        records, sequence_lengths = test.test(("get_sequences", 2), expected_outputs=None)
+        recursive_assert_almost_equal(sequence_lengths, [2, 4])
+        state1 = observation["states"]["state1"]
+        expected_state1 = np.array([np.concatenate([state1[3:5], [0.0, 0.0]]), state1[5:9]])
+        recursive_assert_almost_equal(records["states"]["state1"], expected_state1, decimals=5)
+        recursive_assert_almost_equal(records["terminals"], [[0, 1, 0, 0], [0, 0, 0, 1]])
+
+        # Asking for more episodes than stored returns all of them.
+        _, sequence_lengths = test.test(("get_sequences", 5), expected_outputs=None)
+        recursive_assert_almost_equal(sequence_lengths, [3, 2, 4])
+
+        # Uniformly sampled sub-sequences of 2 steps plus 1 burn-in step.
+        ring_buffer = RingBuffer(capacity=self.capacity, sequence_sampling="uniform", sequence_length=2, burn_in=1)
+        test = ComponentTest(component=ring_buffer, input_spaces=input_spaces)
+        test.test(("insert_records", observation), expected_outputs=None)
+        records, sequence_lengths = test.test(("get_sequences", 8), expected_outputs=None)
+        self.assertEqual(np.asarray(records["actions"]["action1"]).shape, (8, 3))
+        # Sub-sequences are contiguous slices of episodes, shorter episodes are padded.
+        action1 = np.asarray(observation["actions"]["action1"])
+        for sequence, length in zip(np.asarray(records["actions"]["action1"]), np.asarray(sequence_lengths)):
+            self.assertIn(length, [2, 3])
+            start = int(np.argmin(np.abs(action1 - sequence[0])))
+            recursive_assert_almost_equal(sequence[:length], action1[start:start + length], decimals=5)
+            recursive_assert_almost_equal(sequence[length:], np.zeros(3 - length))
@@ -191,3 +191,14 @@ class TestSequenceHelper(unittest.TestCase):
             ("reverse_apply_decays_to_sequence", [td_errors, indices, decay_value]),
             expected_outputs=expected_output_sequence_manual
         )
+
+        # Two sequences: Accumulation starts over at the end of the first one.
+        indices = np.array([0, 1, 0, 1])
+        expected_output_sequence = np.concatenate([
+            self.decay_td_sequence(td_errors[:2], decay=decay_value),
+            self.decay_td_sequence(td_errors[2:], decay=decay_value)
+        ])
+        test.test(
+            ("reverse_apply_decays_to_sequence", [td_errors, indices, decay_value]),
+            expected_outputs=expected_output_sequence
+        )
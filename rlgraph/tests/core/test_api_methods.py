@@ -21,6 +21,7 @@ import unittest
 import mock
 from tensorflow.core.framework import summary_pb2
 
+from rlgraph import get_backend
 from rlgraph.tests import ComponentTest
 from rlgraph.tests.test_util import regex_pattern
 from rlgraph.utils import root_logger
@@ -44,6 +45,33 @@ class TestAPIMethods(unittest.TestCase):
         # Expected: in - 2.0 + 1.0
         test.test(("run2", 1.1), expected_outputs=0.1, decimals=4)
 
+    def test_call_plans(self):
+        a = DummyWithSubComponents(scope="A")
+        test = ComponentTest(component=a, input_spaces=dict(input_=float))
+        executor = test.graph_executor
+
+        # Calls with the same signature share one plan.
+        test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+        test.test(("run1", -1.0), expected_outputs=[1.0, 2.0], decimals=4)
+        self.assertEqual(len(executor.call_plans), 1)
+
+        test.test(("run1", 1.1, [1]), expected_outputs=4.1, decimals=4)
+        test.test(("run2", 1.1), expected_outputs=0.1, decimals=4)
+        if get_backend() == "tf":
+            # Different return ops or API-methods need new plans.
+            self.assertEqual(len(executor.call_plans), 3)
+
+            # Least recently used plans are evicted.
+            executor.call_plan_cache_size = 2
+            test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+            test.test(("run1", 1.1, [0]), expected_outputs=3.1, decimals=4)
+            self.assertEqual(len(executor.call_plans), 2)
+            self.assertEqual([signature[0][0] for signature in executor.call_plans.keys()], ["run1", "run1"])
+        elif get_backend() == "pytorch":
+            # Plans are keyed by API-method and input signature only, return ops are selected per call.
+            self.assertEqual(len(executor.call_plans), 2)
+            self.assertEqual(sorted(key[0] for key in executor.call_plans.keys()), ["run1", "run2"])
+
     def test_connecting_two_1to1_components(self):
         """
         Adds two components with 1-to-1 graph_fns to the core, connects them and passes a value through it.
@@ -0,0 +1,71 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+from rlgraph.graphs.build_profiler import BuildProfiler
+
+
+class TestBuildProfiler(unittest.TestCase):
+    """
+    Tests span accounting, latency histograms and trace export of the BuildProfiler.
+    """
+    def test_nested_spans(self):
+        profiler = BuildProfiler()
+        profiler.start("meta_graph", "agent", "get_action")
+        time.sleep(0.01)
+        profiler.start("meta_graph", "agent/policy", "get_logits")
+        time.sleep(0.02)
+        profiler.start("var_creation", "agent/policy/dense", "when_input_complete")
+        time.sleep(0.01)
+        profiler.stop()
+        profiler.start("graph_fn_tracing", "agent/policy", "_graph_fn_call")
+        profiler.stop()
+        profiler.stop()
+        profiler.stop()
+
+        # Exclusive times per Component add up to the outermost span.
+        stats = profiler.component_stats
+        self.assertGreaterEqual(stats["agent/policy"]["meta_graph"], 0.02)
+        self.assertLess(stats["agent"]["meta_graph"], 0.02)
+        self.assertGreaterEqual(stats["agent/policy/dense"]["var_creation"], 0.01)
+        self.assertEqual(stats["agent/policy"]["graph_fn_calls"], 1)
+        total = sum(profiler.get_build_times().values())
+        self.assertAlmostEqual(total, profiler.events[-1][4])
+
+        trace = profiler.to_chrome_trace()
+        self.assertEqual(len(trace["traceEvents"]), 4)
+        self.assertEqual(trace["traceEvents"][-1]["name"], "agent.get_action")
+        self.assertEqual(trace["traceEvents"][-1]["ph"], "X")
+
+    def test_api_call_latencies(self):
+        profiler = BuildProfiler(max_trace_events=2)
+        for duration in [2e-6, 3e-6, 0.5, 100.0]:
+            profiler.record_api_call("get_action", 0.0, duration)
+
+        stats = profiler.to_dict()["api_calls"]["get_action"]
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual(stats["min"], 2e-6)
+        self.assertEqual(stats["max"], 100.0)
+        self.assertEqual(sum(stats["histogram"]), 4)
+        # Above the highest bucket edge.
+        self.assertEqual(stats["histogram"][-1], 1)
+        # Only `max_trace_events` calls are kept as events.
+        self.assertEqual(len(profiler.events), 2)
@@ -0,0 +1,53 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.tests import recursive_assert_almost_equal
+from rlgraph.utils.numpy import n_step_transitions
+
+
+class TestNumpyUtil(unittest.TestCase):
+    """
+    Tests numpy utils.
+    """
+    def test_n_step_transitions(self):
+        # Two trajectories: An episode of length 4 and an unfinished fragment of length 4.
+        rewards = np.array([1.0, 2.0, 3.0, 4.0, 1.0, 1.0, 1.0, 1.0])
+        terminals = np.array([False, False, False, True, False, False, False, False])
+        sequence_ends = np.array([False, False, False, False, False, False, False, True])
+        n_step_rewards, next_state_indices, n_step_terminals, complete = n_step_transitions(
+            rewards, terminals, n_step=3, discount=0.5, sequence_ends=sequence_ends
+        )
+
+        # Horizons are cut off at the terminal, but not beyond the fragment's end.
+        recursive_assert_almost_equal(n_step_rewards, [2.75, 4.5, 5.0, 4.0, 1.75, 1.75, 1.5, 1.0])
+        recursive_assert_almost_equal(next_state_indices, [2, 3, 3, 3, 6, 7, 7, 7])
+        recursive_assert_almost_equal(n_step_terminals, [False, True, True, True, False, False, False, False])
+        recursive_assert_almost_equal(complete, [True, True, True, True, True, True, False, False])
+
+        # One step: The transitions themselves.
+        n_step_rewards, next_state_indices, n_step_terminals, complete = n_step_transitions(
+            rewards, terminals, n_step=1, discount=0.5
+        )
+        recursive_assert_almost_equal(n_step_rewards, rewards)
+        recursive_assert_almost_equal(next_state_indices, np.arange(8))
+        recursive_assert_almost_equal(n_step_terminals, terminals)
+        self.assertTrue(np.all(complete))
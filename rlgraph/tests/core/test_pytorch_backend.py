@@ -28,7 +28,7 @@ from rlgraph.spaces import FloatBox, IntBox, Dict, BoolBox
 from rlgraph.tests import ComponentTest
 from rlgraph.tests.dummy_components import *
 from rlgraph.tests.dummy_components_with_sub_components import *
-from rlgraph.tests.test_util import config_from_path
+from rlgraph.tests.test_util import config_from_path, recursive_assert_almost_equal
 from rlgraph.utils import root_logger, softmax
 from rlgraph.utils.define_by_run_ops import print_call_chain
 
@@ -155,6 +155,47 @@ class TestPytorchBackend(unittest.TestCase):
         expected = np.array([2.5, 2.5])
         test.test(("call", input_), expected_outputs=expected)
 
+    def test_compiled_calls(self):
+        space = FloatBox(shape=(2,), add_batch_rank=True)
+        dense_layer = DenseLayer(units=2, weights_spec=1.0, biases_spec=False)
+        test = ComponentTest(component=dense_layer, input_spaces=dict(inputs=space))
+        self.assertTrue(test.graph_executor.compile_calls)
+
+        # Calls with the same input signature share one call plan.
+        test.test(("call", np.array([0.5, 2.0])), expected_outputs=np.array([2.5, 2.5]))
+        test.test(("call", np.array([1.0, -1.0])), expected_outputs=np.array([0.0, 0.0]))
+        self.assertEqual(len(test.graph_executor.call_plans), 1)
+
+        # A new signature (list instead of array) is compiled separately and gives the same results
+        # as the generic (uncompiled) path.
+        compiled = test.test(("call", [0.5, 2.0]), expected_outputs=np.array([2.5, 2.5]))
+        self.assertEqual(len(test.graph_executor.call_plans), 2)
+        test.graph_executor.compile_calls = False
+        recursive_assert_almost_equal(test.test(("call", [0.5, 2.0]), expected_outputs=None), compiled)
+
+    def test_compiled_calls_match_generic_path(self):
+        # Container inputs and (flat-key) container outputs.
+        component = NoFlattenNoSplitDummy()
+        test = ComponentTest(component=component, input_spaces=dict(
+            input1=Dict(a=int, b=bool), input2=Dict(c=bool, d=int)
+        ))
+        in1 = dict(a=5, b=True)
+        in2 = dict(c=False, d=3)
+        compiled = test.test(("run", [in1, in2]), expected_outputs=[in2, in1])
+        test.graph_executor.compile_calls = False
+        recursive_assert_almost_equal(test.test(("run", [in1, in2]), expected_outputs=None), compiled)
+
+        # Float64 inputs are converted to float32 like in the generic path, not passed zero-copy.
+        dense_layer = DenseLayer(units=2, weights_spec=1.0, biases_spec=False)
+        test = ComponentTest(component=dense_layer, input_spaces=dict(inputs=FloatBox(shape=(2,),
+                                                                                      add_batch_rank=True)))
+        input_ = np.array([[0.5, 2.0]], dtype=np.float64)
+        compiled = test.test(("call", input_), expected_outputs=np.array([[2.5, 2.5]]))
+        test.graph_executor.compile_calls = False
+        uncompiled = test.test(("call", input_), expected_outputs=None)
+        self.assertEqual(compiled.dtype, uncompiled.dtype)
+        recursive_assert_almost_equal(compiled, uncompiled)
+
     def test_nn_assembly_from_file(self):
         # Space must contain batch dimension (otherwise, NNlayer will complain).
         space = FloatBox(shape=(3,), add_batch_rank=True)
@@ -20,9 +20,11 @@ from __future__ import print_function
 import logging
 import unittest
 
+import numpy as np
+
 from rlgraph import get_backend
 from rlgraph.tests import recursive_assert_almost_equal
-from rlgraph.utils import root_logger, pytorch_one_hot
+from rlgraph.utils import root_logger, pytorch_one_hot, pytorch_reverse_discounted_cumsum
 
 if get_backend() == "pytorch":
     import torch
@@ -53,3 +55,26 @@ class TestPyTorchUtil(unittest.TestCase):
             expected = torch.tensor([[[1, 0, 0, 0],[0, 0, 0, 1],[0, 0, 1, 0]],[[0, 1, 0, 0],[0, 0, 1, 0],[1, 0, 0, 0,]]],
                                     dtype=torch.int32)
             recursive_assert_almost_equal(one_hot, expected)
+
+    def test_reverse_discounted_cumsum(self):
+        """
+        Tests the vectorized reverse discounting with sequence resets against a python loop.
+        """
+        if get_backend() == "pytorch":
+            values = np.random.random(size=1000)
+            sequence_ends = np.random.random(size=1000) < 0.05
+            coefficients = np.where(sequence_ends, 0.0, 0.95)
+
+            expected = np.zeros_like(values)
+            accumulated = 0.0
+            for i in reversed(range(len(values))):
+                accumulated = values[i] + coefficients[i] * accumulated
+                expected[i] = accumulated
+
+            result = pytorch_reverse_discounted_cumsum(torch.tensor(values), torch.tensor(coefficients))
+            recursive_assert_almost_equal(result.numpy(), expected, decimals=5)
+
+            # Extra value dimensions are accumulated independently.
+            values = np.stack([values, 2 * values], axis=-1)
+            result = pytorch_reverse_discounted_cumsum(torch.tensor(values), torch.tensor(coefficients))
+            recursive_assert_almost_equal(result.numpy(), np.stack([expected, 2 * expected], axis=-1), decimals=5)
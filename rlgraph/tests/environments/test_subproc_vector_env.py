@@ -0,0 +1,101 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.environments import SubprocVectorEnv
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class TestSubprocVectorEnv(unittest.TestCase):
+    """
+    Tests resetting and stepping through a vectorized Env with GridWorld entities in worker processes.
+    """
+    def test_subproc_vector_env(self):
+        num_envs = 4
+        env = SubprocVectorEnv(num_environments=num_envs, env_spec={"type": "gridworld", "world": "2x2"},
+                               num_processes=2)
+        try:
+            s = env.reset_all()  # ["XH", " G"]  X=player's position
+            all(self.assertTrue(s_ == 0) for s_ in s)
+
+            s, r, t, _ = env.step([2 for _ in range(num_envs)])  # down: [" H", "XG"]
+            all(self.assertTrue(s_ == 1) for s_ in s)
+            all(recursive_assert_almost_equal(r_, -0.1) for r_ in r)
+            all(self.assertTrue(not t_) for t_ in t)
+
+            # Split step.
+            env.step_send([1 for _ in range(num_envs)])  # right: [" H", " X"]
+            s, r, t, _ = env.step_recv()
+            all(self.assertTrue(s_ == 3) for s_ in s)
+            all(recursive_assert_almost_equal(r_, 1.0) for r_ in r)
+            all(self.assertTrue(t_) for t_ in t)
+
+            s = env.reset(index=2)
+            self.assertTrue(s == 0)
+        finally:
+            env.terminate_all()
+
+    def test_subproc_vector_env_auto_reset(self):
+        num_envs = 3
+        env = SubprocVectorEnv(num_environments=num_envs, env_spec={"type": "gridworld", "world": "2x2"},
+                               auto_reset=True)
+        try:
+            env.reset_all()
+            env.step([2 for _ in range(num_envs)])  # down: [" H", "XG"]
+            s, r, t, _ = env.step([1 for _ in range(num_envs)])  # right: [" H", " X"]
+            all(self.assertTrue(s_ == 3) for s_ in s)
+            all(self.assertTrue(t_) for t_ in t)
+
+            # Environments were already reset in their workers.
+            for i in range(num_envs):
+                self.assertTrue(env.reset(index=i) == 0)
+            s, r, t, _ = env.step([2 for _ in range(num_envs)])
+            all(self.assertTrue(s_ == 1) for s_ in s)
+        finally:
+            env.terminate_all()
+
+    def test_subproc_vector_env_step_ready(self):
+        num_envs = 4
+        env = SubprocVectorEnv(num_environments=num_envs, env_spec={"type": "gridworld", "world": "2x2"})
+        try:
+            env.reset_all()
+            env.step_async([2, 2], [0, 2])  # down: [" H", "XG"]
+            indices, s, r, t, _ = env.step_ready(num_environments=2)
+            self.assertEqual(sorted(indices.tolist()), [0, 2])
+            all(self.assertTrue(s_ == 1) for s_ in s)
+
+            # Start stepping the other environments and wait for at least one of them.
+            env.step_async([2, 2], [1, 3])
+            indices, s, r, t, _ = env.step_ready(num_environments=1)
+            self.assertGreaterEqual(len(indices), 1)
+            self.assertTrue(set(indices.tolist()).issubset({1, 3}))
+            all(self.assertTrue(s_ == 1) for s_ in s)
+
+            # Environments still stepping cannot be sent new actions.
+            if len(indices) == 1:
+                stepping_index = ({1, 3} - set(indices.tolist())).pop()
+                self.assertRaises(RLGraphError, env.step_async, [2], [stepping_index])
+            indices, _, _, _, _ = env.step_ready(num_environments=num_envs)
+            self.assertEqual(np.sum(env.stepping), 0)
+        finally:
+            env.terminate_all()
@@ -22,9 +22,16 @@ import numpy as np
 
 from rlgraph.components import PreprocessorStack
 from rlgraph.environments import OpenAIGymEnv, Environment
+from rlgraph import get_distributed_backend
 from rlgraph.execution.ray.apex import ApexExecutor
+from rlgraph.execution.ray.apex.apex_executor import UpdateWorker
+from rlgraph.spaces import Dict, FloatBox, IntBox
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.tests.test_util import config_from_path, recursive_assert_almost_equal
 
+if get_distributed_backend() == "ray":
+    import ray
+
 
 class TestApexExecutor(unittest.TestCase):
     """
@@ -253,3 +260,76 @@ class TestApexExecutor(unittest.TestCase):
 
         print("Eval episode rewards:")
         print(ep_rewards)
+
+    def test_update_worker_prefetch(self):
+        """
+        Tests the update worker's batch prefetching and learner metrics.
+        """
+        class UpdateCountingAgent(object):
+            preprocessed_state_space = FloatBox(shape=(2,))
+
+            def __init__(self):
+                self.batches = []
+
+            def update(self, batch=None):
+                self.batches.append(batch)
+                return 0.0, batch["rewards"]
+
+        ray.init()
+        agent = UpdateCountingAgent()
+        update_worker = UpdateWorker(agent=agent, in_queue_size=4, prefetch_depth=2)
+        update_worker.start()
+        for i in range(4):
+            batch = dict(states=np.full(shape=(3, 2), fill_value=i, dtype=np.float64), actions=np.arange(3),
+                         rewards=np.full(shape=(3,), fill_value=float(i)), indices=np.arange(3) + i)
+            # Memories return None until they can be sampled.
+            update_worker.input_queue.put((i, ray.put(None if i == 1 else batch)))
+
+        results = [update_worker.output_queue.get(timeout=10) for _ in range(3)]
+        self.assertEqual([memory for memory, _, _ in results], [0, 2, 3])
+        recursive_assert_almost_equal(results[-1][1], [3, 4, 5])
+        # States are converted to the preprocessed state dtype, all arrays are writable copies.
+        for batch in agent.batches:
+            self.assertEqual(batch["states"].dtype, np.float32)
+            self.assertTrue(all(value.flags.writeable for value in batch.values()))
+
+        metrics = update_worker.get_metrics()
+        self.assertEqual(metrics["learner_updates"], 3)
+        self.assertGreaterEqual(metrics["learner_idle_time"], 0.0)
+        self.assertLessEqual(metrics["learner_idle_fraction"], 1.0)
+        ray.shutdown()
+
+    def test_update_worker_container_states(self):
+        """
+        Tests converting the states of agents with container state spaces per key.
+        """
+        class ContainerStateAgent(object):
+            preprocessed_state_space = Dict(image=FloatBox(shape=(2,)), count=IntBox(3))
+
+        update_worker = UpdateWorker(agent=ContainerStateAgent(), in_queue_size=4)
+        states = dict(image=np.zeros(shape=(3, 2), dtype=np.float64), count=np.zeros(shape=(3,), dtype=np.int64))
+        batch = update_worker.prepare_batch(dict(
+            states=states, actions=np.arange(3), rewards=np.zeros(shape=(3,)), next_states=states,
+            indices=np.arange(3)
+        ))
+        for key in ["states", "next_states"]:
+            self.assertEqual(batch[key]["image"].dtype, np.float32)
+            self.assertEqual(batch[key]["count"].dtype, np.int32)
+        self.assertEqual(batch["actions"].dtype, np.arange(3).dtype)
+
+    def test_update_worker_prefetch_error(self):
+        """
+        Tests that prefetching errors terminate the update worker with an error instead of blocking it.
+        """
+        class NoUpdateAgent(object):
+            preprocessed_state_space = FloatBox(shape=(2,))
+
+        ray.init()
+        update_worker = UpdateWorker(agent=NoUpdateAgent(), in_queue_size=4)
+        update_worker.start()
+        # Malformed batch.
+        update_worker.input_queue.put((0, ray.put([1, 2, 3])))
+        update_worker.join(timeout=10)
+        self.assertFalse(update_worker.is_alive())
+        self.assertIsInstance(update_worker.error, RLGraphError)
+        ray.shutdown()
@@ -0,0 +1,75 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import mock
+
+from rlgraph.execution.ray.ray_util import RaySampleBatchTuner
+
+
+class TestRaySampleBatchTuner(unittest.TestCase):
+    """
+    Tests online tuning of worker sample sizes and task depths against simulated sample throughputs.
+    """
+    @staticmethod
+    def throughput(sample_size, task_depth):
+        # Per-task overheads are amortised by larger tasks up to a sample size of 128, more tasks in flight help up to
+        # a depth of 3.
+        return min(task_depth, 3) * 1000.0 * sample_size / (sample_size + 32.0) / (1.0 + sample_size / 512.0)
+
+    def run_windows(self, tuner, num_windows, backpressure=False):
+        clock = mock.Mock()
+        clock.perf_counter.side_effect = lambda: self.now
+        with mock.patch("rlgraph.execution.ray.ray_util.time", clock):
+            for _ in range(num_windows):
+                for _ in range(tuner.tuning_interval):
+                    tuner.observe_task(tuner.sample_size, 0.01, tuner.sample_size * 100)
+                    self.now += tuner.sample_size / self.throughput(tuner.sample_size, tuner.task_depth)
+                tuner.update(backpressure=backpressure)
+                self.assertTrue(tuner.min_sample_size <= tuner.sample_size <= tuner.max_sample_size)
+                self.assertTrue(tuner.min_task_depth <= tuner.task_depth <= tuner.max_task_depth)
+                if tuner.max_inflight_bytes is not None:
+                    self.assertLessEqual(tuner.sample_size * 100 * tuner.task_depth * tuner.num_workers,
+                                         tuner.max_inflight_bytes)
+
+    def setUp(self):
+        self.now = 0.0
+
+    def test_tuning_towards_maximum_throughput(self):
+        tuner = RaySampleBatchTuner(sample_size=8, task_depth=1, num_workers=4, min_sample_size=4,
+                                    max_sample_size=1024, max_task_depth=6)
+        self.run_windows(tuner, num_windows=60)
+        # Sample sizes oscillate around the optimum.
+        self.assertTrue(64 <= tuner.sample_size <= 256)
+        self.assertGreaterEqual(tuner.task_depth, 3)
+        metrics = tuner.get_metrics()
+        self.assertGreater(metrics["tuned_sample_throughput"], 0.9 * self.throughput(128, 3))
+        self.assertAlmostEqual(metrics["mean_sample_task_latency"], 0.01)
+
+    def test_backpressure_and_inflight_bytes(self):
+        # Knobs are only decreased under backpressure.
+        tuner = RaySampleBatchTuner(sample_size=64, task_depth=2, num_workers=4)
+        self.run_windows(tuner, num_windows=10, backpressure=True)
+        self.assertEqual(tuner.sample_size, 16)
+        self.assertEqual(tuner.task_depth, 1)
+
+        # Sample size and task depth are limited by the in-flight bytes budget.
+        tuner = RaySampleBatchTuner(sample_size=64, task_depth=1, num_workers=4, max_inflight_bytes=64 * 100 * 4 * 2)
+        self.run_windows(tuner, num_windows=20)
@@ -21,7 +21,7 @@ import unittest
 from time import sleep
 
 from rlgraph.execution.ray.ray_value_worker import RayValueWorker
-from rlgraph.execution.ray.ray_util import RayWeight
+from rlgraph.execution.ray.ray_util import RayWeight, RayWeightBroadcaster
 from rlgraph.tests.test_util import recursive_assert_almost_equal, config_from_path
 import numpy as np
 
@@ -101,6 +101,46 @@ class TestRayWorker(unittest.TestCase):
         # We do not break on terminal so there should be exactly 100 steps.
         self.assertEqual(len(observations["terminals"]), size)
 
+    def test_episode_ending_on_last_sample_step(self):
+        """
+        Tests episodes ending by `max_timesteps_per_episode` exactly at the last step of a sample call.
+        """
+        agent_config = config_from_path("configs/apex_agent_cartpole.json")
+        ray_spec = agent_config["execution_spec"].pop("ray_spec")
+        ray_spec["worker_spec"]["num_worker_environments"] = 1
+        worker = RayValueWorker.as_remote().remote(agent_config, ray_spec["worker_spec"], self.env_spec)
+
+        for _ in range(2):
+            # CartPole episodes last at least 8 steps, so both episodes end by the time step limit.
+            result = ray.get(worker.execute_and_get_timesteps.remote(10, max_timesteps_per_episode=5))
+            transitions = result.get_batch()["transitions"]
+            self.assertEqual(len(transitions), 10)
+            # No empty trailing fragment: 10 states plus the final next-state of each of the 2 episodes.
+            self.assertEqual(len(transitions.frames), 12)
+            states, next_states = transitions.decompress()
+            for start in [0, 5]:
+                self.assertTrue(np.array_equal(next_states[start:start + 4], states[start + 1:start + 5]))
+
+    def test_n_step_time_limited_episodes(self):
+        """
+        Tests that n-step transitions of episodes ended by a time limit are bootstrapped, not terminal.
+        """
+        class NStepWorker(object):
+            n_step_adjustment = 2
+            discount = 0.5
+
+        # An episode ended by the time limit (without terminal) followed by a terminated episode.
+        rewards = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+        terminals = [False, False, False, False, False, False, True]
+        positions, n_step_rewards, n_step_terminals, next_state_indices = RayValueWorker._truncate_n_step(
+            NStepWorker(), rewards, terminals, episode_ends=[3, 6], fragment_ends=[]
+        )
+        # The last transition of the time-limited episode lacks a full horizon.
+        recursive_assert_almost_equal(positions, [0, 1, 2, 4, 5, 6])
+        recursive_assert_almost_equal(n_step_rewards, [2.0, 3.5, 5.0, 8.0, 9.5, 7.0])
+        recursive_assert_almost_equal(n_step_terminals, [False, False, False, False, True, True])
+        recursive_assert_almost_equal(next_state_indices, [1, 2, 3, 5, 6, 6])
+
     def test_metrics(self):
         """
         Tests metric collection for 1 and multiple environments.
@@ -201,3 +241,50 @@ class TestRayWorker(unittest.TestCase):
         ray.wait([ret])
         print('Object store weight sync successful.')
 
+    def test_weight_broadcast(self):
+        """
+        Tests versioned, quantized and delta-encoded weight snapshots.
+        """
+        weights = dict(
+            policy_weights=dict(w=np.random.randn(64, 32).astype(np.float32), b=np.zeros(32, dtype=np.float32),
+                                step=np.array(0, dtype=np.int64)),
+            value_function_weights=None
+        )
+        for quantization in [None, "float16", "bfloat16"]:
+            broadcaster = RayWeightBroadcaster(quantization=quantization, delta_encoding=True)
+            broadcaster.publish(weights)
+            # Full snapshot of version 1.
+            full = ray.get(broadcaster.get_weights_for(0))
+            self.assertEqual(full.version, 1)
+            self.assertFalse(full.is_delta)
+            worker_weights = full.get_weights()
+            self.assertIsNone(broadcaster.get_weights_for(1))
+
+            # Only changed variables are contained in deltas.
+            new_weights = dict(policy_weights=dict(weights["policy_weights"]), value_function_weights=None)
+            for version in range(2, 6):
+                new_weights["policy_weights"]["w"] = new_weights["policy_weights"]["w"] + \
+                    0.01 * np.random.randn(64, 32).astype(np.float32)
+                broadcaster.publish(new_weights)
+                delta = ray.get(broadcaster.get_weights_for(version - 1))
+                self.assertEqual(delta.version, version)
+                self.assertTrue(delta.is_delta)
+                self.assertEqual(delta.policy_vars, ["w"])
+                worker_weights = delta.get_weights(worker_weights)
+
+            # Quantization errors do not accumulate over deltas.
+            tolerance = dict(float16=2, bfloat16=1).get(quantization, 5)
+            recursive_assert_almost_equal(worker_weights["policy_weights"], new_weights["policy_weights"],
+                                          decimals=tolerance)
+            # Workers lagging behind receive a full snapshot of the latest version.
+            full = ray.get(broadcaster.get_weights_for(2))
+            self.assertFalse(full.is_delta)
+            recursive_assert_almost_equal(full.get_weights()["policy_weights"], worker_weights["policy_weights"],
+                                          decimals=tolerance)
+
+            metrics = broadcaster.get_metrics()
+            self.assertEqual(metrics["weight_versions"], 5)
+            self.assertEqual(metrics["weight_full_syncs"], 2)
+            self.assertEqual(metrics["weight_delta_syncs"], 4)
+            expected_bytes = 64 * 32 * (4 if quantization is None else 2)
+            self.assertEqual(delta.nbytes, expected_bytes)
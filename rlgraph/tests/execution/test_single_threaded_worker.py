@@ -20,7 +20,7 @@ from __future__ import print_function
 import unittest
 
 from rlgraph.agents.random_agent import RandomAgent
-from rlgraph.environments import OpenAIGymEnv
+from rlgraph.environments import OpenAIGymEnv, SubprocVectorEnv
 from rlgraph.execution.single_threaded_worker import SingleThreadedWorker
 
 
@@ -71,3 +71,29 @@ class TestSingleThreadedWorker(unittest.TestCase):
         self.assertEqual(result['episodes_executed'], 5)
         self.assertLessEqual(result['env_frames'], 50)
         self.assertGreaterEqual(result['runtime'], 0.0)
+
+    def test_timesteps_ready_environments(self):
+        """
+        Tests executing timesteps while only waiting for the fastest environments.
+        """
+        vector_env = SubprocVectorEnv(num_environments=4, env_spec={"type": "gridworld", "world": "2x2"})
+        agent = RandomAgent(
+            action_space=vector_env.action_space,
+            state_space=vector_env.state_space
+        )
+        worker = SingleThreadedWorker(
+            env_spec=vector_env,
+            agent=agent,
+            frameskip=1,
+            worker_executes_preprocessing=False,
+            num_ready_environments=2
+        )
+
+        result = worker.execute_timesteps(100)
+        self.assertGreaterEqual(result['timesteps_executed'], 100)
+        self.assertGreater(result['episodes_executed'], 0)
+        self.assertGreaterEqual(result['env_frames'], 100)
+
+        result = worker.execute_episodes(5, max_timesteps_per_episode=10, reset=False)
+        self.assertGreaterEqual(result['episodes_executed'], 5)
+        vector_env.terminate_all()
@@ -0,0 +1,114 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pickle
+import time
+import unittest
+
+import numpy as np
+
+from rlgraph import get_distributed_backend
+from rlgraph.execution.ray.ray_util import ray_compress, ray_decompress, ray_compress_batch, RayCompressedBatch, \
+    RayCompressedTransitions
+
+
+class TestRayCompressionPerformance(unittest.TestCase):
+    """
+    Compares per-state (pyarrow + LZ4 + base64) compression with batched raw LZ4 frames for
+    Atari-sized sample batches.
+    """
+    # Sample batch size of a worker task and number of batches.
+    batch_size = 512
+    num_batches = 20
+
+    def setUp(self):
+        assert get_distributed_backend() == "ray"
+        # Frames compress well in practice, so use mostly constant images with some noise.
+        self.batches = []
+        for _ in range(self.num_batches):
+            batch = np.zeros(shape=(self.batch_size, 84, 84, 4), dtype=np.uint8)
+            batch[:, 20:40, 20:40, :] = np.random.randint(0, 255, size=(self.batch_size, 20, 20, 4))
+            self.batches.append(batch)
+
+    def test_per_state_compression(self):
+        start = time.monotonic()
+        compressed = [[ray_compress(state) for state in batch] for batch in self.batches]
+        compress_time = time.monotonic() - start
+        payload = sum(len(pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)) for batch in compressed)
+
+        start = time.monotonic()
+        for batch in compressed:
+            np.asarray([ray_decompress(state) for state in batch])
+        decompress_time = time.monotonic() - start
+
+        print("#### Per-state compression (pyarrow, LZ4, base64) ####")
+        print("Compressed {} states/s, decompressed {} states/s, serialized payload: {} bytes/state".format(
+            self.batch_size * self.num_batches / compress_time, self.batch_size * self.num_batches / decompress_time,
+            payload / (self.batch_size * self.num_batches)
+        ))
+
+    def test_batch_compression(self):
+        start = time.monotonic()
+        compressed = [ray_compress_batch(batch) for batch in self.batches]
+        compress_time = time.monotonic() - start
+        payload = sum(len(pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)) for batch in compressed)
+
+        out = np.empty_like(self.batches[0])
+        start = time.monotonic()
+        for batch in compressed:
+            batch.decompress(out=out)
+        decompress_time = time.monotonic() - start
+        self.assertTrue(np.array_equal(out, self.batches[-1]))
+
+        print("#### Batched raw LZ4 frames ####")
+        print("Compressed {} states/s, decompressed {} states/s, serialized payload: {} bytes/state".format(
+            self.batch_size * self.num_batches / compress_time, self.batch_size * self.num_batches / decompress_time,
+            payload / (self.batch_size * self.num_batches)
+        ))
+
+    def test_transition_compression(self):
+        # Separately compressed states and next-states (next-states share frames, but not bytes, with states).
+        start = time.monotonic()
+        separate = []
+        for batch in self.batches:
+            states = ray_compress_batch(batch[:-1])
+            next_states = RayCompressedBatch.from_frames(
+                states.frames()[1:] + ray_compress_batch(batch[-1:]).frames(), shape=states.shape, dtype=states.dtype
+            )
+            separate.append((states, next_states))
+        separate_time = time.monotonic() - start
+        separate_payload = sum(len(pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)) for batch in separate)
+
+        # One shared frame table.
+        start = time.monotonic()
+        shared = [RayCompressedTransitions(ray_compress_batch(batch), np.arange(self.batch_size - 1),
+                                           np.arange(1, self.batch_size)) for batch in self.batches]
+        shared_time = time.monotonic() - start
+        shared_payload = sum(len(pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)) for batch in shared)
+
+        states, next_states = shared[-1].decompress()
+        self.assertTrue(np.array_equal(next_states, self.batches[-1][1:]))
+        self.assertLess(shared_payload, separate_payload)
+
+        num_transitions = (self.batch_size - 1) * self.num_batches
+        print("#### States and next-states: Separate batches vs. shared frame table ####")
+        print("Separate: {} transitions/s, {} bytes/transition. Shared: {} transitions/s, {} bytes/transition".format(
+            num_transitions / separate_time, separate_payload / num_transitions, num_transitions / shared_time,
+            shared_payload / num_transitions
+        ))
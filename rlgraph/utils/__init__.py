@@ -19,7 +19,7 @@ from rlgraph.utils.define_by_run_ops import print_call_chain
 from rlgraph.utils.initializer import Initializer
 from rlgraph.utils.numpy import sigmoid, softmax, relu, one_hot
 from rlgraph.utils.ops import DataOp, SingleDataOp, DataOpDict, DataOpTuple, ContainerDataOp, FlattenedDataOp
-from rlgraph.utils.pytorch_util import pytorch_one_hot, PyTorchVariable
+from rlgraph.utils.pytorch_util import pytorch_one_hot, pytorch_reverse_discounted_cumsum, PyTorchVariable
 from rlgraph.utils.rlgraph_errors import RLGraphError, RLGraphAPICallParamError, RLGraphBuildError, \
     RLGraphInputIncompleteError, RLGraphVariableIncompleteError, RLGraphObsoletedError, RLGraphSpaceError
 from rlgraph.utils.specifiable import Specifiable
@@ -37,5 +37,6 @@ __all__ = [
     "Initializer", "Specifiable", "convert_dtype", "get_shape", "get_rank", "force_tuple", "force_list",
     "logging_formatter", "root_logger", "tf_logger", "print_logging_handler", "sigmoid", "softmax", "relu", "one_hot",
     "DataOp", "SingleDataOp", "DataOpDict", "DataOpTuple", "ContainerDataOp", "FlattenedDataOp",
-    "pytorch_one_hot", "PyTorchVariable", "LARGE_INTEGER", "SMALL_NUMBER", "MIN_LOG_STDDEV", "MAX_LOG_STDDEV"
+    "pytorch_one_hot", "pytorch_reverse_discounted_cumsum", "PyTorchVariable", "LARGE_INTEGER", "SMALL_NUMBER",
+    "MIN_LOG_STDDEV", "MAX_LOG_STDDEV"
 ]
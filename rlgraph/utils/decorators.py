@@ -122,6 +122,11 @@ def rlgraph_api(api_method=None, *, component=None, name=None, returns=None,
                 )
                 return output
 
+            # Meta-graph build: Record this call (including nested API-method calls) in the profiler.
+            build_profiler = TraceContext.BUILD_PROFILER
+            if build_profiler is not None:
+                build_profiler.start("meta_graph", self.global_scope, api_fn_name)
+
             api_method_rec = self.api_methods[api_fn_name]
 
             # Create op-record column to call API method with. Ignore None input params. These should not be sent
@@ -280,6 +285,9 @@ def rlgraph_api(api_method=None, *, component=None, name=None, returns=None,
                     return_ops = True
                     break
 
+            if build_profiler is not None:
+                build_profiler.stop()
+
             if return_ops is True:
                 assert len(caller_component._summary_ops_buffer_stack) > 0,\
                     "Called by other graph_fn, there should be summary_ops buffer started"
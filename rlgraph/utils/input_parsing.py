@@ -162,6 +162,10 @@ def parse_execution_spec(execution_spec):
             enable_timeline=False,
             # With which frequency do we write out a timeline file?
             timeline_frequency=1,
+            # Maximum number of cached fetch/feed plans (one per signature of API-method calls).
+            call_plan_cache_size=128,
+            # Persistent build cache: dict(directory=str, key=agent config), see `BuildCache`.
+            build_cache=None
         )
         execution_spec = default_dict(execution_spec, default_spec)
 
@@ -210,7 +214,10 @@ def parse_execution_spec(execution_spec):
             device_map={},
             # TODO potentially set to nproc?
             torch_num_threads=1,
-            OMP_NUM_THREADS=1
+            OMP_NUM_THREADS=1,
+            # Cache a call plan per API method and input signature instead of generically converting
+            # inputs and results on every call.
+            compile_calls=True
         )
         execution_spec = default_dict(execution_spec, default_spec)
 
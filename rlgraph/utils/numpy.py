@@ -17,10 +17,93 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
 import numpy as np
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.util import SMALL_NUMBER
 
 
+def create_array(shape, dtype, fill_value=0, file_path=None):
+    """
+    Preallocates a numpy array, optionally backed by a memory-mapped .npy file.
+
+    Args:
+        shape (tuple): The shape of the array.
+        dtype (np.dtype): The data type of the array.
+        fill_value (any): Initial value of all elements (only for newly created arrays).
+        file_path (Optional[str]): If given, the array lives in this .npy file. An existing file is reopened with
+            its contents kept and must match `shape` and `dtype`.
+
+    Returns:
+        np.ndarray: The (possibly memory-mapped) array.
+    """
+    if file_path is None:
+        return np.full(shape=shape, fill_value=fill_value, dtype=dtype)
+    elif os.path.exists(file_path):
+        array = np.load(file_path, mmap_mode="r+")
+        if array.shape != tuple(shape) or array.dtype != np.dtype(dtype):
+            raise RLGraphError("Existing array file {} has shape {} and dtype {}, but {} and {} were "
+                               "requested.".format(file_path, array.shape, array.dtype, tuple(shape), dtype))
+        return array
+    array = np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=tuple(shape))
+    # New files are zero-filled.
+    if fill_value != 0:
+        array[:] = fill_value
+    return array
+
+
+def n_step_transitions(rewards, terminals, n_step, discount, sequence_ends=None):
+    """
+    Computes n-step transitions for a batch of concatenated trajectories (e.g. of several environments).
+
+    The n-step horizon of each transition ends after `n_step` steps or at the end of its trajectory, whichever comes
+    first. Trajectories end at terminals (episode ends) or at `sequence_ends` (trajectories cut off without the
+    episode ending, e.g. the unfinished fragment of a sample). Transitions whose horizon is cut off by a
+    sequence end are incomplete.
+
+    Args:
+        rewards (ndarray): Rewards of shape [N].
+        terminals (ndarray): Bools of shape [N], True for the last transition of an episode.
+        n_step (int): Number of steps to look ahead.
+        discount (float): Discount factor.
+        sequence_ends (Optional[ndarray]): Bools of shape [N], True for the last transition of a trajectory which
+            continues outside the batch. The last transition of the batch always ends a trajectory and is treated
+            as sequence end unless it is terminal.
+
+    Returns:
+        Tuple[ndarray,ndarray,ndarray,ndarray]:
+            - The discounted n-step rewards of shape [N].
+            - The batch index of each transition's n-step next state (i.e. use `next_states[indices]`).
+            - The n-step terminals (whether the horizon reaches the end of the episode).
+            - Bools, True for complete transitions.
+    """
+    rewards = np.asarray(rewards)
+    if not np.issubdtype(rewards.dtype, np.floating):
+        rewards = rewards.astype(np.float32)
+    terminals = np.asarray(terminals, dtype=np.bool_)
+    num_transitions = len(rewards)
+    ends = terminals.copy() if sequence_ends is None else terminals | np.asarray(sequence_ends, dtype=np.bool_)
+    if num_transitions > 0:
+        ends[-1] = True
+    positions = np.arange(num_transitions)
+
+    # Last transition of each transition's trajectory and its n-step horizon.
+    end_positions = np.flatnonzero(ends)
+    trajectory_ends = end_positions[np.searchsorted(end_positions, positions)]
+    horizons = np.minimum(positions + n_step - 1, trajectory_ends)
+
+    # Discounted sum over each horizon.
+    padded_rewards = np.concatenate([rewards, np.zeros(shape=(n_step - 1,), dtype=rewards.dtype)])
+    n_step_rewards = np.zeros_like(rewards)
+    for i in range(n_step):
+        n_step_rewards += (discount ** i) * padded_rewards[i:i + num_transitions] * (positions + i <= horizons)
+
+    n_step_terminals = terminals[horizons]
+    complete = (horizons == positions + n_step - 1) | n_step_terminals
+    return n_step_rewards, horizons, n_step_terminals, complete
+
+
 def sigmoid(x, derivative=False):
     """
     Returns the sigmoid function applied to x.
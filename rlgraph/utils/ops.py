@@ -37,9 +37,8 @@ class TraceContext(object):
     # Define by run build tracing.
     DEFINE_BY_RUN_CONTEXT = None
 
-    # Is there an active call context?
-    ACTIVE_CALL_CONTEXT = False
-    CONTEXT_START = None
+    # BuildProfiler recording the API-method calls during the meta-graph build.
+    BUILD_PROFILER = None
 
 
 class DataOp(object):
@@ -353,6 +352,41 @@ def flat_key_lookup(container, flat_key, default=None, custom_scope_separator=No
     return result
 
 
+def get_leaf_paths(container, path=()):
+    """
+    Returns the paths (sequences of dict keys and tuple indices) to all leaves of a (nested) dict/tuple, in the same
+    order as the items of `flatten_op(container)`.
+
+    Args:
+        container (any): The (non-flattened) structure.
+        path (tuple): The path of `container` itself (used for recursion).
+
+    Returns:
+        List[tuple]: The paths to all leaves. A single leaf has the empty path.
+    """
+    if isinstance(container, dict):
+        return [leaf for key in sorted(container.keys()) for leaf in get_leaf_paths(container[key], path + (key,))]
+    elif isinstance(container, tuple):
+        return [leaf for i, value in enumerate(container) for leaf in get_leaf_paths(value, path + (i,))]
+    return [path]
+
+
+def path_lookup(container, path):
+    """
+    Returns the item under a path as returned by `get_leaf_paths`.
+
+    Args:
+        container (any): The (non-flattened) structure.
+        path (tuple): Sequence of dict keys and tuple indices.
+
+    Returns:
+        any: The item under the path.
+    """
+    for key in path:
+        container = container[key]
+    return container
+
+
 def deep_tuple(x):
     """
     Converts all lists inside the input into a DataOpTuple.
@@ -104,6 +104,35 @@ def pytorch_tile(tensor, n_tile, dim=0):
     return torch.index_select(tensor, dim, order_index)
 
 
+def pytorch_reverse_discounted_cumsum(values, coefficients):
+    """
+    Computes the reverse linear recurrence y[t] = values[t] + coefficients[t] * y[t + 1] (with y[n] = 0) along the
+    first dimension, e.g. discounted returns with `coefficients` = discount, or 0 at sequence boundaries to restart
+    the accumulation.
+
+    Uses a parallel (doubling) scan: log2(n) steps of vectorized tensor ops instead of a python loop over all
+    elements. Only products of coefficients are formed (no divisions), so this is numerically stable for sequences
+    of any length.
+
+    Args:
+        values (torch.Tensor): Values of shape [n, ...].
+        coefficients (torch.Tensor): Coefficients of shape [n] (broadcast over the remaining dimensions of values).
+
+    Returns:
+        torch.Tensor: The accumulated values y of the same shape as `values`.
+    """
+    num_values = values.shape[0]
+    # Per step: y[t] holds the sum over the window [t, t + offset), products[t] the product of the window's
+    # coefficients.
+    products = coefficients.reshape((num_values,) + (1,) * (values.dim() - 1)).to(dtype=values.dtype)
+    offset = 1
+    while offset < num_values:
+        values = torch.cat((values[:-offset] + products[:-offset] * values[offset:], values[-offset:]), 0)
+        products = torch.cat((products[:-offset] * products[offset:], products[-offset:]), 0)
+        offset *= 2
+    return values
+
+
 # TODO remove when we have handled pytorch placeholder inference better.
 def get_input_channels(shape):
     """